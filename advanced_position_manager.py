@@ -15,15 +15,295 @@
 """
 
 import logging
-from typing import Dict, List, Optional, Tuple
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
 from datetime import datetime
 from binance_client import BinanceClient
 from market_analyzer import MarketAnalyzer
 
+# 按 int(position_amt > 0) 索引的下单方向：0 空仓，1 多仓
+_SIDE_FOR_INC = ('SELL', 'BUY')    # 同向加仓
+_SIDE_FOR_CLOSE = ('BUY', 'SELL')  # 反向平仓/止损/对冲
+
+
+@dataclass(frozen=True)
+class Position:
+    """持仓快照（从API原始字典解析一次，策略方法直接读取数值字段）"""
+    __slots__ = ('symbol', 'position_amt', 'entry_price', 'mark_price',
+                 'unrealized_pnl', 'leverage', 'notional', 'entry_notional',
+                 'leverage_inv', 'direction')
+
+    symbol: str
+    position_amt: float  # 正数为多仓，负数为空仓
+    entry_price: float
+    mark_price: float
+    unrealized_pnl: float
+    leverage: float
+    notional: float  # 按标记价格计的持仓价值（交易所返回，取绝对值）
+    entry_notional: float  # 按入场价格计的持仓价值
+    leverage_inv: float  # 1/杠杆，保证金 = 价值 * leverage_inv
+    direction: int  # 1 多仓，-1 空仓
+
+    @classmethod
+    def from_api(cls, raw: Dict) -> 'Position':
+        """
+        从Binance positionRisk(v2)返回的字典构建（派生字段在此一次算好）
+
+        必需字段直接下标读取：接口字段变更时立即抛出KeyError，
+        而不是被 .get(key, 0) 静默当作0仓位/0价格处理
+        """
+        position_amt = float(raw['positionAmt'])
+        entry_price = float(raw['entryPrice'])
+        mark_price = float(raw['markPrice'])
+        leverage = float(raw['leverage']) or 1.0
+        notional = raw.get('notional')
+        return cls(
+            symbol=raw['symbol'],
+            position_amt=position_amt,
+            entry_price=entry_price,
+            mark_price=mark_price,
+            unrealized_pnl=float(raw['unRealizedProfit']),
+            leverage=leverage,
+            notional=abs(float(notional)) if notional is not None else abs(position_amt) * mark_price,
+            entry_notional=abs(position_amt) * entry_price,
+            leverage_inv=1.0 / leverage,
+            direction=1 if position_amt > 0 else -1
+        )
+
+
+
+@dataclass
+class PositionMatrix:
+    """持仓列式视图（每个字段一个NumPy数组），用于对所有持仓做向量化筛选"""
+    symbols: np.ndarray
+    position_amt: np.ndarray
+    entry_price: np.ndarray
+    mark_price: np.ndarray
+    unrealized_pnl: np.ndarray
+    notional: np.ndarray
+    leverage_inv: np.ndarray
+
+    @classmethod
+    def from_positions(cls, positions: List[Position],
+                       marks: Optional[Dict[str, float]] = None) -> 'PositionMatrix':
+        """
+        从Position列表构建列式数组
+
+        Args:
+            positions: 持仓列表
+            marks: 可选的最新标记价格 {symbol: price}，覆盖持仓中的markPrice
+        """
+        marks = marks or {}
+        return cls(
+            symbols=np.array([p.symbol for p in positions], dtype=object),
+            position_amt=np.array([p.position_amt for p in positions], dtype=np.float64),
+            entry_price=np.array([p.entry_price for p in positions], dtype=np.float64),
+            mark_price=np.array([marks.get(p.symbol) or p.mark_price for p in positions],
+                                dtype=np.float64),
+            unrealized_pnl=np.array([p.unrealized_pnl for p in positions], dtype=np.float64),
+            notional=np.array([p.notional for p in positions], dtype=np.float64),
+            leverage_inv=np.array([p.leverage_inv for p in positions], dtype=np.float64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+
+@dataclass(frozen=True)
+class TPPlan:
+    """多级止盈计划（价格与数量预先算好，相同参数跨周期复用）"""
+    __slots__ = ('side', 'prices', 'quantities')
+
+    side: str  # 止盈下单方向
+    prices: np.ndarray
+    quantities: np.ndarray
+
+
+def _step_decimals(step: str) -> int:
+    """步长字符串的小数位数，例如 '0.00100000' -> 3，'1' -> 0"""
+    step = step.rstrip('0') if '.' in step else step
+    return len(step.split('.')[1]) if '.' in step else 0
+
+
+def _floor_to_step(value: float, step: float, decimals: int) -> float:
+    """按步长向下取整（1e-9 容差避免 0.3/0.1 这类浮点误差多舍掉一个步长）"""
+    return round(math.floor(value / step + 1e-9) * step, decimals)
+
+
+def _round_to_step(value: float, step: float, decimals: int) -> float:
+    """按步长四舍五入到最近的整数倍"""
+    return round(round(value / step) * step, decimals)
+
+
+@lru_cache(maxsize=256)
+def _compile_tp_plan(side: str, entry_price: float, total_quantity: float,
+                     levels: Tuple[Tuple[float, float], ...],
+                     filters: Tuple[float, int, float, int]) -> TPPlan:
+    """
+    计算多级止盈的价格与数量（按参数缓存）
+
+    Args:
+        side: 原始方向 BUY/SELL
+        entry_price: 入场价格
+        total_quantity: 总持仓数量
+        levels: ((profit_pct, close_pct), ...)
+        filters: 交易对下单规则 (stepSize, 数量小数位, tickSize, 价格小数位)
+    """
+    qty_step, qty_decimals, tick_size, tick_decimals = filters
+    sign = 1 if side == 'BUY' else -1
+    profit_pcts = np.array([level[0] for level in levels], dtype=np.float64)
+    close_pcts = np.array([level[1] for level in levels], dtype=np.float64)
+    prices = entry_price * (1 + sign * profit_pcts / 100)
+    if tick_size:
+        prices = np.round(np.round(prices / tick_size) * tick_size, tick_decimals)
+
+    # 每级之前的剩余比例：1, (1-c1), (1-c1)(1-c2), ...
+    remaining_ratio = np.concatenate(([1.0], np.cumprod(1 - close_pcts / 100)[:-1]))
+    quantities = total_quantity * remaining_ratio * close_pcts / 100
+    quantities = np.round(np.floor(quantities / qty_step + 1e-9) * qty_step, qty_decimals)
+
+    # 缓存的计划会被多次复用，设为只读防止被调用方修改
+    prices.setflags(write=False)
+    quantities.setflags(write=False)
+    return TPPlan(side='SELL' if side == 'BUY' else 'BUY', prices=prices, quantities=quantities)
+
+
+@lru_cache(maxsize=16)
+def _compile_scale_out_targets(targets: Tuple[Tuple[float, float], ...]):
+    """
+    预处理分批止盈目标（实际运行中止盈配置通常只有少数几种，按配置缓存）
+
+    无效目标在此一次性剔除，价格系数预先算好，调用时只剩按数量的计算
+
+    Args:
+        targets: ((profit_pct, close_pct), ...)
+
+    Returns:
+        (legs, skipped)
+        legs: ((目标序号, profit_pct, close_pct, 多仓价格系数, 空仓价格系数, 是否最后一个目标), ...)
+        skipped: 被剔除的无效目标 ((profit_pct, close_pct), ...)
+    """
+    legs = []
+    skipped = []
+    for i, (profit_pct, close_pct) in enumerate(targets, 1):
+        if profit_pct <= 0 or close_pct <= 0:
+            skipped.append((profit_pct, close_pct))
+            continue
+        legs.append((i, profit_pct, close_pct, 1 + profit_pct / 100, 1 - profit_pct / 100,
+                     i == len(targets)))
+    return tuple(legs), tuple(skipped)
+
+
+
+def _to_bp(pct: float) -> int:
+    """
+    百分比 -> 整数基点（1bp = 0.01%）
+
+    阈值比较统一在基点上进行：0.01%的粒度远细于本模块任何决策阈值，
+    取整后 4.9999999% 与 5% 不会因浮点误差落在阈值两侧
+    """
+    return round(pct * 100)
+
+
+def _leverage_for_vol(volatility_pct: float, base_leverage: int,
+                      min_leverage: int, max_leverage: int) -> int:
+    """
+    波动率分级 -> 推荐杠杆
+
+    - < 1%: 低波动 -> 高杠杆 (base+2，不超过max)
+    - 1-3%: 中波动 -> 基础杠杆
+    - > 3%: 高波动 -> 低杠杆 (base-2，不低于min)
+    """
+    volatility_bp = _to_bp(volatility_pct)
+    if volatility_bp < 100:
+        return min(max_leverage, base_leverage + 2)
+    if volatility_bp < 300:
+        return base_leverage
+    return max(min_leverage, base_leverage - 2)
+
+
+# 限流：HTTP 429/418 或 Binance 错误码 -1003，请求未被执行，可以安全地退避后重发
+_RATE_LIMIT_STATUSES = frozenset((429, 418))
+_RATE_LIMIT_CODE = -1003
+
+
+def _classify_error(e: Exception) -> str:
+    """
+    按HTTP状态码/Binance错误码对请求异常分类（不匹配消息文本：消息中带有完整请求URL）
+
+    Returns:
+        'rate_limit' 限流；'client' 其余4xx校验错误（重试也不会成功）；'other' 网络错误/5xx等
+    """
+    status = getattr(e, 'status_code', None)
+    if status is None:
+        response = getattr(e, 'response', None)
+        status = getattr(response, 'status_code', None)
+    code = getattr(e, 'code', None)
+
+    if status is not None and 400 <= status < 500 and status not in _RATE_LIMIT_STATUSES \
+            and code != _RATE_LIMIT_CODE:
+        return 'client'
+    if status in _RATE_LIMIT_STATUSES or code == _RATE_LIMIT_CODE:
+        return 'rate_limit'
+    return 'other'
+
+
+# 止损类挂单（移动止损时需要替换的订单；止盈单不受影响）
+_STOP_LOSS_TYPES = frozenset(('STOP_MARKET', 'STOP'))
+
+
+class CircuitBreaker:
+    """
+    简单熔断器：连续失败达到阈值后在冷却期内拒绝请求，冷却结束后放行一次试探
+
+    Args:
+        failure_threshold: 连续失败多少次后熔断
+        reset_timeout: 熔断持续时间（秒）
+    """
+
+    __slots__ = ('failure_threshold', 'reset_timeout', 'failures', 'opened_at')
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def remaining(self) -> float:
+        """熔断剩余秒数（未熔断返回0）"""
+        if self.failures < self.failure_threshold:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.time())
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.time()
+
 
 class AdvancedPositionManager:
     """高级仓位管理器 - 实现专业级交易策略"""
 
+    __slots__ = (
+        'client', 'analyzer', 'logger',
+        '_positions_cache', '_positions_cache_time', '_positions_cache_ttl',
+        '_funding_rates', '_funding_rates_time', '_funding_rates_ttl',
+        '_stop_order_ids', '_last_leverage', '_symbol_filters',
+        '_live_positions', '_live_mark', '_live_thread', '_live_stop',
+        '_live_time', '_live_interval', '_live_invalidated_at',
+        '_executor', '_atr_cache', '_atr_cache_ttl', '_open_order_ids',
+        'rebalance_drift_pct_threshold', '_cb', '_retry_attempts', '_retry_backoff'
+    )
+
     def __init__(self, binance_client: BinanceClient, market_analyzer: MarketAnalyzer):
         """
         初始化高级仓位管理器
@@ -36,6 +316,304 @@ class AdvancedPositionManager:
         self.analyzer = market_analyzer
         self.logger = logging.getLogger(__name__)
 
+        # 持仓快照缓存（symbol -> 持仓）：多个策略连续调用时复用同一次REST结果
+        self._positions_cache: Dict[str, Position] = {}
+        self._positions_cache_time = 0.0
+        self._positions_cache_ttl = 1.0  # 秒（下单后会主动失效）
+
+        # 全市场资金费率缓存（premiumIndex一次返回所有交易对）
+        self._funding_rates: Dict[str, float] = {}
+        self._funding_rates_time = 0.0
+        self._funding_rates_ttl = 30.0  # 秒
+
+        # 本管理器最近创建的止损单ID {symbol: orderId}（值为None表示已撤销全部挂单）
+        # 持仓可能经其他途径平仓或止损已触发，使用前须与交易所当前挂单核对
+        self._stop_order_ids: Dict[str, Optional[int]] = {}
+
+        # 仓位再平衡的相对偏离阈值（%）：偏离目标不足该比例时不调整
+        self.rebalance_drift_pct_threshold = 10.0
+
+        # 本管理器挂出的订单ID登记表 {symbol: {orderId}}，撤单时用于统计和逐单回退
+        self._open_order_ids: Dict[str, Set[int]] = {}
+
+        # 最近一次成功设置的杠杆 {symbol: leverage}，相同值不再重复请求
+        self._last_leverage: Dict[str, int] = {}
+
+        # 交易对下单规则 {symbol: (stepSize, 数量小数位, tickSize, 价格小数位)}，
+        # 首次下单时从exchangeInfo的LOT_SIZE/PRICE_FILTER加载
+        self._symbol_filters: Dict[str, Tuple[float, int, float, int]] = {}
+
+        # 后台实时快照（start_live_updates 启动后由后台线程刷新，热路径只读内存）
+        self._live_positions: Dict[str, Position] = {}
+        self._live_mark: Dict[str, float] = {}
+        self._live_thread: Optional[threading.Thread] = None
+        self._live_stop = threading.Event()
+        # 快照对应的请求发出时刻、刷新间隔、最近一次失效时刻：
+        # 快照超过两个刷新间隔未更新，或早于最近一次失效时，回退到TTL缓存
+        self._live_time = 0.0
+        self._live_interval = 1.0
+        self._live_invalidated_at = 0.0
+
+        # ATR缓存 {(symbol, interval): (最新K线开盘时间, ATR, 收盘价, 获取时间)}
+        self._atr_cache: Dict[Tuple[str, str], Tuple[int, float, float, float]] = {}
+        self._atr_cache_ttl = 60.0  # 秒
+
+        # 多交易对批量操作共用的线程池（REST请求为I/O密集型，等待网络时释放GIL）
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='position-mgr')
+
+        # 按交易对的熔断器 {symbol: CircuitBreaker}，以及限流重试参数
+        self._cb: Dict[str, CircuitBreaker] = {}
+        self._retry_attempts = 3
+        self._retry_backoff = 0.2  # 秒，按 0.2, 0.4, 0.8 指数退避
+
+    # ==================== 请求重试与熔断 ====================
+
+    def _call_with_retry(self, breaker_key: str, fn: Callable, *args, **kwargs):
+        """
+        调用客户端接口：限流时指数退避重试，并按交易对熔断
+
+        - 网络错误/5xx：BinanceClient 传输层已重试过，这里只计入熔断
+        - 限流(429/418/-1003)：请求未执行，退避后重发（下单也安全）
+        - 其余4xx校验错误：直接抛出，不计入熔断
+
+        Args:
+            breaker_key: 熔断器键（交易对）
+            fn: 客户端方法
+        """
+        breaker = self._cb.get(breaker_key)
+        if breaker is None:
+            breaker = self._cb.setdefault(breaker_key, CircuitBreaker())
+        remaining = breaker.remaining()
+        if remaining > 0:
+            raise RuntimeError(f"{breaker_key} 请求连续失败已熔断，{remaining:.0f}秒后恢复")
+
+        for attempt in range(self._retry_attempts):
+            try:
+                result = fn(*args, **kwargs)
+                breaker.record_success()
+                return result
+            except Exception as e:
+                kind = _classify_error(e)
+                if kind == 'client':
+                    raise
+                if kind == 'rate_limit':
+                    if attempt + 1 < self._retry_attempts:
+                        delay = self._retry_backoff * (2 ** attempt)
+                        self.logger.warning("%s 触发限流，%.1f秒后重试: %s", breaker_key, delay, e)
+                        time.sleep(delay)
+                        continue
+                breaker.record_failure()
+                if breaker.remaining() > 0:
+                    self.logger.error("%s 连续%d次请求失败，熔断%.0f秒",
+                                      breaker_key, breaker.failures, breaker.reset_timeout)
+                raise
+
+    # ==================== 持仓查询（带缓存） ====================
+
+    def _get_positions_map(self) -> Dict[str, Position]:
+        """
+        获取 {symbol: Position} 映射
+
+        TTL窗口内最多调用一次 get_active_positions()，避免同一轮中重复请求REST接口；
+        原始字典在此处一次性解析为Position，后续读取无需重复float转换
+
+        Returns:
+            以交易对为键的活跃持仓字典
+        """
+        now = time.time()
+        if now - self._positions_cache_time >= self._positions_cache_ttl:
+            positions_map = {}
+            for pos in self.client.get_active_positions():
+                # 双向持仓时同一symbol可能有两条记录，保留第一条（与原线性查找一致）
+                if pos['symbol'] not in positions_map:
+                    positions_map[pos['symbol']] = Position.from_api(pos)
+            self._positions_cache = positions_map
+            self._positions_cache_time = now
+        return self._positions_cache
+
+    def invalidate_positions_cache(self):
+        """使持仓快照失效（下单改变持仓后调用，下次查询重新请求）"""
+        self._positions_cache_time = 0.0
+        # 实时快照同样作废，直到下单之后发出的刷新请求完成
+        self._live_invalidated_at = time.time()
+
+    def _get_position(self, symbol: str) -> Optional[Position]:
+        """获取指定交易对的活跃持仓（无持仓返回None）"""
+        if self._is_live():
+            return self._live_positions.get(symbol)
+        return self._get_positions_map().get(symbol)
+
+    def _get_mark(self, symbol: str, position: Optional[Position] = None) -> float:
+        """
+        获取标记价格：优先读取后台实时快照，未命中时回退到持仓中的markPrice
+
+        Args:
+            symbol: 交易对
+            position: 已获取的持仓（可选，用于回退）
+        """
+        mark_price = self._live_mark.get(symbol) if self._is_live() else None
+        if mark_price:
+            return mark_price
+        if position is None:
+            position = self._get_position(symbol)
+        return position.mark_price if position else 0.0
+
+    # ==================== ATR缓存 ====================
+
+    _INTERVAL_MS = {
+        '1m': 60_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+        '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000
+    }
+
+    def _get_atr(self, symbol: str, interval: str = '1h') -> Tuple[float, float]:
+        """
+        获取ATR与最新收盘价（带缓存）
+
+        同一交易对在TTL内且未进入新K线时直接返回缓存，
+        避免止损、杠杆、仓位计算各自重复请求K线
+
+        Returns:
+            (ATR, 最新收盘价)，数据不足时为 (0.0, 0.0)
+        """
+        now = time.time()
+        cached = self._atr_cache.get((symbol, interval))
+        if cached is not None:
+            bar_open_time, atr, close, fetched_at = cached
+            bar_end = (bar_open_time + self._INTERVAL_MS.get(interval, 0)) / 1000
+            if now - fetched_at < self._atr_cache_ttl and now < bar_end:
+                return atr, close
+
+        klines = self._call_with_retry(symbol, self.client.get_klines, symbol, interval, limit=50)
+        if not klines:
+            return 0.0, 0.0
+        atr = self.analyzer.atr_fast(klines)
+        close = float(klines[-1][4])
+        self._atr_cache[(symbol, interval)] = (int(klines[-1][0]), atr, close, now)
+        return atr, close
+
+    # ==================== 数量精度 ====================
+
+    # 未加载到规则时的回退：数量3位小数（与原先一致），价格不取整
+    _DEFAULT_FILTERS = (0.001, 3, 0.0, 0)
+
+    def _get_symbol_filters(self, symbol: str) -> Tuple[float, int, float, int]:
+        """
+        获取交易对的数量步长和价格步长（exchangeInfo只请求一次，之后读取内存）
+
+        加载失败时回退到默认规则，下次调用会重新尝试加载
+        """
+        if not self._symbol_filters:
+            try:
+                exchange_info = self.client.get_futures_exchange_info()
+                symbol_filters = {}
+                for s in exchange_info.get('symbols', []):
+                    filters = {f['filterType']: f for f in s.get('filters', [])}
+                    lot = filters.get('LOT_SIZE')
+                    tick = filters.get('PRICE_FILTER')
+                    if lot is None:
+                        continue
+                    symbol_filters[s['symbol']] = (
+                        float(lot['stepSize']), _step_decimals(lot['stepSize']),
+                        float(tick['tickSize']) if tick else 0.0,
+                        _step_decimals(tick['tickSize']) if tick else 0
+                    )
+                self._symbol_filters = symbol_filters
+            except Exception as e:
+                self.logger.warning("加载交易对下单规则失败，使用默认3位小数: %s", e)
+        return self._symbol_filters.get(symbol, self._DEFAULT_FILTERS)
+
+    def get_symbol_rules(self, symbol: str) -> Optional[Tuple[float, int, float, int]]:
+        """
+        获取交易对的下单规则，供其他模块复用同一份exchangeInfo
+
+        Returns:
+            (数量步长, 数量小数位, 价格步长, 价格小数位)；规则未加载成功或交易对未知时返回None
+        """
+        self._get_symbol_filters(symbol)
+        return self._symbol_filters.get(symbol)
+
+    def _round_qty(self, symbol: str, quantity: float) -> float:
+        """按交易对LOT_SIZE步长向下取整下单数量（不会超出持仓或可用保证金）"""
+        qty_step, qty_decimals, _, _ = self._get_symbol_filters(symbol)
+        return _floor_to_step(quantity, qty_step, qty_decimals)
+
+    def _round_price(self, symbol: str, price: float) -> float:
+        """按交易对PRICE_FILTER步长取整触发价格（规则未知时原样返回）"""
+        _, _, tick_size, tick_decimals = self._get_symbol_filters(symbol)
+        if not tick_size:
+            return price
+        return _round_to_step(price, tick_size, tick_decimals)
+
+    # ==================== 后台实时快照 ====================
+
+    def _is_live(self) -> bool:
+        """实时快照是否可用：后台线程运行中，快照未过期，且晚于最近一次持仓失效"""
+        if self._live_thread is None or not self._live_thread.is_alive():
+            return False
+        live_time = self._live_time
+        return (live_time > self._live_invalidated_at
+                and time.time() - live_time < 2 * self._live_interval)
+
+    def _refresh_live_snapshot(self):
+        """刷新一次实时快照：持仓 + 全市场标记价格与资金费率（各一次REST请求）"""
+        # 以请求发出时刻作为快照时间：刷新期间发生的下单会使本次快照失效
+        started = time.time()
+        positions_map = {}
+        for pos in self.client.get_active_positions():
+            if pos['symbol'] not in positions_map:
+                positions_map[pos['symbol']] = Position.from_api(pos)
+
+        mark_map = {}
+        funding_rates = {}
+        for item in self.client.get_mark_price():
+            mark_map[item['symbol']] = float(item.get('markPrice', 0))
+            funding_rates[item['symbol']] = float(item.get('lastFundingRate', 0))
+
+        # 整体替换字典引用，读取方不会看到半更新状态
+        self._live_positions = positions_map
+        self._live_mark = mark_map
+        self._live_time = started
+        # premiumIndex 同时带有资金费率，顺带刷新资金费率缓存
+        self._funding_rates = funding_rates
+        self._funding_rates_time = time.time()
+
+    def _live_update_loop(self, interval: float):
+        while not self._live_stop.is_set():
+            try:
+                self._refresh_live_snapshot()
+            except Exception as e:
+                self.logger.warning("刷新实时快照失败: %s", e)
+            self._live_stop.wait(interval)
+
+    def start_live_updates(self, interval: float = 1.0):
+        """
+        启动后台线程持续刷新持仓与标记价格
+
+        启动后 can_roll_position 等策略方法直接读取内存快照，不再在检查路径上请求REST；
+        快照刷新持续失败（超过两个间隔未更新）时自动回退到TTL缓存查询
+
+        Args:
+            interval: 刷新间隔（秒）
+        """
+        if self._live_thread is not None and self._live_thread.is_alive():
+            return
+        self._live_interval = interval
+        self._refresh_live_snapshot()
+        self._live_stop.clear()
+        self._live_thread = threading.Thread(
+            target=self._live_update_loop, args=(interval,),
+            name='position-live-updates', daemon=True
+        )
+        self._live_thread.start()
+        self.logger.info("✅ 已启动持仓实时快照刷新 (间隔%s秒)", interval)
+
+    def stop_live_updates(self):
+        """停止后台刷新线程，之后回退到TTL缓存查询"""
+        self._live_stop.set()
+        if self._live_thread is not None:
+            self._live_thread.join(timeout=5)
+            self._live_thread = None
+
     # ==================== 1. 滚仓策略 ====================
 
     def can_roll_position(self, symbol: str, profit_threshold_pct: float = 6.0,
@@ -58,45 +636,34 @@ class AdvancedPositionManager:
         """
         try:
             # 获取当前持仓
-            positions = self.client.get_active_positions()
-            target_position = None
-
-            for pos in positions:
-                if pos['symbol'] == symbol:
-                    target_position = pos
-                    break
+            target_position = self._get_position(symbol)
 
             if not target_position:
                 return False, "无持仓", 0.0
 
             # 获取浮盈信息
-            unrealized_pnl = float(target_position.get('unRealizedProfit', 0))
-            position_amt = float(target_position.get('positionAmt', 0))
-            entry_price = float(target_position.get('entryPrice', 0))
-            mark_price = float(target_position.get('markPrice', 0))
+            unrealized_pnl = target_position.unrealized_pnl
 
-            if entry_price == 0:
+            if target_position.entry_price == 0:
                 return False, "入场价格为0", 0.0
 
-            # 计算浮盈百分比
-            position_value = abs(position_amt) * entry_price
-            profit_pct = (unrealized_pnl / position_value) * 100
+            # 计算浮盈百分比（相对入场价值）
+            profit_pct = (unrealized_pnl / target_position.entry_notional) * 100
 
             # 检查浮盈是否达到阈值
-            if profit_pct < profit_threshold_pct:
+            if _to_bp(profit_pct) < _to_bp(profit_threshold_pct):
                 return False, f"浮盈{profit_pct:.2f}%未达到阈值{profit_threshold_pct}%", 0.0
 
             # 检查是否超过最大滚仓次数（通过仓位大小推断）
             # 简化逻辑：如果当前仓位已经很大，限制继续滚仓
             available_balance = self.client.get_futures_available_balance()
-            position_margin = position_value / float(target_position.get('leverage', 1))
+            position_margin = target_position.notional * target_position.leverage_inv
 
             if position_margin > available_balance * 0.8:  # 仓位保证金超过可用余额80%
                 return False, "仓位保证金已接近上限，不建议继续滚仓", 0.0
 
             # [NEW] 计算可用于滚仓的浮盈（使用50-70%的浮盈，更激进）
             # 根据账户规模动态调整：小账户($20-$100)使用60-70%，大账户使用50%
-            available_balance = self.client.get_futures_available_balance()
             if available_balance < 100:  # 小账户
                 reinvest_ratio = 0.65  # 65%的浮盈，更激进
             elif available_balance < 500:  # 中等账户
@@ -110,15 +677,14 @@ class AdvancedPositionManager:
                 return False, f"可用浮盈{usable_pnl:.2f} USDT太少", 0.0
 
             self.logger.info(
-                f"✅ 可以滚仓 {symbol}: 浮盈{profit_pct:.2f}% "
-                f"(${unrealized_pnl:.2f}), 可用于滚仓: ${usable_pnl:.2f} "
-                f"(使用{reinvest_ratio*100:.0f}%浮盈)"
+                "✅ 可以滚仓 %s: 浮盈%.2f%% ($%.2f), 可用于滚仓: $%.2f (使用%.0f%%浮盈)",
+                symbol, profit_pct, unrealized_pnl, usable_pnl, reinvest_ratio * 100
             )
 
             return True, "满足滚仓条件", usable_pnl
 
         except Exception as e:
-            self.logger.error(f"检查滚仓条件失败: {e}")
+            self.logger.error("检查滚仓条件失败: %s", e)
             return False, f"检查失败: {str(e)}", 0.0
 
     def execute_roll_position(self, symbol: str, usable_pnl: float,
@@ -136,44 +702,37 @@ class AdvancedPositionManager:
         """
         try:
             # 获取当前持仓方向
-            positions = self.client.get_active_positions()
-            target_position = None
-
-            for pos in positions:
-                if pos['symbol'] == symbol:
-                    target_position = pos
-                    break
+            target_position = self._get_position(symbol)
 
             if not target_position:
-                raise ValueError("无持仓，无法滚仓")
+                return {'success': False, 'error': '无持仓，无法滚仓'}
 
-            position_amt = float(target_position.get('positionAmt', 0))
-            current_price = float(target_position.get('markPrice', 0))
+            position_amt = target_position.position_amt
+            current_price = self._get_mark(symbol, target_position)
 
-            # 判断持仓方向
-            if position_amt > 0:
-                side = 'BUY'  # 多仓，继续做多
-            else:
-                side = 'SELL'  # 空仓，继续做空
+            # 判断持仓方向：多仓继续做多，空仓继续做空
+            side = _SIDE_FOR_INC[int(position_amt > 0)]
 
             # 计算滚仓数量：usable_pnl * leverage / price
             quantity = (usable_pnl * leverage) / current_price
-            quantity = round(quantity, 3)  # 精度控制
+            quantity = self._round_qty(symbol, quantity)  # 精度控制
 
-            # 设置杠杆
-            self.client.set_leverage(symbol, leverage)
+            order_params = {
+                'symbol': symbol,
+                'side': side,
+                'order_type': 'MARKET',
+                'quantity': quantity
+            }
 
-            # 执行滚仓订单
-            result = self.client.create_futures_order(
-                symbol=symbol,
-                side=side,
-                order_type='MARKET',
-                quantity=quantity
-            )
+            # 先设置杠杆（与缓存相同时跳过），再下单：并发发出时订单可能按旧杠杆成交
+            # 杠杆设置失败直接抛出，不按错误的杠杆开出滚仓订单
+            self._set_leverage(symbol, leverage)
+            result = self._call_with_retry(symbol, self.client.create_futures_order, **order_params)
+            self.invalidate_positions_cache()
 
             self.logger.info(
-                f"🔄 滚仓成功 {symbol}: {side} {quantity} @ ~${current_price:.2f}, "
-                f"使用浮盈 ${usable_pnl:.2f}, 杠杆 {leverage}x"
+                "🔄 滚仓成功 %s: %s %s @ ~$%.2f, 使用浮盈 $%.2f, 杠杆 %sx",
+                symbol, side, quantity, current_price, usable_pnl, leverage
             )
 
             return {
@@ -185,7 +744,7 @@ class AdvancedPositionManager:
             }
 
         except Exception as e:
-            self.logger.error(f"执行滚仓失败: {e}")
+            self.logger.error("执行滚仓失败: %s", e)
             return {
                 'success': False,
                 'error': str(e)
@@ -196,7 +755,10 @@ class AdvancedPositionManager:
     def pyramid_add_position(self, symbol: str, side: str, base_size_usdt: float,
                              current_position_count: int = 0,
                              max_pyramids: int = 3,
-                             reduction_factor: float = 0.5) -> Dict:
+                             reduction_factor: float = 0.5,
+                             use_kelly: bool = False,
+                             win_prob: float = 0.5,
+                             win_loss_ratio: float = 1.5) -> Dict:
         """
         金字塔加仓：每次加仓递减，形成金字塔结构
 
@@ -212,39 +774,47 @@ class AdvancedPositionManager:
             current_position_count: 当前已有多少层金字塔（从0开始）
             max_pyramids: 最多允许几层金字塔
             reduction_factor: 每次递减系数（默认0.5，即每次减半）
+            use_kelly: 是否用 kelly_size() 计算基础仓位（替代 base_size_usdt）
+            win_prob: 胜率（仅 use_kelly=True 时使用）
+            win_loss_ratio: 盈亏比（仅 use_kelly=True 时使用）
 
         Returns:
             订单结果
         """
         try:
             if current_position_count >= max_pyramids:
-                raise ValueError(f"已达到最大金字塔层数 {max_pyramids}")
+                return {'success': False, 'error': f'已达到最大金字塔层数 {max_pyramids}'}
+
+            if use_kelly:
+                base_size_usdt = self.kelly_size(symbol, win_prob, win_loss_ratio)
 
             # 计算本次加仓大小
-            current_size = base_size_usdt * (reduction_factor ** current_position_count)
+            current_size = self._pyramid_sizes(base_size_usdt, reduction_factor, max_pyramids)[current_position_count]
 
             if current_size < 10:  # 最小10 USDT
-                raise ValueError(f"加仓大小{current_size:.2f} USDT太小")
+                return {'success': False, 'error': f'加仓大小{current_size:.2f} USDT太小'}
 
             # 获取当前价格
-            ticker = self.client.get_ticker_price(symbol)
+            ticker = self._call_with_retry(symbol, self.client.get_ticker_price, symbol)
             price = float(ticker['price'])
 
             # 计算数量
             quantity = current_size / price
-            quantity = round(quantity, 3)
+            quantity = self._round_qty(symbol, quantity)
 
             # 执行加仓
-            result = self.client.create_futures_order(
+            result = self._call_with_retry(
+                symbol, self.client.create_futures_order,
                 symbol=symbol,
                 side=side,
                 order_type='MARKET',
                 quantity=quantity
             )
+            self.invalidate_positions_cache()
 
             self.logger.info(
-                f"📐 金字塔加仓 {symbol} 第{current_position_count + 1}层: "
-                f"{side} {quantity} @ ~${price:.2f} (${current_size:.2f} USDT)"
+                "📐 金字塔加仓 %s 第%d层: %s %s @ ~$%.2f ($%.2f USDT)",
+                symbol, current_position_count + 1, side, quantity, price, current_size
             )
 
             return {
@@ -256,12 +826,19 @@ class AdvancedPositionManager:
             }
 
         except Exception as e:
-            self.logger.error(f"金字塔加仓失败: {e}")
+            self.logger.error("金字塔加仓失败: %s", e)
             return {
                 'success': False,
                 'error': str(e)
             }
 
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _pyramid_sizes(base_size_usdt: float, reduction_factor: float,
+                       max_pyramids: int) -> Tuple[float, ...]:
+        """各层金字塔的加仓金额表（按参数组合缓存，同一计划下各层金额逐位一致）"""
+        return tuple(base_size_usdt * reduction_factor ** i for i in range(max_pyramids))
+
     # ==================== 3. 多级止盈策略 ====================
 
     def set_multiple_take_profits(self, symbol: str, side: str, entry_price: float,
@@ -286,53 +863,37 @@ class AdvancedPositionManager:
             止盈订单结果列表
         """
         try:
-            results = []
-            remaining_qty = total_quantity
-
-            # 确定止盈方向
-            tp_side = 'SELL' if side == 'BUY' else 'BUY'
+            if not tp_levels:
+                return []
 
-            for level in tp_levels:
-                profit_pct = level['profit_pct']
-                close_pct = level['close_pct']
+            plan = self.build_tp_plan(symbol, side, entry_price, total_quantity, tp_levels)
+            tp_prices = plan.prices
+            quantities = plan.quantities
 
-                # 计算止盈价格
-                if side == 'BUY':
-                    tp_price = entry_price * (1 + profit_pct / 100)
-                else:
-                    tp_price = entry_price * (1 - profit_pct / 100)
-
-                # 计算本级止盈数量
-                qty = remaining_qty * (close_pct / 100)
-                qty = round(qty, 3)
-
-                # 创建止盈订单
-                order = self.client.create_take_profit_order(
-                    symbol=symbol,
-                    side=tp_side,
-                    quantity=qty,
-                    stop_price=tp_price,
-                    reduce_only=True
-                )
+            # 一次批量请求提交各级止盈单（结果顺序与tp_levels一致）
+            orders = self._place_take_profit_orders(
+                symbol, plan.side,
+                [(float(qty), float(tp_price)) for qty, tp_price in zip(quantities, tp_prices)]
+            )
 
+            results = []
+            for level, qty, tp_price, order in zip(tp_levels, quantities, tp_prices, orders):
                 results.append({
-                    'profit_pct': profit_pct,
-                    'price': tp_price,
-                    'quantity': qty,
+                    'profit_pct': level['profit_pct'],
+                    'price': float(tp_price),
+                    'quantity': float(qty),
                     'order': order
                 })
 
-                remaining_qty -= qty
-
                 self.logger.info(
-                    f"📈 设置止盈 Level {len(results)}: "
-                    f"盈利{profit_pct}%时平{close_pct}%仓位 @ ${tp_price:.2f}"
+                    "📈 设置止盈 Level %d: 盈利%s%%时平%s%%仓位 @ $%.2f",
+                    len(results), level['profit_pct'], level['close_pct'], tp_price
                 )
 
             return results
 
         except Exception as e:
-            self.logger.error(f"设置多级止盈失败: {e}")
+            self.logger.error("设置多级止盈失败: %s", e)
             return []
 
     # ==================== 4. 移动止损到盈亏平衡 ====================
@@ -356,51 +917,56 @@ class AdvancedPositionManager:
         """
         try:
             # 获取当前持仓
-            positions = self.client.get_active_positions()
-            target_position = None
-
-            for pos in positions:
-                if pos['symbol'] == symbol:
-                    target_position = pos
-                    break
+            target_position = self._get_position(symbol)
 
             if not target_position:
                 return {'success': False, 'error': '无持仓'}
 
-            position_amt = float(target_position.get('positionAmt', 0))
-            mark_price = float(target_position.get('markPrice', 0))
+            position_amt = target_position.position_amt
+            mark_price = self._get_mark(symbol, target_position)
 
-            # 检查是否达到盈利触发条件
-            if position_amt > 0:  # 多仓
-                profit_pct = ((mark_price - entry_price) / entry_price) * 100
-                new_stop_price = entry_price * (1 + breakeven_offset_pct / 100)
-                stop_side = 'SELL'
-            else:  # 空仓
-                profit_pct = ((entry_price - mark_price) / entry_price) * 100
-                new_stop_price = entry_price * (1 - breakeven_offset_pct / 100)
-                stop_side = 'BUY'
+            # 检查是否达到盈利触发条件（direction: 多仓1，空仓-1）
+            is_long = int(position_amt > 0)
+            direction = 2 * is_long - 1
+            profit_pct = direction * ((mark_price - entry_price) / entry_price) * 100
+            new_stop_price = self._round_price(
+                symbol, entry_price * (1 + direction * breakeven_offset_pct / 100)
+            )
+            stop_side = _SIDE_FOR_CLOSE[is_long]
 
-            if profit_pct < profit_trigger_pct:
+            if _to_bp(profit_pct) < _to_bp(profit_trigger_pct):
                 return {
                     'success': False,
                     'error': f'盈利{profit_pct:.2f}%未达到触发条件{profit_trigger_pct}%'
                 }
 
-            # 取消旧止损订单
-            self.client.cancel_stop_orders(symbol)
+            # 以交易所当前挂单为准找出该方向的全部止损单：登记的ID可能已失效
+            # （持仓经其他途径平仓、止损已触发），新持仓也可能带着开仓时挂的止损单
+            open_orders = self._call_with_retry(symbol, self.client.get_futures_open_orders, symbol)
+            old_stop_ids = [o['orderId'] for o in open_orders
+                            if o.get('type') in _STOP_LOSS_TYPES and o.get('side') == stop_side]
+            if self._stop_order_ids.get(symbol) not in old_stop_ids:
+                self._stop_order_ids.pop(symbol, None)
 
             # 设置新止损到盈亏平衡点
-            order = self.client.create_stop_loss_order(
+            order = self._call_with_retry(
+                symbol, self.client.create_stop_loss_order,
                 symbol=symbol,
                 side=stop_side,
                 quantity=abs(position_amt),
                 stop_price=new_stop_price,
                 reduce_only=True
             )
+            self._remember_stop_order(symbol, order)
+
+            # 新止损生效后再撤销旧止损，替换过程中仓位始终有止损保护；
+            # 合约无cancelReplace接口，撤单放到后台线程，不占用本次调用的往返时间
+            for old_stop_id in old_stop_ids:
+                self._executor.submit(self._cancel_replaced_stop, symbol, old_stop_id)
 
             self.logger.info(
-                f"🛡️ 止损已移至盈亏平衡 {symbol}: ${new_stop_price:.2f} "
-                f"(成本${entry_price:.2f}, 当前盈利{profit_pct:.2f}%)"
+                "🛡️ 止损已移至盈亏平衡 %s: $%.2f (成本$%.2f, 当前盈利%.2f%%)",
+                symbol, new_stop_price, entry_price, profit_pct
             )
 
             return {
@@ -411,12 +977,101 @@ class AdvancedPositionManager:
             }
 
         except Exception as e:
-            self.logger.error(f"移动止损到盈亏平衡失败: {e}")
+            self.logger.error("移动止损到盈亏平衡失败: %s", e)
             return {
                 'success': False,
                 'error': str(e)
             }
 
+    def _place_take_profit_orders(self, symbol: str, tp_side: str,
+                                  legs: List[Tuple[float, float]]) -> List[Dict]:
+        """
+        挂一组只减仓的止盈单（TAKE_PROFIT_MARKET）
+
+        优先通过 batchOrders 一次请求提交；整批请求失败时回退为逐单提交
+
+        Args:
+            symbol: 交易对
+            tp_side: 止盈下单方向
+            legs: [(数量, 触发价格), ...]
+
+        Returns:
+            与legs一一对应的订单结果；单个订单失败时为 {'code': ..., 'msg': ...}
+        """
+        orders = [
+            {
+                'symbol': symbol,
+                'side': tp_side,
+                'type': 'TAKE_PROFIT_MARKET',
+                'quantity': qty,
+                'stopPrice': stop_price,
+                'reduceOnly': True
+            }
+            for qty, stop_price in legs
+        ]
+        try:
+            results = self._call_with_retry(symbol, self.client.create_futures_batch_orders, orders)
+            self._track_orders(symbol, results)
+            return results
+        except Exception as e:
+            self.logger.warning("批量挂止盈单失败，改为逐单提交: %s", e)
+
+        results = []
+        for qty, stop_price in legs:
+            try:
+                results.append(self._call_with_retry(
+                    symbol, self.client.create_futures_order,
+                    symbol=symbol,
+                    side=tp_side,
+                    order_type='TAKE_PROFIT_MARKET',
+                    quantity=qty,
+                    reduce_only=True,
+                    stopPrice=stop_price
+                ))
+            except Exception as e:
+                results.append({'code': -1, 'msg': str(e)})
+        self._track_orders(symbol, results)
+        return results
+
+    def build_tp_plan(self, symbol: str, side: str, entry_price: float,
+                      total_quantity: float, tp_levels: List[Dict]) -> TPPlan:
+        """
+        生成多级止盈计划（相同参数直接返回缓存结果）
+
+        Args:
+            symbol: 交易对
+            side: 原始方向 BUY/SELL
+            entry_price: 入场价格
+            total_quantity: 总持仓数量
+            tp_levels: 止盈级别列表，格式同 set_multiple_take_profits
+
+        Returns:
+            TPPlan
+        """
+        levels = tuple((float(level['profit_pct']), float(level['close_pct'])) for level in tp_levels)
+        return _compile_tp_plan(side, float(entry_price), float(total_quantity),
+                                levels, self._get_symbol_filters(symbol))
+
+    def _cancel_replaced_stop(self, symbol: str, order_id: int):
+        """撤销已被新止损单替换的旧止损单（在后台线程中执行）"""
+        try:
+            self._call_with_retry(symbol, self.client.cancel_futures_order, symbol, order_id=order_id)
+            self._open_order_ids.get(symbol, set()).discard(order_id)
+        except Exception as e:
+            self.logger.warning("撤销旧止损单%s失败: %s", order_id, e)
+
+    def _remember_stop_order(self, symbol: str, order: Dict):
+        """记录新建止损单的orderId"""
+        if isinstance(order, dict) and order.get('orderId') is not None:
+            self._stop_order_ids[symbol] = order['orderId']
+            self._track_orders(symbol, [order])
+
+    def _track_orders(self, symbol: str, orders: List[Dict]):
+        """登记成功挂出的订单ID"""
+        order_ids = [o['orderId'] for o in orders if isinstance(o, dict) and o.get('orderId') is not None]
+        if order_ids:
+            self._open_order_ids.setdefault(symbol, set()).update(order_ids)
+
     # ==================== 5. ATR自适应止损 ====================
 
     def set_atr_based_stop_loss(self, symbol: str, side: str, entry_price: float,
@@ -440,12 +1095,9 @@ class AdvancedPositionManager:
         """
         try:
             # 获取ATR
-            klines = self.client.get_klines(symbol, '1h', limit=50)
-            analysis = self.analyzer.get_comprehensive_analysis(klines)
-
-            atr = analysis.get('atr', 0)
+            atr, _ = self._get_atr(symbol, '1h')
             if atr == 0:
-                raise ValueError("ATR计算失败")
+                return {'success': False, 'error': 'ATR计算失败'}
 
             # 计算止损距离
             stop_distance = atr * atr_multiplier
@@ -457,21 +1109,24 @@ class AdvancedPositionManager:
             else:
                 stop_price = entry_price + stop_distance
                 stop_side = 'BUY'
+            stop_price = self._round_price(symbol, stop_price)
 
             # 创建止损订单
-            order = self.client.create_stop_loss_order(
+            order = self._call_with_retry(
+                symbol, self.client.create_stop_loss_order,
                 symbol=symbol,
                 side=stop_side,
                 quantity=quantity,
                 stop_price=stop_price,
                 reduce_only=True
             )
+            self._remember_stop_order(symbol, order)
 
             stop_distance_pct = (stop_distance / entry_price) * 100
 
             self.logger.info(
-                f"📊 ATR自适应止损 {symbol}: ${stop_price:.2f} "
-                f"(ATR={atr:.2f}, 距离{stop_distance_pct:.2f}%)"
+                "📊 ATR自适应止损 %s: $%.2f (ATR=%.2f, 距离%.2f%%)",
+                symbol, stop_price, atr, stop_distance_pct
             )
 
             return {
@@ -483,7 +1138,7 @@ class AdvancedPositionManager:
             }
 
         except Exception as e:
-            self.logger.error(f"设置ATR止损失败: {e}")
+            self.logger.error("设置ATR止损失败: %s", e)
             return {
                 'success': False,
                 'error': str(e)
@@ -511,35 +1166,30 @@ class AdvancedPositionManager:
         """
         try:
             # 获取ATR和价格
-            klines = self.client.get_klines(symbol, '1h', limit=50)
-            analysis = self.analyzer.get_comprehensive_analysis(klines)
-
-            atr = analysis.get('atr', 0)
-            current_price = float(klines[-1][4])  # 收盘价
+            atr, current_price = self._get_atr(symbol, '1h')  # 最新收盘价
 
             if atr == 0 or current_price == 0:
-                raise ValueError("数据不足")
+                return {'success': False, 'error': '数据不足'}
 
             # 计算波动率百分比
             volatility_pct = (atr / current_price) * 100
 
-            # 波动率分级：
-            # < 1%: 低波动 -> 高杠杆
-            # 1-3%: 中波动 -> 中杠杆
-            # > 3%: 高波动 -> 低杠杆
-            if volatility_pct < 1.0:
-                recommended_leverage = min(max_leverage, base_leverage + 2)
-            elif volatility_pct < 3.0:
-                recommended_leverage = base_leverage
-            else:
-                recommended_leverage = max(min_leverage, base_leverage - 2)
+            recommended_leverage = _leverage_for_vol(volatility_pct, base_leverage,
+                                                     min_leverage, max_leverage)
 
-            # 设置杠杆
-            result = self.client.set_leverage(symbol, recommended_leverage)
+            # 设置杠杆（与当前杠杆相同则跳过请求）
+            result = self._set_leverage(symbol, recommended_leverage)
+            if result is None:
+                return {
+                    'success': True,
+                    'leverage': recommended_leverage,
+                    'volatility_pct': volatility_pct,
+                    'cached': True
+                }
 
             self.logger.info(
-                f"⚖️ 动态调整杠杆 {symbol}: {recommended_leverage}x "
-                f"(波动率{volatility_pct:.2f}%)"
+                "⚖️ 动态调整杠杆 %s: %sx (波动率%.2f%%)",
+                symbol, recommended_leverage, volatility_pct
             )
 
             return {
@@ -550,12 +1200,25 @@ class AdvancedPositionManager:
             }
 
         except Exception as e:
-            self.logger.error(f"动态调整杠杆失败: {e}")
+            self.logger.error("动态调整杠杆失败: %s", e)
             return {
                 'success': False,
                 'error': str(e)
             }
 
+    def _set_leverage(self, symbol: str, leverage: int) -> Optional[Dict]:
+        """
+        设置杠杆（幂等）：与上次成功设置的值相同时跳过REST请求
+
+        Returns:
+            API结果；跳过时返回None
+        """
+        if self._last_leverage.get(symbol) == leverage:
+            return None
+        result = self._call_with_retry(symbol, self.client.set_leverage, symbol, leverage)
+        self._last_leverage[symbol] = leverage
+        return result
+
     # ==================== 7. 对冲策略 ====================
 
     def open_hedge_position(self, symbol: str, hedge_ratio: float = 0.5) -> Dict:
@@ -571,40 +1234,36 @@ class AdvancedPositionManager:
         """
         try:
             # 获取当前持仓
-            positions = self.client.get_active_positions()
-            target_position = None
-
-            for pos in positions:
-                if pos['symbol'] == symbol:
-                    target_position = pos
-                    break
+            target_position = self._get_position(symbol)
 
             if not target_position:
                 return {'success': False, 'error': '无持仓可对冲'}
 
-            position_amt = float(target_position.get('positionAmt', 0))
+            position_amt = target_position.position_amt
 
             if position_amt == 0:
                 return {'success': False, 'error': '持仓数量为0'}
 
             # 计算对冲数量和方向
             hedge_quantity = abs(position_amt) * hedge_ratio
-            hedge_quantity = round(hedge_quantity, 3)
+            hedge_quantity = self._round_qty(symbol, hedge_quantity)
 
-            hedge_side = 'SELL' if position_amt > 0 else 'BUY'
+            hedge_side = _SIDE_FOR_CLOSE[int(position_amt > 0)]
 
             # 执行对冲订单（需要开启双向持仓模式）
-            order = self.client.create_futures_order(
+            order = self._call_with_retry(
+                symbol, self.client.create_futures_order,
                 symbol=symbol,
                 side=hedge_side,
                 order_type='MARKET',
                 quantity=hedge_quantity,
                 position_side='SHORT' if hedge_side == 'SELL' else 'LONG'
             )
+            self.invalidate_positions_cache()
 
             self.logger.info(
-                f"🔰 开对冲仓位 {symbol}: {hedge_side} {hedge_quantity} "
-                f"(对冲{hedge_ratio * 100}%)"
+                "🔰 开对冲仓位 %s: %s %s (对冲%s%%)",
+                symbol, hedge_side, hedge_quantity, hedge_ratio * 100
             )
 
             return {
@@ -615,7 +1274,7 @@ class AdvancedPositionManager:
             }
 
         except Exception as e:
-            self.logger.error(f"开对冲仓位失败: {e}")
+            self.logger.error("开对冲仓位失败: %s", e)
             return {
                 'success': False,
                 'error': str(e)
@@ -623,66 +1282,75 @@ class AdvancedPositionManager:
 
     # ==================== 8. 仓位再平衡 ====================
 
-    def rebalance_position_size(self, symbol: str, target_size_usdt: float) -> Dict:
+    def rebalance_position_size(self, symbol: str, target_size_usdt: float,
+                                use_kelly: bool = False,
+                                win_prob: float = 0.5,
+                                win_loss_ratio: float = 1.5,
+                                min_absolute_usdt: float = 10.0) -> Dict:
         """
         仓位再平衡：调整仓位到目标大小
 
+        只有当偏离目标的比例超过 rebalance_drift_pct_threshold（默认10%），
+        且差额不小于 min_absolute_usdt 时才下单，避免频繁的小额调整
+
         Args:
             symbol: 交易对
             target_size_usdt: 目标仓位大小（USDT）
+            use_kelly: 是否用 kelly_size() 计算目标仓位（替代 target_size_usdt）
+            win_prob: 胜率（仅 use_kelly=True 时使用）
+            win_loss_ratio: 盈亏比（仅 use_kelly=True 时使用）
+            min_absolute_usdt: 最小调整金额（USDT）
 
         Returns:
             调整结果
         """
         try:
-            # 获取当前持仓
-            positions = self.client.get_active_positions()
-            target_position = None
+            if use_kelly:
+                target_size_usdt = self.kelly_size(symbol, win_prob, win_loss_ratio)
 
-            for pos in positions:
-                if pos['symbol'] == symbol:
-                    target_position = pos
-                    break
+            # 获取当前持仓
+            target_position = self._get_position(symbol)
 
             if not target_position:
                 return {'success': False, 'error': '无持仓'}
 
-            position_amt = float(target_position.get('positionAmt', 0))
-            mark_price = float(target_position.get('markPrice', 0))
+            position_amt = target_position.position_amt
+            mark_price = self._get_mark(symbol, target_position)
             current_size_usdt = abs(position_amt) * mark_price
 
             # 计算需要调整的量
             diff_usdt = target_size_usdt - current_size_usdt
 
-            if abs(diff_usdt) < 10:  # 差异小于10 USDT不调整
+            drift_pct = float(self._drift_pct(diff_usdt, target_size_usdt))
+
+            if (_to_bp(drift_pct) < _to_bp(self.rebalance_drift_pct_threshold)
+                    or abs(diff_usdt) < min_absolute_usdt):
                 return {
                     'success': True,
-                    'message': f'仓位差异{diff_usdt:.2f} USDT太小，无需调整'
+                    'message': f'仓位偏离{drift_pct:.1f}% ({diff_usdt:.2f} USDT)，无需调整'
                 }
 
-            # 确定调整方向
-            if diff_usdt > 0:  # 需要加仓
-                side = 'BUY' if position_amt > 0 else 'SELL'
-                quantity = abs(diff_usdt / mark_price)
-            else:  # 需要减仓
-                side = 'SELL' if position_amt > 0 else 'BUY'
-                quantity = abs(diff_usdt / mark_price)
+            # 确定调整方向：差额为正加仓（同向），为负减仓（反向）
+            is_long = int(position_amt > 0)
+            side = (_SIDE_FOR_INC if diff_usdt > 0 else _SIDE_FOR_CLOSE)[is_long]
+            quantity = abs(diff_usdt / mark_price)
 
-            quantity = round(quantity, 3)
+            quantity = self._round_qty(symbol, quantity)
 
             # 执行调整
-            order = self.client.create_futures_order(
+            order = self._call_with_retry(
+                symbol, self.client.create_futures_order,
                 symbol=symbol,
                 side=side,
                 order_type='MARKET',
                 quantity=quantity,
                 reduce_only=(diff_usdt < 0)  # 减仓时设置reduce_only
             )
+            self.invalidate_positions_cache()
 
             self.logger.info(
-                f"⚖️ 仓位再平衡 {symbol}: "
-                f"${current_size_usdt:.2f} -> ${target_size_usdt:.2f} "
-                f"({side} {quantity})"
+                "⚖️ 仓位再平衡 %s: $%.2f -> $%.2f (偏离%.1f%%, 差额$%.2f, %s %s)",
+                symbol, current_size_usdt, target_size_usdt, drift_pct, diff_usdt, side, quantity
             )
 
             return {
@@ -693,12 +1361,19 @@ class AdvancedPositionManager:
             }
 
         except Exception as e:
-            self.logger.error(f"仓位再平衡失败: {e}")
+            self.logger.error("仓位再平衡失败: %s", e)
             return {
                 'success': False,
                 'error': str(e)
             }
 
+    @staticmethod
+    def _drift_pct(diff_usdt, target_size_usdt):
+        """相对目标仓位的偏离百分比（目标为0时视为100%偏离）"""
+        return np.where(target_size_usdt > 0,
+                        np.abs(diff_usdt) / np.where(target_size_usdt > 0, target_size_usdt, 1) * 100,
+                        100.0)
+
     # ==================== 9. 资金费率套利 ====================
 
     def check_funding_arbitrage(self, symbol: str,
@@ -716,8 +1391,13 @@ class AdvancedPositionManager:
             (是否有套利机会, 建议操作, 费率)
         """
         try:
-            funding_info = self.client.get_current_funding_rate(symbol)
-            funding_rate = float(funding_info.get('fundingRate', 0))
+            # 优先读取内存中的全市场资金费率（实时快照或批量查询刷新），冷启动时才单独请求
+            funding_rate = None
+            if time.time() - self._funding_rates_time < self._funding_rates_ttl:
+                funding_rate = self._funding_rates.get(symbol)
+            if funding_rate is None:
+                funding_info = self._call_with_retry(symbol, self.client.get_current_funding_rate, symbol)
+                funding_rate = float(funding_info.get('fundingRate', 0))
 
             # 正费率：多头支付空头 -> 开空单套利
             # 负费率：空头支付多头 -> 开多单套利
@@ -729,9 +1409,50 @@ class AdvancedPositionManager:
                 return False, 'HOLD', funding_rate
 
         except Exception as e:
-            self.logger.error(f"检查资金费率失败: {e}")
+            self.logger.error("检查资金费率失败: %s", e)
             return False, 'ERROR', 0.0
 
+    def _get_funding_rates(self) -> Dict[str, float]:
+        """获取全市场资金费率（TTL内复用缓存）"""
+        now = time.time()
+        if now - self._funding_rates_time >= self._funding_rates_ttl:
+            self._funding_rates = self.client.get_all_funding_rates()
+            self._funding_rates_time = now
+        return self._funding_rates
+
+    def check_funding_arbitrage_bulk(self, symbols: List[str],
+                                     threshold_rate: float = 0.01) -> List[Tuple[str, str, float]]:
+        """
+        批量检查资金费率套利机会（一次请求覆盖所有交易对）
+
+        Args:
+            symbols: 交易对列表
+            threshold_rate: 费率阈值（默认0.01即1%）
+
+        Returns:
+            有套利机会的 [(交易对, 建议操作, 费率), ...]
+        """
+        try:
+            all_rates = self._get_funding_rates()
+            symbols_arr = np.array([s for s in symbols if s in all_rates])
+            if symbols_arr.size == 0:
+                return []
+            rates = np.array([all_rates[s] for s in symbols_arr], dtype=np.float64)
+
+            # 正费率 -> 开空套利；负费率 -> 开多套利
+            sell_mask = rates > threshold_rate
+            buy_mask = rates < -threshold_rate
+
+            opportunities = [(str(s), 'SELL', float(r))
+                             for s, r in zip(symbols_arr[sell_mask], rates[sell_mask])]
+            opportunities += [(str(s), 'BUY', float(r))
+                              for s, r in zip(symbols_arr[buy_mask], rates[buy_mask])]
+            return opportunities
+
+        except Exception as e:
+            self.logger.error("批量检查资金费率失败: %s", e)
+            return []
+
     # ==================== 10. 分批止盈 (V2.0新增) ====================
 
     def setup_scale_out_take_profits(self, symbol: str, entry_price: float,
@@ -775,72 +1496,66 @@ class AdvancedPositionManager:
             orders_created = []
             target_prices = []
             remaining_pct = 100.0  # 剩余仓位百分比
+            planned = []  # [(目标序号, profit_pct, close_pct, 目标价格, 平仓数量)]
 
-            self.logger.info(f"\n💰 [分批止盈] 开始设置 {symbol} 止盈计划:")
+            # 逐个目标的明细日志较多，INFO未启用时整段跳过
+            verbose = self.logger.isEnabledFor(logging.INFO)
+            self.logger.info("\n💰 [分批止盈] 开始设置 %s 止盈计划:", symbol)
 
-            for i, target in enumerate(targets, 1):
-                profit_pct = target.get('profit_pct', 0)
-                close_pct = target.get('close_pct', 0)
+            # 先计算所有目标的价格与数量，不调用API（目标预处理结果按配置缓存）
+            legs, skipped = _compile_scale_out_targets(tuple(
+                (target.get('profit_pct', 0), target.get('close_pct', 0)) for target in targets
+            ))
+            for profit_pct, close_pct in skipped:
+                self.logger.warning("  ⚠️  跳过无效目标: profit_pct=%s, close_pct=%s", profit_pct, close_pct)
 
-                if profit_pct <= 0 or close_pct <= 0:
-                    self.logger.warning(f"  ⚠️  跳过无效目标: profit_pct={profit_pct}, close_pct={close_pct}")
-                    continue
+            price_index = 3 if side == 'LONG' else 4
+            for leg in legs:
+                i, profit_pct, close_pct, _, _, is_last = leg
+                target_price = self._round_price(symbol, entry_price * leg[price_index])
 
-                # 计算目标价格
-                if side == 'LONG':
-                    target_price = entry_price * (1 + profit_pct / 100)
-                else:  # SHORT
-                    target_price = entry_price * (1 - profit_pct / 100)
-
-                # 计算平仓数量（基于剩余仓位百分比）
-                if i == len(targets):
-                    # 最后一个目标：平所有剩余仓位
-                    close_quantity = total_quantity * (remaining_pct / 100)
-                else:
-                    # 中间目标：平指定百分比
-                    close_quantity = total_quantity * (close_pct / 100)
-
-                # 确保数量精度（Binance要求至少3位小数）
-                close_quantity = round(close_quantity, 3)
-
-                if close_quantity < 0.001:
-                    self.logger.warning(f"  ⚠️  跳过数量过小的订单: {close_quantity}")
-                    continue
+                # 计算平仓数量：最后一个目标平所有剩余仓位，中间目标平指定百分比
+                close_quantity = total_quantity * ((remaining_pct if is_last else close_pct) / 100)
 
-                # 创建止盈限价单（TAKE_PROFIT_MARKET类型）
-                try:
-                    order = self.client.create_take_profit_order(
-                        symbol=symbol,
-                        side=close_side,
-                        quantity=close_quantity,
-                        stop_price=target_price,
-                        reduce_only=True
-                    )
+                # 按交易对精度取整
+                close_quantity = self._round_qty(symbol, close_quantity)
 
-                    orders_created.append(order)
-                    target_prices.append(target_price)
+                if close_quantity <= 0:
+                    self.logger.warning("  ⚠️  跳过数量过小的订单: %s", close_quantity)
+                    continue
 
-                    self.logger.info(
-                        f"  ✅ 目标{i}: 盈利{profit_pct}%时 @ ${target_price:.2f} "
-                        f"平仓{close_pct}% ({close_quantity:.3f}个)"
-                    )
+                planned.append((i, profit_pct, close_pct, target_price, close_quantity))
+
+                # 更新剩余仓位
+                remaining_pct -= close_pct
 
-                    # 更新剩余仓位
-                    remaining_pct -= close_pct
+            # 一次批量请求创建所有止盈单（TAKE_PROFIT_MARKET类型）
+            orders = self._place_take_profit_orders(
+                symbol, close_side,
+                [(close_quantity, target_price) for _, _, _, target_price, close_quantity in planned]
+            )
 
-                except Exception as e:
-                    self.logger.error(f"  ❌ 创建止盈订单{i}失败: {e}")
+            for (i, profit_pct, close_pct, target_price, close_quantity), order in zip(planned, orders):
+                if not order.get('orderId'):
+                    self.logger.error("  ❌ 创建止盈订单%d失败: %s", i, order.get('msg', order))
                     continue
 
+                orders_created.append(order)
+                target_prices.append(target_price)
+
+                if verbose:
+                    self.logger.info(
+                        "  ✅ 目标%d: 盈利%s%%时 @ $%.2f 平仓%s%% (%.3f个)",
+                        i, profit_pct, target_price, close_pct, close_quantity
+                    )
+
             if len(orders_created) == 0:
                 return {
                     'success': False,
                     'error': '未能创建任何止盈订单'
                 }
 
-            self.logger.info(
-                f"🎯 [分批止盈] 完成！共设置{len(orders_created)}个止盈目标\n"
-            )
+            self.logger.info("🎯 [分批止盈] 完成！共设置%d个止盈目标\n", len(orders_created))
 
             return {
                 'success': True,
@@ -850,7 +1565,7 @@ class AdvancedPositionManager:
             }
 
         except Exception as e:
-            self.logger.error(f"设置分批止盈失败: {e}")
+            self.logger.error("设置分批止盈失败: %s", e)
             return {
                 'success': False,
                 'error': str(e)
@@ -902,15 +1617,18 @@ class AdvancedPositionManager:
             close_side = 'SELL' if side == 'LONG' else 'BUY'
 
             self.logger.info(
-                f"\n🔄 [追踪止损] 设置 {symbol}:"
-                f"\n  方向: {side} → 止损方向: {close_side}"
-                f"\n  数量: {quantity:.3f}"
-                f"\n  回撤率: {callback_rate_pct}%"
-                f"\n  激活价: {activation_price if activation_price else '立即激活'}"
+                "\n🔄 [追踪止损] 设置 %s:"
+                "\n  方向: %s → 止损方向: %s"
+                "\n  数量: %.3f"
+                "\n  回撤率: %s%%"
+                "\n  激活价: %s",
+                symbol, side, close_side, quantity, callback_rate_pct,
+                activation_price if activation_price else '立即激活'
             )
 
             # 创建追踪止损订单
-            order = self.client.create_trailing_stop_order(
+            order = self._call_with_retry(
+                symbol, self.client.create_trailing_stop_order,
                 symbol=symbol,
                 side=close_side,
                 quantity=quantity,
@@ -918,8 +1636,9 @@ class AdvancedPositionManager:
                 activation_price=activation_price,
                 reduce_only=True
             )
+            self._track_orders(symbol, [order])
 
-            self.logger.info(f"✅ [追踪止损] 设置成功！订单ID: {order.get('orderId')}\n")
+            self.logger.info("✅ [追踪止损] 设置成功！订单ID: %s\n", order.get('orderId'))
 
             return {
                 'success': True,
@@ -929,7 +1648,7 @@ class AdvancedPositionManager:
             }
 
         except Exception as e:
-            self.logger.error(f"设置追踪止损失败: {e}")
+            self.logger.error("设置追踪止损失败: %s", e)
             return {
                 'success': False,
                 'error': str(e)
@@ -955,15 +1674,33 @@ class AdvancedPositionManager:
         Returns:
             {
                 'success': bool,
-                'cancelled_count': 取消的订单数量,
+                'cancelled_count': 取消的订单数量（allOpenOrders不返回数量时为None）,
                 'details': 详细信息
             }
         """
         try:
-            self.logger.info(f"\n🧹 [订单清理] 开始清理 {symbol} 所有挂单...")
-
-            # 取消所有期货订单
-            result = self.client.cancel_all_futures_orders(symbol)
+            self.logger.info("\n🧹 [订单清理] 开始清理 %s 所有挂单...", symbol)
+
+            tracked_ids = self._open_order_ids.pop(symbol, set())
+
+            # 取消所有期货订单（一次 DELETE allOpenOrders 请求）
+            try:
+                result = self._call_with_retry(symbol, self.client.cancel_all_futures_orders, symbol)
+            except Exception as e:
+                error_str = str(e).lower()
+                if not tracked_ids or 'no such order' in error_str or 'unknown order' in error_str:
+                    raise
+                # 整体撤单失败：回退为逐个撤销本管理器登记的订单
+                self.logger.warning("批量撤单失败，改为逐单撤销已登记的%d个订单: %s", len(tracked_ids), e)
+                result = []
+                for order_id in tracked_ids:
+                    try:
+                        result.append(self._call_with_retry(
+                            symbol, self.client.cancel_futures_order, symbol, order_id=order_id
+                        ))
+                    except Exception as cancel_error:
+                        self.logger.warning("撤销订单%s失败: %s", order_id, cancel_error)
+            self._stop_order_ids[symbol] = None
 
             # 统计取消的订单数
             cancelled_count = 0
@@ -971,16 +1708,20 @@ class AdvancedPositionManager:
                 # 单个订单响应
                 if result.get('orderId'):
                     cancelled_count = 1
+                elif str(result.get('code')) == '200':
+                    # allOpenOrders只返回确认信息，不含数量；登记表不包括引擎挂出的止盈止损单，
+                    # 无法据此推算，数量记为未知
+                    cancelled_count = None
             elif isinstance(result, list):
                 # 多个订单响应
                 cancelled_count = len(result)
 
-            if cancelled_count > 0:
-                self.logger.info(
-                    f"✅ [订单清理] 完成！已取消 {cancelled_count} 个挂单\n"
-                )
+            if cancelled_count is None:
+                self.logger.info("✅ [订单清理] 完成！交易所已确认撤销全部挂单\n")
+            elif cancelled_count > 0:
+                self.logger.info("✅ [订单清理] 完成！已取消 %d 个挂单\n", cancelled_count)
             else:
-                self.logger.info(f"ℹ️  [订单清理] 无挂单需要取消\n")
+                self.logger.info("ℹ️  [订单清理] 无挂单需要取消\n")
 
             return {
                 'success': True,
@@ -992,14 +1733,14 @@ class AdvancedPositionManager:
             # 如果错误是"没有挂单"，这实际上是成功的情况
             error_str = str(e).lower()
             if 'no such order' in error_str or 'unknown order' in error_str:
-                self.logger.info(f"ℹ️  [订单清理] 无挂单需要取消\n")
+                self.logger.info("ℹ️  [订单清理] 无挂单需要取消\n")
                 return {
                     'success': True,
                     'cancelled_count': 0,
                     'details': 'No pending orders'
                 }
 
-            self.logger.error(f"❌ [订单清理] 失败: {e}\n")
+            self.logger.error("❌ [订单清理] 失败: %s\n", e)
             return {
                 'success': False,
                 'error': str(e),
@@ -1044,34 +1785,47 @@ class AdvancedPositionManager:
         }
 
         self.logger.info(
-            f"\n🎯 [完整仓位管理] 开始为 {symbol} 设置止盈止损计划"
-            f"\n  入场价: ${entry_price:.2f}"
-            f"\n  仓位: {side} {abs(position_amt):.3f}"
+            "\n🎯 [完整仓位管理] 开始为 %s 设置止盈止损计划"
+            "\n  入场价: $%.2f"
+            "\n  仓位: %s %.3f",
+            symbol, entry_price, side, abs(position_amt)
         )
 
-        # 1. 设置分批止盈
-        if take_profit_targets:
-            tp_result = self.setup_scale_out_take_profits(
-                symbol, entry_price, position_amt, side, take_profit_targets
-            )
+        # 1+2. 分批止盈与追踪止损互不依赖，并发提交
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            tp_future = None
+            ts_future = None
+            if take_profit_targets:
+                tp_future = executor.submit(
+                    self.setup_scale_out_take_profits,
+                    symbol, entry_price, position_amt, side, take_profit_targets
+                )
+            if trailing_stop_config:
+                ts_future = executor.submit(
+                    self.setup_trailing_stop,
+                    symbol, position_amt, side,
+                    callback_rate_pct=trailing_stop_config.get('callback_rate_pct', 1.5),
+                    activation_price=trailing_stop_config.get('activation_price')
+                )
+
+        if tp_future is not None:
+            tp_result = tp_future.result()
             result['take_profit_result'] = tp_result
             if not tp_result.get('success'):
-                self.logger.warning(f"⚠️  分批止盈设置失败")
+                self.logger.warning("⚠️  分批止盈设置失败")
                 result['success'] = False
 
-        # 2. 设置追踪止损
-        if trailing_stop_config:
-            ts_result = self.setup_trailing_stop(
-                symbol, position_amt, side,
-                callback_rate_pct=trailing_stop_config.get('callback_rate_pct', 1.5),
-                activation_price=trailing_stop_config.get('activation_price')
-            )
+        if ts_future is not None:
+            ts_result = ts_future.result()
             result['trailing_stop_result'] = ts_result
             if not ts_result.get('success'):
-                self.logger.warning(f"⚠️  追踪止损设置失败")
+                self.logger.warning("⚠️  追踪止损设置失败")
                 result['success'] = False
 
         # 3. 移动止损到盈亏平衡（如果已达到盈利条件）
+        # 在1、2完成后执行：move_stop_to_breakeven 先读取交易所当前挂单并挂出新止损，
+        # 再逐个撤销该方向旧的 STOP/STOP_MARKET 止损；挂单全部完成后读取的挂单快照才完整
+        # （分批止盈、追踪止损的订单类型不同，不会被撤销）
         if move_to_breakeven_config:
             be_result = self.move_stop_to_breakeven(
                 symbol, entry_price,
@@ -1081,6 +1835,226 @@ class AdvancedPositionManager:
             result['breakeven_result'] = be_result
             # move_to_breakeven 失败不影响整体成功（可能只是盈利未达标）
 
-        self.logger.info(f"{'✅' if result['success'] else '⚠️'} [完整仓位管理] 设置完成\n")
+        self.logger.info("%s [完整仓位管理] 设置完成\n", '✅' if result['success'] else '⚠️')
 
         return result
+
+    # ==================== 14. 批量并发执行 ====================
+
+    def _fan_out(self, func: Callable, keys: List, *args) -> Dict:
+        """
+        对每个key并发执行 func(key, *args)
+
+        Returns:
+            {key: func返回结果}
+        """
+        futures = {self._executor.submit(func, key, *args): key for key in keys}
+        return {futures[future]: future.result() for future in as_completed(futures)}
+
+    def batch_set_atr_stops(self, stops: List[Dict], atr_multiplier: float = 2.0) -> Dict[str, Dict]:
+        """
+        批量设置ATR自适应止损（多个交易对并发执行）
+
+        各交易对的K线查询和下单互不依赖，并发执行后总耗时约等于最慢的单个交易对，
+        而不是所有交易对耗时之和
+
+        Args:
+            stops: 止损参数列表，格式:
+                [
+                    {'symbol': 'BTCUSDT', 'side': 'BUY', 'entry_price': 45000, 'quantity': 0.01},
+                    {'symbol': 'ETHUSDT', 'side': 'SELL', 'entry_price': 2500, 'quantity': 0.1}
+                ]
+            atr_multiplier: ATR倍数（默认2倍）
+
+        Returns:
+            {symbol: set_atr_based_stop_loss的返回结果}
+        """
+        stops_by_symbol = {stop['symbol']: stop for stop in stops}
+
+        def set_stop(symbol: str) -> Dict:
+            stop = stops_by_symbol[symbol]
+            return self.set_atr_based_stop_loss(
+                symbol, stop['side'], stop['entry_price'], stop['quantity'], atr_multiplier
+            )
+
+        return self._fan_out(set_stop, list(stops_by_symbol))
+
+    def batch_adjust_leverage_by_volatility(self, symbols: List[str], base_leverage: int = 5,
+                                            min_leverage: int = 2,
+                                            max_leverage: int = 10) -> Dict[str, Dict]:
+        """
+        批量根据波动率调整杠杆（多个交易对并发执行）
+
+        Args:
+            symbols: 交易对列表
+            base_leverage: 基础杠杆（默认5x）
+            min_leverage: 最小杠杆（默认2x）
+            max_leverage: 最大杠杆（默认10x）
+
+        Returns:
+            {symbol: adjust_leverage_by_volatility的返回结果}
+        """
+        return self._fan_out(self.adjust_leverage_by_volatility, symbols,
+                             base_leverage, min_leverage, max_leverage)
+
+    def can_roll_positions(self, symbols: List[str], profit_threshold_pct: float = 6.0,
+                           max_rolls: int = 3) -> Dict[str, Tuple[bool, str, float]]:
+        """
+        批量检查多个交易对是否可以滚仓（并发执行）
+
+        Args:
+            symbols: 交易对列表
+            profit_threshold_pct: 浮盈达到多少百分比可以滚仓
+            max_rolls: 最多允许滚几次
+
+        Returns:
+            {symbol: can_roll_position的返回结果}
+        """
+        # 先刷新一次持仓快照，避免各线程同时发现缓存过期而重复请求
+        self._get_positions_map()
+        return self._fan_out(self.can_roll_position, symbols, profit_threshold_pct, max_rolls)
+
+    def cancel_all_pending_orders_for_symbols(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        批量取消多个交易对的所有挂单（并发执行）
+
+        Args:
+            symbols: 交易对列表
+
+        Returns:
+            {symbol: cancel_all_pending_orders_for_symbol的返回结果}
+        """
+        return self._fan_out(self.cancel_all_pending_orders_for_symbol, symbols)
+
+    # ==================== 15. Kelly仓位计算 ====================
+
+    def kelly_size(self, symbol: str, win_prob: float, win_loss_ratio: float,
+                   kelly_fraction: float = 0.25, target_ann_vol: float = 0.15) -> float:
+        """
+        分数Kelly + 波动率目标的仓位大小
+
+        f = p - (1-p)/b，再按 目标日波动/实际日波动（上限2倍）缩放，
+        乘以Kelly系数（默认1/4 Kelly）得到占权益的比例
+
+        Args:
+            symbol: 交易对
+            win_prob: 胜率 p（0-1）
+            win_loss_ratio: 盈亏比 b（平均盈利/平均亏损）
+            kelly_fraction: Kelly系数（默认0.25）
+            target_ann_vol: 目标年化波动率（默认15%）
+
+        Returns:
+            建议仓位大小（USDT），边际为负或数据不足时返回0
+        """
+        if win_loss_ratio <= 0:
+            return 0.0
+
+        kelly_f = win_prob - (1 - win_prob) / win_loss_ratio
+        if kelly_f <= 0:
+            return 0.0
+
+        # 1小时ATR折算为日波动率
+        atr, price = self._get_atr(symbol, '1h')
+        if atr <= 0 or price <= 0:
+            return 0.0
+        sigma_daily = atr / price * np.sqrt(24)
+
+        vol_scale = min(2.0, (target_ann_vol / np.sqrt(252)) / sigma_daily)
+        weight = vol_scale * kelly_fraction * kelly_f
+
+        equity = self.client.get_futures_usdt_balance()
+        size_usdt = float(weight * equity)
+
+        self.logger.info(
+            "🎯 Kelly仓位 %s: f=%.3f, 日波动%.2f%%, 权重%.3f -> $%.2f USDT",
+            symbol, kelly_f, sigma_daily * 100, weight, size_usdt
+        )
+        return size_usdt
+
+    # ==================== 16. 批量持仓筛选（向量化） ====================
+
+    def _get_position_matrix(self) -> PositionMatrix:
+        """基于当前持仓快照构建列式视图"""
+        if self._is_live():
+            return PositionMatrix.from_positions(list(self._live_positions.values()), self._live_mark)
+        return PositionMatrix.from_positions(list(self._get_positions_map().values()))
+
+    def screen_rollable(self, profit_threshold_pct: float = 6.0) -> List[str]:
+        """
+        一次筛选出所有满足滚仓条件的交易对（条件同 can_roll_position）
+
+        Args:
+            profit_threshold_pct: 浮盈百分比阈值
+
+        Returns:
+            可以滚仓的交易对列表
+        """
+        matrix = self._get_position_matrix()
+        if len(matrix) == 0:
+            return []
+
+        available_balance = self.client.get_futures_available_balance()
+        if available_balance < 100:
+            reinvest_ratio = 0.65
+        elif available_balance < 500:
+            reinvest_ratio = 0.60
+        else:
+            reinvest_ratio = 0.50
+
+        entry_notional = np.abs(matrix.position_amt) * matrix.entry_price
+        with np.errstate(divide='ignore', invalid='ignore'):
+            profit_pct = np.where(entry_notional > 0,
+                                  matrix.unrealized_pnl / entry_notional * 100, 0.0)
+        margin = matrix.notional * matrix.leverage_inv
+
+        roll_mask = ((np.rint(profit_pct * 100) >= _to_bp(profit_threshold_pct))
+                     & (margin <= available_balance * 0.8)
+                     & (matrix.unrealized_pnl * reinvest_ratio >= 5))
+        return matrix.symbols[roll_mask].tolist()
+
+    def screen_breakeven(self, profit_trigger_pct: float = 5.0) -> List[str]:
+        """
+        一次筛选出所有盈利已达到保本止损触发条件的交易对（条件同 move_stop_to_breakeven）
+
+        Args:
+            profit_trigger_pct: 盈利百分比触发阈值
+
+        Returns:
+            应移动止损到盈亏平衡的交易对列表
+        """
+        matrix = self._get_position_matrix()
+        if len(matrix) == 0:
+            return []
+
+        direction = np.sign(matrix.position_amt)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            profit_pct = np.where(matrix.entry_price > 0,
+                                  direction * (matrix.mark_price - matrix.entry_price)
+                                  / matrix.entry_price * 100, 0.0)
+        return matrix.symbols[np.rint(profit_pct * 100) >= _to_bp(profit_trigger_pct)].tolist()
+
+    def screen_rebalance(self, target_sizes: Dict[str, float],
+                         min_absolute_usdt: float = 10.0) -> Dict[str, float]:
+        """
+        一次计算所有持仓与目标仓位的差额（条件同 rebalance_position_size）
+
+        Args:
+            target_sizes: 目标仓位 {symbol: USDT}
+            min_absolute_usdt: 最小调整金额（USDT）
+
+        Returns:
+            需要调整的 {symbol: 差额USDT}（正数加仓，负数减仓）
+        """
+        matrix = self._get_position_matrix()
+        if len(matrix) == 0:
+            return {}
+
+        targets = np.array([target_sizes.get(symbol, np.nan) for symbol in matrix.symbols],
+                           dtype=np.float64)
+        diff_usdt = targets - np.abs(matrix.position_amt) * matrix.mark_price
+        valid = ~np.isnan(targets)
+        drift_pct = self._drift_pct(diff_usdt, np.nan_to_num(targets))
+        mask = (valid
+                & (np.rint(drift_pct * 100) >= _to_bp(self.rebalance_drift_pct_threshold))
+                & (np.abs(diff_usdt) >= min_absolute_usdt))
+        return dict(zip(matrix.symbols[mask].tolist(), diff_usdt[mask].tolist()))
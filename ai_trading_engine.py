@@ -3,16 +3,22 @@ AI 驱动的交易引擎
 集成 DeepSeek API 进行智能交易决策
 """
 
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
 from datetime import datetime
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
+import threading
 import time
+import numpy as np
 import pandas as pd
 import os
 
 from deepseek_client import DeepSeekClient
 from binance_client import BinanceClient
-from market_analyzer import MarketAnalyzer
+from market_analyzer import MarketAnalyzer, ewm_mean, sliding_minmax, NUMBA_AVAILABLE
 from risk_manager import RiskManager
 from advanced_position_manager import AdvancedPositionManager
 from trailing_stop_manager import TrailingStopManager
@@ -25,6 +31,26 @@ try:
 except ImportError:
     ENHANCED_FEATURES_AVAILABLE = False
 
+@dataclass(frozen=True)
+class TradeStats:
+    """最近交易统计快照（只在新增成交记录时变化，各交易对的分析共用）"""
+    trade_count: int         # 生成快照时的累计成交笔数
+    win_rate5: float         # 近5笔胜率（无记录时为0.5）
+    has_real_trades5: bool   # 近5笔中是否有非零盈亏
+    last3_all_loss: bool     # 近3笔是否全部亏损（不足3笔为False）
+
+
+def _pivot_extremes(arr, half):
+    """
+    一次扫描同时找出局部最低（支撑）和局部最高（阻力）的收盘价候选
+
+    中心点 i 的窗口为 arr[i-half:i+half]，收盘价等于窗口最小（最大）值即为极值点
+    """
+    window = 2 * half
+    count = len(arr) - window
+    mins, maxs = sliding_minmax(arr, window)
+    centers = arr[half:len(arr) - half]
+    return centers[centers == mins[:count]], centers[centers == maxs[:count]]
 
 class AITradingEngine:
     """AI 交易引擎"""
@@ -53,7 +79,43 @@ class AITradingEngine:
         self.roll_tracker = roll_tracker  # ROLL追踪器
 
         self.logger = logging.getLogger(__name__)
-        self.trade_history = []
+        self.trade_history = deque(maxlen=100)  # 只保留最近 100 笔交易，超出自动淘汰最早记录
+
+        # 交易盈亏列式环形缓冲（与trade_history同容量）：胜率/连亏统计直接在float64数组上计算
+        # trade_history 中的字典记录仅用于提供给AI的历史上下文
+        self._pnl_ring = np.zeros(100, dtype=np.float64)
+        self._trade_count = 0
+        self._trade_stats_cache: Optional[TradeStats] = None
+
+        # 技术指标缓存 {symbol: (最新K线(时间, 开, 高, 低, 收), 指标字典)}
+        # 最新K线未变化时K线输入完全相同，直接复用上次计算的指标
+        self._indicator_cache: Dict[str, tuple] = {}
+        self._indicator_cache_size = 32
+
+        # 行情数据分钟级缓存 {(数据类型, symbol): (分钟桶, 行情字典)}
+        # 同一分钟内对同一交易对的重复分析（开仓分析、持仓评估）复用一次行情请求和指标计算
+        # 每个交易对只保留最新一桶，缓存大小受交易对数量限制
+        self._market_data_cache: Dict[tuple, tuple] = {}
+        self._market_data_bucket_seconds = 60
+
+        # 行情/账户REST请求共用的线程池：互不依赖的请求并发发出，耗时取决于最慢的一个
+        # 只提交不再嵌套提交的叶子请求，多交易对并发分析时各自的请求共享这8个线程
+        self._io_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='engine-io')
+
+        # 账户信息获取线程：与行情数据获取重叠（其内部请求仍由_io_pool发出，单独建池避免嵌套等待）
+        self._account_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='engine-account')
+
+        # 多交易对并发分析时保护共享状态（冷却期、交易历史、Reasoner时间戳）
+        self._state_lock = threading.Lock()
+
+        # 账户快照短时缓存 (获取时间, 合约余额, 活跃持仓)：同一轮内并发/连续的分析共用一次请求
+        # 下单后立即失效，避免后续分析看到交易前的余额和持仓
+        self._account_lock = threading.Lock()
+        self._account_snapshot: Optional[tuple] = None
+        self._account_snapshot_ttl = 3.0
+
+        # AI决策调用线程池：提交后立即返回Future，多个交易对的推理延迟可相互重叠
+        self._llm_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='engine-llm')
 
         # 高级仓位管理器
         self.adv_position_manager = AdvancedPositionManager(binance_client, market_analyzer)
@@ -93,7 +155,11 @@ class AITradingEngine:
             self.runtime_manager = None
             self.enhanced_engine = None
 
-    def analyze_and_trade(self, symbol: str, max_position_pct: float = 10.0, runtime_stats: Dict = None) -> Dict:
+        if NUMBA_AVAILABLE:
+            self.logger.info("[OK] numba内核已启用（导入时按显式签名编译）")
+
+    def analyze_and_trade(self, symbol: str, max_position_pct: float = 10.0, runtime_stats: Dict = None,
+                          pending=None) -> Dict:
         """
         分析市场并执行交易
 
@@ -101,126 +167,240 @@ class AITradingEngine:
             symbol: 交易对（如 BTCUSDT）
             max_position_pct: 最大仓位百分比
             runtime_stats: 可选的系统运行统计信息（由bot实例提供）
+            pending: 可选，prefetch_analyses 预先发起的该交易对分析（传入时跳过数据收集，直接等待AI结果）
 
         Returns:
             交易结果
         """
         try:
-            # [NEW] 0a. 更新运行状态（如果启用了增强功能）
-            if self.enhanced_features_enabled and self.runtime_manager:
-                self.runtime_manager.update_runtime()
-                self.runtime_manager.increment_trading_loops()
-
-            # 0. 检查冷却期（防止重复尝试失败的交易）
-            current_time = time.time()
-            if symbol in self.trade_cooldown:
-                cooldown_until = self.trade_cooldown[symbol]
-                if current_time < cooldown_until:
-                    remaining = int(cooldown_until - current_time)
-                    self.logger.info(f"[{symbol}] 冷却期中，还需等待 {remaining//60}分{remaining%60}秒")
-                    return {
-                        'success': True,
-                        'action': 'COOLDOWN',
-                        'reason': f'冷却期中（还需{remaining//60}分钟）'
-                    }
-
-            # 1. 检查最近胜率（仅在有足够交易历史时显示）
-            # [V3.4 FIX] 只有在有真实交易记录（pnl不全为0）时才显示胜率警告
-            if len(self.trade_history) >= 5:
-                # 检查是否有真实交易（至少有一笔非零pnl）
-                has_real_trades = any(t.get('pnl', 0) != 0 for t in self.trade_history[-5:])
-
-                if has_real_trades:
-                    recent_win_rate = self._calculate_recent_win_rate(n=5)
-                    if recent_win_rate < 0.4:
-                        self.logger.warning(f"[{symbol}] [WARNING] 近5笔胜率较低: {recent_win_rate*100:.1f}% - AI将根据这个信息自主决策")
-                    elif recent_win_rate > 0.6:
-                        self.logger.info(f"[{symbol}] [INFO] 近5笔胜率良好: {recent_win_rate*100:.1f}%")
-                    else:
-                        self.logger.info(f"[{symbol}] [INFO] 近5笔胜率: {recent_win_rate*100:.1f}%")
-                else:
-                    # 全新系统，无真实交易历史，不显示警告
-                    self.logger.debug(f"[{symbol}] [DEBUG] 无有效交易历史，跳过胜率检查")
+            if pending is None:
+                pending = self._kickoff_analysis(symbol, runtime_stats)
+            if isinstance(pending, dict):
+                return pending
+            return self._finalize_analysis(symbol, pending, max_position_pct)
 
-            # 2. 收集市场数据
-            self.logger.info(f"[{symbol}] 开始分析...")
+        except Exception as e:
+            self.logger.error("[%s] 交易执行失败: %s", symbol, e)
+            return {
+                'success': False,
+                'error': str(e)
+            }
 
-            # [NEW] 如果启用了增强功能，使用MarketAnalyzer获取完整市场上下文
-            if self.enhanced_features_enabled and self.market_analyzer:
-                market_data = self.market_analyzer.get_comprehensive_market_context(symbol)
-                self.logger.debug(f"[{symbol}] [OK] 使用增强市场数据（包含历史序列、4h上下文、资金费率、持仓量）")
-            else:
-                market_data = self._gather_market_data(symbol)
+    def _kickoff_analysis(self, symbol: str, runtime_stats: Dict = None):
+        """
+        收集数据并提交AI决策调用（不等待AI返回）
 
-            # 2. 获取账户信息（传递runtime_stats）
-            account_info = self._get_account_info(runtime_stats=runtime_stats)
+        Args:
+            symbol: 交易对
+            runtime_stats: 可选的系统运行统计信息
 
-            # 3. 双模型决策系统：推理模型 + 日常模型
-            # 判断是否使用推理模型（Reasoner）
-            use_reasoner = self._should_use_reasoner(symbol, market_data, account_info)
+        Returns:
+            无需调用AI时（如冷却期）直接返回结果字典；否则返回AI调用的Future
+        """
+        # [NEW] 0a. 更新运行状态（如果启用了增强功能）
+        if self.enhanced_features_enabled and self.runtime_manager:
+            self.runtime_manager.update_runtime()
+            self.runtime_manager.increment_trading_loops()
 
-            if use_reasoner:
-                self.logger.info(f"[{symbol}] [深度分析] 调用 DeepSeek Chat V3.1...")
-                ai_result = self.deepseek.analyze_with_reasoning(
-                    market_data=market_data,
-                    account_info=account_info,
-                    trade_history=self.trade_history[-10:]
-                )
+        # 0. 检查冷却期（防止重复尝试失败的交易）
+        # 本次分析的时间戳只取一次，冷却期检查与Reasoner触发判断共用
+        current_time = time.time()
+        if symbol in self.trade_cooldown:
+            cooldown_until = self.trade_cooldown[symbol]
+            if current_time < cooldown_until:
+                remaining = int(cooldown_until - current_time)
+                self.logger.info("[%s] 冷却期中，还需等待 %d分%d秒", symbol, remaining // 60, remaining % 60)
+                return {
+                    'success': True,
+                    'action': 'COOLDOWN',
+                    'reason': f'冷却期中（还需{remaining//60}分钟）'
+                }
+
+        # 1. 检查最近胜率（仅在有足够交易历史时显示）
+        # [V3.4 FIX] 只有在有真实交易记录（pnl不全为0）时才显示胜率警告
+        stats = self._trade_stats()
+        if stats.trade_count >= 5:
+            # 检查是否有真实交易（至少有一笔非零pnl）
+            if stats.has_real_trades5:
+                recent_win_rate = stats.win_rate5
+                if recent_win_rate < 0.4:
+                    self.logger.warning("[%s] [WARNING] 近5笔胜率较低: %.1f%% - AI将根据这个信息自主决策", symbol, recent_win_rate * 100)
+                elif recent_win_rate > 0.6:
+                    self.logger.info("[%s] [INFO] 近5笔胜率良好: %.1f%%", symbol, recent_win_rate * 100)
+                else:
+                    self.logger.info("[%s] [INFO] 近5笔胜率: %.1f%%", symbol, recent_win_rate * 100)
             else:
-                self.logger.info(f"[{symbol}] [快速分析] 调用 DeepSeek Chat V3.1...")
-                ai_result = self.deepseek.analyze_market_and_decide(
-                    market_data,
-                    account_info,
-                    self.trade_history
-                )
+                # 全新系统，无真实交易历史，不显示警告
+                self.logger.debug("[%s] [DEBUG] 无有效交易历史，跳过胜率检查", symbol)
 
-            # [NEW] AI调用后更新计数
-            if self.enhanced_features_enabled and self.runtime_manager:
-                self.runtime_manager.increment_ai_calls()
+        # 2. 收集市场数据
+        self.logger.info("[%s] 开始分析...", symbol)
 
-            if not ai_result['success']:
-                return {
-                    'success': False,
-                    'error': 'AI 决策失败',
-                    'details': ai_result
-                }
+        # 账户信息与行情数据互不依赖：先在后台发起账户请求，与行情请求重叠
+        account_future = self._account_pool.submit(self._get_account_info, runtime_stats=runtime_stats)
 
-            decision = ai_result['decision']
-            model_used = ai_result.get('model_used', 'deepseek-chat')
-            reasoning_content = ai_result.get('reasoning_content', '')
+        # [NEW] 如果启用了增强功能，使用MarketAnalyzer获取完整市场上下文
+        if self.enhanced_features_enabled and self.market_analyzer:
+            market_data = self._cached_market_data(
+                'enhanced', symbol, self.market_analyzer.get_comprehensive_market_context)
+            self.logger.debug("[%s] [OK] 使用增强市场数据（包含历史序列、4h上下文、资金费率、持仓量）", symbol)
+        else:
+            market_data = self._cached_market_data('standard', symbol, self._gather_market_data)
+
+        # 2. 获取账户信息（传递runtime_stats，请求已在行情获取期间发出）
+        account_info = account_future.result()
+
+        # 3. 双模型决策系统：推理模型 + 日常模型
+        # 判断是否使用推理模型（Reasoner）
+        use_reasoner = self._should_use_reasoner(symbol, market_data, account_info, now=current_time, stats=stats)
+
+        if use_reasoner:
+            self.logger.info("[%s] [深度分析] 调用 DeepSeek Chat V3.1...", symbol)
+            return self._llm_pool.submit(
+                self.deepseek.analyze_with_reasoning,
+                market_data=market_data,
+                account_info=account_info,
+                trade_history=self._recent_trades(10)
+            )
 
-            self.logger.info(f"[{symbol}] AI决策 ({model_used}): {decision['action']} (信心度: {decision['confidence']}%)")
-            self.logger.info(f"[{symbol}] 理由: {decision['reasoning']}")
-            if reasoning_content:
-                self.logger.info(f"[{symbol}] [AI-THINK] 推理过程: {reasoning_content[:300]}...")
+        self.logger.info("[%s] [快速分析] 调用 DeepSeek Chat V3.1...", symbol)
+        return self._llm_pool.submit(
+            self.deepseek.analyze_market_and_decide,
+            market_data,
+            account_info,
+            self._recent_trades(self.trade_history.maxlen)
+        )
 
-            # 4. [OK] 完全信任AI决策，不设置信心阈值
-            # DeepSeek会根据自己的判断决定信心度，我们完全尊重AI的自主权
+    def _finalize_analysis(self, symbol: str, ai_future, max_position_pct: float) -> Dict:
+        """
+        等待AI决策结果并执行交易
 
-            # 执行交易
-            trade_result = self._execute_trade(symbol, decision, max_position_pct)
+        Args:
+            symbol: 交易对
+            ai_future: _kickoff_analysis 返回的Future
+            max_position_pct: 最大仓位百分比
 
-            # 如果交易失败，设置冷却期（防止重复尝试）
-            if not trade_result.get('success', False):
-                self.trade_cooldown[symbol] = time.time() + self.cooldown_seconds
-                self.logger.info(f"[{symbol}] 交易失败，设置 {self.cooldown_seconds//60} 分钟冷却期")
+        Returns:
+            交易结果
+        """
+        ai_result = ai_future.result()
 
-            # 记录交易历史
-            self._record_trade(symbol, decision, trade_result)
+        # [NEW] AI调用后更新计数
+        if self.enhanced_features_enabled and self.runtime_manager:
+            self.runtime_manager.increment_ai_calls()
 
+        if not ai_result['success']:
             return {
-                'success': True,
-                'symbol': symbol,
-                'ai_decision': decision,
-                'trade_result': trade_result
+                'success': False,
+                'error': 'AI 决策失败',
+                'details': ai_result
             }
 
-        except Exception as e:
-            self.logger.error(f"[{symbol}] 交易执行失败: {e}")
-            return {
-                'success': False,
-                'error': str(e)
+        decision = ai_result['decision']
+        model_used = ai_result.get('model_used', 'deepseek-chat')
+        reasoning_content = ai_result.get('reasoning_content', '')
+
+        self.logger.info("[%s] AI决策 (%s): %s (信心度: %s%%)",
+                         symbol, model_used, decision['action'], decision['confidence'])
+        self.logger.info("[%s] 理由: %s", symbol, decision['reasoning'])
+        # 推理过程可能很长，INFO被过滤时连截取也省掉
+        if reasoning_content and self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("[%s] [AI-THINK] 推理过程: %s...", symbol, reasoning_content[:300])
+
+        # 4. [OK] 完全信任AI决策，不设置信心阈值
+        # DeepSeek会根据自己的判断决定信心度，我们完全尊重AI的自主权
+
+        # 执行交易
+        trade_result = self._execute_trade(symbol, decision, max_position_pct)
+        self.invalidate_account_snapshot()
+        if trade_result.get('success', False):
+            self.invalidate_market_data(symbol)
+
+        # 如果交易失败，设置冷却期（防止重复尝试）
+        if not trade_result.get('success', False):
+            with self._state_lock:
+                self.trade_cooldown[symbol] = time.time() + self.cooldown_seconds
+            self.logger.info("[%s] 交易失败，设置 %d 分钟冷却期", symbol, self.cooldown_seconds // 60)
+
+        # 记录交易历史
+        self._record_trade(symbol, decision, trade_result)
+
+        return {
+            'success': True,
+            'symbol': symbol,
+            'ai_decision': decision,
+            'trade_result': trade_result
+        }
+
+    def analyze_and_trade_batch(self, symbols: List[str], max_position_pct: float = 10.0,
+                                runtime_stats: Dict = None, max_workers: int = 8) -> Dict[str, Dict]:
+        """
+        并发分析并交易多个交易对
+
+        各交易对的行情收集并发进行，AI调用全部发出后在后台重叠推理，
+        总耗时接近最慢的一个交易对；交易执行按AI返回顺序串行进行
+
+        Args:
+            symbols: 交易对列表
+            max_position_pct: 最大仓位百分比
+            runtime_stats: 可选的系统运行统计信息（由bot实例提供）
+            max_workers: 最大并发数
+
+        Returns:
+            {symbol: analyze_and_trade 的结果}
+        """
+        results = {}
+        pending = {}
+        for symbol, outcome in self.prefetch_analyses(symbols, runtime_stats, max_workers).items():
+            if isinstance(outcome, dict):
+                results[symbol] = outcome
+            else:
+                pending[outcome] = symbol
+
+        # 按AI返回的先后顺序逐个执行交易（下单串行，避免并发开仓争用保证金）
+        for future in as_completed(pending):
+            symbol = pending[future]
+            try:
+                results[symbol] = self._finalize_analysis(symbol, future, max_position_pct)
+            except Exception as e:
+                self.logger.error("[%s] 交易执行失败: %s", symbol, e)
+                results[symbol] = {'success': False, 'error': str(e)}
+        return results
+
+    def prefetch_analyses(self, symbols: List[str], runtime_stats: Dict = None,
+                          max_workers: int = 8) -> Dict:
+        """
+        并发收集多个交易对的数据并发出AI调用（不等待AI返回、不执行交易）
+
+        结果逐个传给 analyze_and_trade(pending=...) 完成交易，
+        使逐个处理交易对的主循环也能让各交易对的AI推理延迟相互重叠
+
+        Args:
+            symbols: 交易对列表
+            runtime_stats: 可选的系统运行统计信息（由bot实例提供）
+            max_workers: 最大并发数
+
+        Returns:
+            {symbol: AI调用的Future，或无需调用AI/收集失败时的结果字典}
+        """
+        outcomes = {}
+        if not symbols:
+            return outcomes
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols)),
+                                thread_name_prefix='engine-trade') as executor:
+            kickoffs = {
+                executor.submit(self._kickoff_analysis, symbol, runtime_stats): symbol
+                for symbol in symbols
             }
+            for future in as_completed(kickoffs):
+                symbol = kickoffs[future]
+                try:
+                    outcomes[symbol] = future.result()
+                except Exception as e:
+                    self.logger.error("[%s] 交易执行失败: %s", symbol, e)
+                    outcomes[symbol] = {'success': False, 'error': str(e)}
+        return outcomes
 
     def analyze_position_for_closing(self, symbol: str, position: Dict, runtime_stats: Dict = None) -> Dict:
         """
@@ -235,62 +415,23 @@ class AITradingEngine:
             评估结果，包含AI决策
         """
         try:
-            from datetime import datetime, timezone
-
-            self.logger.info(f"[{symbol}] [SEARCH] AI评估持仓...")
+            self.logger.info("[%s] [SEARCH] AI评估持仓...", symbol)
 
             # 获取市场数据
-            market_data = self._gather_market_data(symbol)
+            market_data = self._cached_market_data('standard', symbol, self._gather_market_data)
 
             # 获取账户信息（传递runtime_stats）
             account_info = self._get_account_info(runtime_stats=runtime_stats)
 
             # 构建持仓信息
-            entry_price = float(position.get('entryPrice', 0))
-            current_price = market_data['current_price']
-            unrealized_pnl = float(position.get('unRealizedProfit', 0))
-            position_amt = float(position.get('positionAmt', 0))
-            leverage = int(position.get('leverage', 1))
-
-            # 计算持仓盈亏百分比（相对于名义价值）
-            notional_value = abs(position_amt) * entry_price
-            pnl_pct = (unrealized_pnl / notional_value * 100) if notional_value > 0 else 0
-
-            # 计算持仓时间
-            try:
-                update_time = int(position.get('updateTime', 0))
-                if update_time > 0:
-                    update_dt = datetime.fromtimestamp(update_time / 1000, tz=timezone.utc)
-                    holding_duration = datetime.now(timezone.utc) - update_dt
-                    holding_hours = holding_duration.total_seconds() / 3600
-                    holding_time_str = f"{holding_hours:.1f}小时"
-                else:
-                    holding_time_str = "未知"
-            except Exception:
-                holding_time_str = "未知"
+            position_info = self._build_position_info(symbol, position, market_data['current_price'])
 
-            # 判断持仓方向
-            if position_amt > 0:
-                position_side = 'LONG'
-            else:
-                position_side = 'SHORT'
-
-            position_info = {
-                'symbol': symbol,
-                'side': position_side,
-                'entry_price': entry_price,
-                'current_price': current_price,
-                'unrealized_pnl': unrealized_pnl,
-                'unrealized_pnl_pct': round(pnl_pct, 2),
-                'leverage': leverage,
-                'holding_time': holding_time_str,
-                'position_amt': abs(position_amt),
-                'notional_value': round(notional_value, 2)
-            }
-
-            self.logger.info(f"[{symbol}] 持仓: {position_side} {abs(position_amt)} ({leverage}x杠杆)")
-            self.logger.info(f"[{symbol}] 开仓价: ${entry_price:.2f}, 当前价: ${current_price:.2f}")
-            self.logger.info(f"[{symbol}] 盈亏: ${unrealized_pnl:+.2f} ({pnl_pct:+.2f}%)")
+            self.logger.info("[%s] 持仓: %s %s (%sx杠杆)", symbol, position_info['side'],
+                             position_info['position_amt'], position_info['leverage'])
+            self.logger.info("[%s] 开仓价: $%.2f, 当前价: $%.2f", symbol,
+                             position_info['entry_price'], position_info['current_price'])
+            self.logger.info("[%s] 盈亏: $%+.2f (%+.2f%%)", symbol,
+                             position_info['unrealized_pnl'], position_info['unrealized_pnl_pct'])
 
             # 调用DeepSeek评估持仓
             decision = self.deepseek.evaluate_position_for_closing(
@@ -300,9 +441,9 @@ class AITradingEngine:
                 roll_tracker=self.roll_tracker  # [V3.3] 传入ROLL追踪器
             )
 
-            self.logger.info(f"[{symbol}] AI决策: {decision.get('action', 'HOLD')}")
-            self.logger.info(f"[{symbol}] 信心度: {decision.get('confidence', 0)}%")
-            self.logger.info(f"[{symbol}] 理由: {decision.get('reasoning', '')}")
+            self.logger.info("[%s] AI决策: %s", symbol, decision.get('action', 'HOLD'))
+            self.logger.info("[%s] 信心度: %s%%", symbol, decision.get('confidence', 0))
+            self.logger.info("[%s] 理由: %s", symbol, decision.get('reasoning', ''))
 
             return {
                 'success': True,
@@ -310,7 +451,7 @@ class AITradingEngine:
             }
 
         except Exception as e:
-            self.logger.error(f"[{symbol}] 持仓评估失败: {e}")
+            self.logger.error("[%s] 持仓评估失败: %s", symbol, e)
             import traceback
             traceback.print_exc()
             return {
@@ -318,29 +459,160 @@ class AITradingEngine:
                 'error': str(e)
             }
 
-    def _gather_market_data(self, symbol: str) -> Dict:
-        """收集市场数据"""
+    def _build_position_info(self, symbol: str, position: Dict, current_price: float) -> Dict:
+        """
+        将交易所持仓转换为AI持仓评估所需的持仓信息
+
+        Args:
+            symbol: 交易对
+            position: 交易所返回的持仓
+            current_price: 当前价格
+
+        Returns:
+            持仓信息字典
+        """
+        from datetime import timezone
+
+        entry_price = float(position.get('entryPrice', 0))
+        unrealized_pnl = float(position.get('unRealizedProfit', 0))
+        position_amt = float(position.get('positionAmt', 0))
+        leverage = int(position.get('leverage', 1))
+
+        # 计算持仓盈亏百分比（相对于名义价值）
+        notional_value = abs(position_amt) * entry_price
+        pnl_pct = (unrealized_pnl / notional_value * 100) if notional_value > 0 else 0
+
+        # 计算持仓时间
         try:
-            # 获取市场概览
-            overview = self.market_analyzer.get_market_overview(symbol)
+            update_time = int(position.get('updateTime', 0))
+            if update_time > 0:
+                update_dt = datetime.fromtimestamp(update_time / 1000, tz=timezone.utc)
+                holding_duration = datetime.now(timezone.utc) - update_dt
+                holding_hours = holding_duration.total_seconds() / 3600
+                holding_time_str = f"{holding_hours:.1f}小时"
+            else:
+                holding_time_str = "未知"
+        except Exception:
+            holding_time_str = "未知"
 
-            # 获取当前价格
-            current_price = self.market_analyzer.get_current_price(symbol)
+        # 判断持仓方向
+        if position_amt > 0:
+            position_side = 'LONG'
+        else:
+            position_side = 'SHORT'
 
-            # 获取 K 线数据计算技术指标（使用 MarketAnalyzer）
-            df = self.market_analyzer.get_kline_data(symbol, '1h', limit=100)
+        return {
+            'symbol': symbol,
+            'side': position_side,
+            'entry_price': entry_price,
+            'current_price': current_price,
+            'unrealized_pnl': unrealized_pnl,
+            'unrealized_pnl_pct': round(pnl_pct, 2),
+            'leverage': leverage,
+            'holding_time': holding_time_str,
+            'position_amt': abs(position_amt),
+            'notional_value': round(notional_value, 2)
+        }
 
-            # 计算技术指标
-            rsi = self.market_analyzer.calculate_rsi(df, period=14)
-            macd_line, signal_line, histogram = self.market_analyzer.calculate_macd(df)
-            upper_band, middle_band, lower_band = self.market_analyzer.calculate_bollinger_bands(df, period=20)
+    def analyze_positions_batch(self, positions: List[Dict], runtime_stats: Dict = None) -> Dict[str, Dict]:
+        """
+        在一次AI调用中评估所有持仓是否应该平仓
 
-            # 计算移动平均线
-            sma_20 = self.market_analyzer.calculate_sma(df, 20)
-            sma_50 = self.market_analyzer.calculate_sma(df, 50)
+        Args:
+            positions: 交易所返回的持仓列表
+            runtime_stats: 可选的系统运行统计信息（由bot实例提供）
 
-            # 提取收盘价列表（用于其他计算）
-            closes = df['close'].tolist()
+        Returns:
+            {symbol: 评估结果}，格式同 analyze_position_for_closing；
+            AI未返回决策的持仓为 success=False（调用方应改为单独评估）
+        """
+        if not positions:
+            return {}
+        if len(positions) == 1:
+            position = positions[0]
+            return {position['symbol']: self.analyze_position_for_closing(position['symbol'], position, runtime_stats)}
+
+        try:
+            self.logger.info("[SEARCH] AI批量评估 %d 个持仓...", len(positions))
+
+            # 各持仓行情并发获取（_gather_market_data 内部还会使用 _io_pool，这里单独建线程池避免嵌套等待）
+            with ThreadPoolExecutor(max_workers=min(8, len(positions)),
+                                    thread_name_prefix='engine-eval') as executor:
+                market_futures = [executor.submit(self._cached_market_data, 'standard', p['symbol'],
+                                                  self._gather_market_data) for p in positions]
+                account_info = self._get_account_info(runtime_stats=runtime_stats)
+                market_data_list = [future.result() for future in market_futures]
+
+            batch = [
+                (self._build_position_info(p['symbol'], p, market_data['current_price']), market_data)
+                for p, market_data in zip(positions, market_data_list)
+            ]
+
+            decisions = self.deepseek.evaluate_positions_for_closing(
+                batch,
+                account_info,
+                roll_tracker=self.roll_tracker
+            )
+
+            results = {}
+            for p in positions:
+                symbol = p['symbol']
+                decision = decisions.get(symbol)
+                if decision is None:
+                    # AI遗漏该持仓：标记为失败，由调用方改为单独评估
+                    results[symbol] = {'success': False, 'error': 'AI批量评估未返回该持仓的决策'}
+                    continue
+                self.logger.info("[%s] AI决策: %s (信心度: %s%%)\n[%s] 理由: %s",
+                                 symbol, decision.get('action', 'HOLD'), decision.get('confidence', 0),
+                                 symbol, decision.get('reasoning', ''))
+                results[symbol] = {'success': True, 'decision': decision}
+            return results
+
+        except Exception as e:
+            self.logger.error("批量持仓评估失败: %s", e)
+            return {p['symbol']: {'success': False, 'error': str(e)} for p in positions}
+
+    def _cached_market_data(self, kind: str, symbol: str, fetch) -> Dict:
+        """
+        获取行情数据（同一分钟桶内复用上次结果，获取失败时不缓存）
+
+        Args:
+            kind: 数据类型（standard/enhanced，两种格式分开缓存）
+            symbol: 交易对
+            fetch: 实际获取函数，fetch(symbol) -> 行情字典
+
+        Returns:
+            行情字典（缓存共享，调用方不应修改）
+        """
+        bucket = int(time.time() // self._market_data_bucket_seconds)
+        key = (kind, symbol)
+        cached = self._market_data_cache.get(key)
+        if cached is not None and cached[0] == bucket:
+            return cached[1]
+
+        market_data = fetch(symbol)
+        self._market_data_cache[key] = (bucket, market_data)
+        return market_data
+
+    def invalidate_market_data(self, symbol: str):
+        """使交易对的行情缓存失效（本交易对成交/平仓后调用，自身成交会推动价格）"""
+        for kind in ('standard', 'enhanced'):
+            self._market_data_cache.pop((kind, symbol), None)
+
+    def _gather_market_data(self, symbol: str) -> Dict:
+        """收集市场数据"""
+        try:
+            # 市场概览、当前价格、K线三组请求互不依赖，并发获取
+            overview_future = self._io_pool.submit(self.market_analyzer.get_market_overview, symbol)
+            price_future = self._io_pool.submit(self.market_analyzer.get_current_price, symbol)
+            kline_future = self._io_pool.submit(self.market_analyzer.get_kline_data, symbol, '1h', 100)
+
+            overview = overview_future.result()
+            current_price = price_future.result()
+
+            # K 线数据计算技术指标（使用 MarketAnalyzer）
+            df = kline_future.result()
+            indicators = self._get_indicators(symbol, df)
 
             # 提取价格信息
             price_info = overview.get('price_info', {})
@@ -350,25 +622,18 @@ class AITradingEngine:
                 'current_price': current_price,
                 'price_change_24h': price_info.get('change_percent', 0),
                 'volume_24h': price_info.get('quote_volume_24h', 0),
-                'rsi': round(rsi.iloc[-1], 2) if len(rsi) > 0 and not pd.isna(rsi.iloc[-1]) else 50,
-                'macd': {
-                    'macd': round(macd_line.iloc[-1], 4) if len(macd_line) > 0 else 0,
-                    'signal': round(signal_line.iloc[-1], 4) if len(signal_line) > 0 else 0,
-                    'histogram': round(histogram.iloc[-1], 4) if len(histogram) > 0 else 0
-                },
-                'bollinger_bands': {
-                    'upper': round(upper_band.iloc[-1], 2) if len(upper_band) > 0 else 0,
-                    'middle': round(middle_band.iloc[-1], 2) if len(middle_band) > 0 else 0,
-                    'lower': round(lower_band.iloc[-1], 2) if len(lower_band) > 0 else 0
-                },
-                'moving_averages': {
-                    'sma_20': round(sma_20.iloc[-1], 2) if len(sma_20) > 0 else 0,
-                    'sma_50': round(sma_50.iloc[-1], 2) if len(sma_50) > 0 else 0
-                },
-                'trend': self._determine_trend(current_price, sma_20.iloc[-1] if len(sma_20) > 0 else current_price, sma_50.iloc[-1] if len(sma_50) > 0 else current_price),
-                'support_levels': self._find_support_levels(closes),
-                'resistance_levels': self._find_resistance_levels(closes),
-                'atr': self._calculate_atr(df)
+                'rsi': indicators['rsi'],
+                'macd': dict(indicators['macd']),
+                'bollinger_bands': dict(indicators['bollinger_bands']),
+                'moving_averages': dict(indicators['moving_averages']),
+                'trend': self._determine_trend(
+                    current_price,
+                    current_price if indicators['sma_20_raw'] is None else indicators['sma_20_raw'],
+                    current_price if indicators['sma_50_raw'] is None else indicators['sma_50_raw']
+                ),
+                'support_levels': list(indicators['support_levels']),
+                'resistance_levels': list(indicators['resistance_levels']),
+                'atr': indicators['atr']
             }
 
         except Exception as e:
@@ -377,6 +642,77 @@ class AITradingEngine:
             self.logger.error(f"详细错误: {traceback.format_exc()}")
             raise
 
+    def _get_indicators(self, symbol: str, df: pd.DataFrame) -> Dict:
+        """
+        计算技术指标（最新K线未变化时复用缓存）
+
+        缓存键包含最新K线的时间和OHLC：未收盘K线的价格在周期内仍会变化，
+        只比较时间戳会返回过期的RSI/ATR
+
+        Args:
+            symbol: 交易对
+            df: get_kline_data 返回的K线DataFrame
+
+        Returns:
+            指标字典（sma_20_raw/sma_50_raw 为未取整的均线值，用于判断趋势）
+        """
+        last = df.iloc[-1]
+        bar_key = (last['timestamp'], last['open'], last['high'], last['low'], last['close'])
+        cached = self._indicator_cache.get(symbol)
+        if cached is not None and cached[0] == bar_key:
+            return cached[1]
+
+        # 计算技术指标：K线各列只转换一次为float64数组，所有指标共用同一份数据
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        closes = df['close'].to_numpy(dtype=np.float64)
+        close_series = pd.Series(closes)
+
+        # 移动平均线与布林带：20周期窗口只建一次，布林带中轨直接复用SMA20
+        # 保留pandas滚动求和与NumPy标量取整，与原指标逐位一致（数据不足时为NaN）
+        window_20 = close_series.rolling(window=20)
+        sma_20 = window_20.mean().iloc[-1]
+        sma_50 = close_series.rolling(window=50).mean().iloc[-1]
+        band_width = 2 * window_20.std().iloc[-1]
+
+        # MACD：EMA递推（numba可用时为JIT内核，否则为pandas实现；span→alpha = 2/(span+1)）
+        macd_line = ewm_mean(closes, 2 / 13) - ewm_mean(closes, 2 / 27)
+        macd = macd_line[-1]
+        signal = ewm_mean(macd_line, 2 / 10)[-1]
+
+        # 支撑/阻力位
+        support_levels, resistance_levels = self._find_pivot_levels(closes)
+
+        indicators = {
+            'rsi': self._latest_rsi(closes, period=14),
+            'macd': {
+                'macd': round(macd, 4),
+                'signal': round(signal, 4),
+                'histogram': round(macd - signal, 4)
+            },
+            'bollinger_bands': {
+                'upper': round(sma_20 + band_width, 2),
+                'middle': round(sma_20, 2),
+                'lower': round(sma_20 - band_width, 2)
+            },
+            'moving_averages': {
+                'sma_20': round(sma_20, 2),
+                'sma_50': round(sma_50, 2)
+            },
+            'sma_20_raw': sma_20,
+            'sma_50_raw': sma_50,
+            'support_levels': support_levels,
+            'resistance_levels': resistance_levels,
+            'atr': self._calculate_atr(high, low, closes)
+        }
+
+        self._indicator_cache.pop(symbol, None)
+        if len(self._indicator_cache) >= self._indicator_cache_size:
+            # 超出容量时淘汰最早写入的交易对
+            self._indicator_cache.pop(next(iter(self._indicator_cache)))
+        self._indicator_cache[symbol] = (bar_key, indicators)
+        return indicators
+
     def _get_account_info(self, runtime_stats: Dict = None) -> Dict:
         """
         获取账户信息
@@ -385,19 +721,19 @@ class AITradingEngine:
             runtime_stats: 可选的系统运行统计信息（由bot实例提供）
         """
         try:
-            # 获取合约余额
-            futures_balance = self.binance.get_futures_usdt_balance()
+            futures_balance, positions = self._get_account_snapshot()
 
-            # 获取持仓
-            positions = self.binance.get_active_positions()
-
-            # 计算未实现盈亏
-            total_unrealized_pnl = sum(float(pos.get('unRealizedProfit', 0)) for pos in positions)
+            # 计算未实现盈亏（一次性转为float64数组后在C层求和）
+            pnls = np.fromiter((float(pos.get('unRealizedProfit', 0)) for pos in positions),
+                               dtype=np.float64, count=len(positions))
+            total_unrealized_pnl = float(pnls.sum())
 
             account_info = {
                 'balance': futures_balance,
                 'total_value': futures_balance + total_unrealized_pnl,
                 'positions': positions,
+                # {symbol: 持仓} 索引，按交易对O(1)查找（双向持仓时保留第一条，与get_position一致）
+                'positions_index': self._index_positions(positions),
                 'unrealized_pnl': total_unrealized_pnl
             }
 
@@ -411,6 +747,40 @@ class AITradingEngine:
             self.logger.error(f"获取账户信息失败: {e}")
             raise
 
+    def _get_account_snapshot(self) -> tuple:
+        """
+        获取合约余额与活跃持仓（3秒内复用上次结果，并发调用只发一次请求）
+
+        Returns:
+            (合约USDT余额, 活跃持仓列表)
+        """
+        with self._account_lock:
+            snapshot = self._account_snapshot
+            if snapshot is not None and time.time() - snapshot[0] < self._account_snapshot_ttl:
+                return snapshot[1], snapshot[2]
+
+            # 合约余额与持仓并发获取
+            balance_future = self._io_pool.submit(self.binance.get_futures_usdt_balance)
+            positions_future = self._io_pool.submit(self.binance.get_active_positions)
+            futures_balance = balance_future.result()
+            positions = positions_future.result()
+
+            self._account_snapshot = (time.time(), futures_balance, positions)
+            return futures_balance, positions
+
+    def invalidate_account_snapshot(self):
+        """使账户快照缓存失效（下单/平仓后调用）"""
+        self._account_snapshot = None
+
+    @staticmethod
+    def _index_positions(positions: List[Dict]) -> Dict[str, Dict]:
+        """将活跃持仓列表转为 {symbol: 持仓} 索引（双向持仓时保留第一条）"""
+        index = {}
+        for pos in positions:
+            if float(pos.get('positionAmt', 0)) != 0:
+                index.setdefault(pos['symbol'], pos)
+        return index
+
     def _execute_trade(self, symbol: str, decision: Dict, max_position_pct: float) -> Dict:
         """
         执行交易决策
@@ -448,29 +818,20 @@ class AITradingEngine:
         stop_loss_pct = decision.get('stop_loss_pct', 1) / 100  # AI未返回时最保守1%止损
         take_profit_pct = decision.get('take_profit_pct', 2) / 100  # AI未返回时最保守2%止盈
 
-        # 获取账户余额
-        balance = self.binance.get_futures_usdt_balance()
-        # 使用DeepSeek决定的仓位大小
-        trade_amount = balance * (position_size_pct / 100)
+        # 获取账户余额（仅开仓需要；复用账户快照，上一笔下单后快照已失效，不会用到交易前余额）
+        open_side = self._OPEN_ACTIONS.get(action)
+        if open_side is not None:
+            balance, _ = self._get_account_snapshot()
+            # 使用DeepSeek决定的仓位大小
+            trade_amount = balance * (position_size_pct / 100)
 
         try:
-            # 统一处理开多动作 (BUY 或 OPEN_LONG)
-            if action in ['BUY', 'OPEN_LONG']:
-                # 开多单
-                result = self._open_long_position(
-                    symbol, trade_amount, leverage,
-                    stop_loss_pct, take_profit_pct
-                )
-                return result
-
-            # 统一处理开空动作 (SELL 或 OPEN_SHORT)
-            elif action in ['SELL', 'OPEN_SHORT']:
-                # 开空单
-                result = self._open_short_position(
-                    symbol, trade_amount, leverage,
+            # 统一处理开仓动作 (BUY/OPEN_LONG 开多，SELL/OPEN_SHORT 开空)
+            if open_side is not None:
+                return self._open_position(
+                    symbol, open_side, trade_amount, leverage,
                     stop_loss_pct, take_profit_pct
                 )
-                return result
 
             elif action in ['CLOSE', 'CLOSE_LONG', 'CLOSE_SHORT']:
                 # 平仓（支持精确方向和部分平仓）
@@ -530,151 +891,94 @@ class AITradingEngine:
             self.logger.error(f"执行交易失败: {e}")
             return {'success': False, 'error': str(e)}
 
-    def _open_long_position(self, symbol: str, amount: float, leverage: int,
-                           stop_loss_pct: float, take_profit_pct: float) -> Dict:
-        """开多单"""
-        try:
-            # 获取当前价格（需要先获取价格才能计算杠杆）
-            current_price = self.market_analyzer.get_current_price(symbol)
-
-            # [CONFIG] 智能杠杆调整：同时满足币安名义价值和精度要求
-            # 先确定精度规则
-            if 'BTC' in symbol:
-                precision = 3  # BTC: 0.001
-                min_qty = 0.001
-            elif 'ETH' in symbol:
-                precision = 3  # ETH: 0.001
-                min_qty = 0.001
-            elif 'BNB' in symbol:
-                precision = 1  # BNB: 0.1
-                min_qty = 0.1
-            elif 'SOL' in symbol:
-                precision = 1  # SOL: 0.1
-                min_qty = 0.1
-            elif 'DOGE' in symbol:
-                precision = 0  # DOGE: 整数
-                min_qty = 1.0
-            else:
-                precision = 1  # 默认: 0.1
-                min_qty = 0.1
-
-            # 计算满足精度要求所需的最小名义价值
-            min_notional_for_precision = min_qty * current_price
-            min_notional = max(20, min_notional_for_precision)  # 至少$20，或满足精度要求
-
-            # 计算所需杠杆
-            required_leverage = int(min_notional / amount) + 1
-            original_leverage = leverage
-            leverage = min(max(leverage, required_leverage), 25)  # 最大25倍
-
-            if leverage != original_leverage:
-                self.logger.info(f"[IDEA] [{symbol}] 智能杠杆调整: {original_leverage}x → {leverage}x "
-                               f"(名义价值 ${amount*original_leverage:.2f} → ${amount*leverage:.2f}, "
-                               f"精度要求: ≥{min_qty} {symbol.replace('USDT', '')})")
-
-            # 设置杠杆
-            self.binance.set_leverage(symbol, leverage)
-
-            # 计算数量并按交易对调整精度
-            raw_quantity = (amount * leverage) / current_price
-
-            # 根据交易对设置精度（币安合约规则）
-            if 'BTC' in symbol:
-                quantity = round(raw_quantity, 3)  # BTC: 0.001
-            elif 'ETH' in symbol:
-                quantity = round(raw_quantity, 3)  # ETH: 0.001
-            elif 'BNB' in symbol:
-                quantity = round(raw_quantity, 1)  # BNB: 0.1
-            elif 'SOL' in symbol:
-                quantity = round(raw_quantity, 1)  # SOL: 0.1
-            elif 'DOGE' in symbol:
-                quantity = round(raw_quantity, 0)  # DOGE: 整数
-            else:
-                quantity = round(raw_quantity, 1)  # 默认: 0.1 (大多数山寨币)
+    # 内置数量精度规则（交易所规则不可用时的回退）：基础币种 → (小数位数, 最小数量)
+    # 按基础币种精确匹配：子串匹配会把其他币种误判为主流币（如 'ETH' in 'METHUSDT'）
+    _QTY_PRECISION = {
+        'BTC': (3, 0.001),
+        'ETH': (3, 0.001),
+        'BNB': (1, 0.1),
+        'SOL': (1, 0.1),
+        'DOGE': (0, 1.0),
+    }
+    _DEFAULT_QTY_PRECISION = (1, 0.1)  # 大多数山寨币: 0.1
+
+    def _get_qty_precision(self, symbol: str) -> tuple:
+        """
+        获取交易对的数量精度规则（优先使用交易所LOT_SIZE规则）
 
-            # 确保不为0（小账户可能出现）
-            if quantity == 0:
-                self.logger.warning(f"{symbol} 计算数量为0，账户太小无法交易")
-                return {'success': False, 'error': '账户余额太小，无法满足最低交易量'}
+        交易所规则不可用时，去掉USDT后缀按基础币种精确匹配内置规则。
 
-            # 计算止损止盈价格（四舍五入到2位小数，USDT精度要求）
-            stop_loss = round(current_price * (1 - stop_loss_pct), 2)
-            take_profit = round(current_price * (1 + take_profit_pct), 2)
-
-            # 开多单
-            order = self.binance.create_futures_order(
-                symbol=symbol,
-                side='BUY',
-                order_type='MARKET',
-                quantity=quantity,
-                position_side='LONG'
-            )
+        Args:
+            symbol: 交易对
 
-            # 设置止损（positionSide已足够，无需reduce_only）
-            self.binance.create_futures_order(
-                symbol=symbol,
-                side='SELL',
-                order_type='STOP_MARKET',
-                quantity=quantity,
-                position_side='LONG',
-                stopPrice=stop_loss
-            )
+        Returns:
+            (小数位数, 最小数量)
+        """
+        rule = self.adv_position_manager.get_symbol_rules(symbol)
+        if rule is not None:
+            # 币安合约 LOT_SIZE 的最小数量与数量步长相同
+            qty_step, qty_decimals, _, _ = rule
+            return qty_decimals, qty_step
+        base = symbol[:-4] if symbol.endswith('USDT') else symbol
+        return self._QTY_PRECISION.get(base, self._DEFAULT_QTY_PRECISION)
+
+    def _round_to_tick(self, symbol: str, price: float) -> float:
+        """
+        将价格对齐到交易对的最小价格变动（tickSize）
 
-            # 设置止盈（positionSide已足够，无需reduce_only）
-            self.binance.create_futures_order(
-                symbol=symbol,
-                side='SELL',
-                order_type='TAKE_PROFIT_MARKET',
-                quantity=quantity,
-                position_side='LONG',
-                stopPrice=take_profit
-            )
+        固定保留2位小数对低价币（如DOGE，tickSize 0.00001）会得到错误的触发价，导致下单被拒。
 
-            self.logger.info(f"[OK] 开多单成功: {symbol}, 数量: {quantity}, 杠杆: {leverage}x, 止损: {stop_loss}, 止盈: {take_profit}")
+        Args:
+            symbol: 交易对
+            price: 原始价格
 
-            return {
-                'success': True,
-                'action': 'OPEN_LONG',
-                'symbol': symbol,
-                'quantity': quantity,
-                'leverage': leverage,
-                'entry_price': current_price,
-                'stop_loss': stop_loss,
-                'take_profit': take_profit,
-                'order': order
-            }
+        Returns:
+            对齐后的价格（交易规则不可用时保留2位小数）
+        """
+        rule = self.adv_position_manager.get_symbol_rules(symbol)
+        if rule is None or not rule[2]:
+            return round(price, 2)
+        _, _, tick_size, tick_decimals = rule
+        return round(round(price / tick_size) * tick_size, tick_decimals)
+
+    # 开仓方向参数：持仓方向 → (开仓下单方向, 价格方向系数, 日志名称)
+    _OPEN_SIDES = {
+        'LONG': ('BUY', 1, '多单'),
+        'SHORT': ('SELL', -1, '空单'),
+    }
+
+    # AI开仓动作 → 持仓方向
+    _OPEN_ACTIONS = {
+        'BUY': 'LONG',
+        'OPEN_LONG': 'LONG',
+        'SELL': 'SHORT',
+        'OPEN_SHORT': 'SHORT',
+    }
+
+    def _open_position(self, symbol: str, position_side: str, amount: float, leverage: int,
+                       stop_loss_pct: float, take_profit_pct: float) -> Dict:
+        """
+        开仓（多空共用）：智能杠杆调整、数量精度、止损止盈价格计算与批量下单
 
-        except Exception as e:
-            self.logger.error(f"[ERROR] 开多单失败: {e}")
-            return {'success': False, 'error': str(e)}
+        Args:
+            symbol: 交易对
+            position_side: 持仓方向 (LONG/SHORT)
+            amount: 保证金金额（USDT）
+            leverage: 杠杆倍数
+            stop_loss_pct: 止损百分比（小数）
+            take_profit_pct: 止盈百分比（小数）
 
-    def _open_short_position(self, symbol: str, amount: float, leverage: int,
-                            stop_loss_pct: float, take_profit_pct: float) -> Dict:
-        """开空单"""
+        Returns:
+            开仓结果
+        """
+        entry_side, direction, label = self._OPEN_SIDES[position_side]
         try:
             # 获取当前价格（需要先获取价格才能计算杠杆）
             current_price = self.market_analyzer.get_current_price(symbol)
 
             # [CONFIG] 智能杠杆调整：同时满足币安名义价值和精度要求
             # 先确定精度规则
-            if 'BTC' in symbol:
-                precision = 3  # BTC: 0.001
-                min_qty = 0.001
-            elif 'ETH' in symbol:
-                precision = 3  # ETH: 0.001
-                min_qty = 0.001
-            elif 'BNB' in symbol:
-                precision = 1  # BNB: 0.1
-                min_qty = 0.1
-            elif 'SOL' in symbol:
-                precision = 1  # SOL: 0.1
-                min_qty = 0.1
-            elif 'DOGE' in symbol:
-                precision = 0  # DOGE: 整数
-                min_qty = 1.0
-            else:
-                precision = 1  # 默认: 0.1
-                min_qty = 0.1
+            precision, min_qty = self._get_qty_precision(symbol)
 
             # 计算满足精度要求所需的最小名义价值
             min_notional_for_precision = min_qty * current_price
@@ -686,90 +990,151 @@ class AITradingEngine:
             leverage = min(max(leverage, required_leverage), 25)  # 最大25倍
 
             if leverage != original_leverage:
-                self.logger.info(f"[IDEA] [{symbol}] 智能杠杆调整: {original_leverage}x → {leverage}x "
-                               f"(名义价值 ${amount*original_leverage:.2f} → ${amount*leverage:.2f}, "
-                               f"精度要求: ≥{min_qty} {symbol.replace('USDT', '')})")
+                self.logger.info("[IDEA] [%s] 智能杠杆调整: %sx → %sx (名义价值 $%.2f → $%.2f, 精度要求: ≥%s %s)",
+                                 symbol, original_leverage, leverage, amount * original_leverage,
+                                 amount * leverage, min_qty, symbol.replace('USDT', ''))
 
             # 设置杠杆
             self.binance.set_leverage(symbol, leverage)
 
-            # 计算数量并按交易对调整精度
-            raw_quantity = (amount * leverage) / current_price
-
-            # 根据交易对设置精度（币安合约规则）
-            if 'BTC' in symbol:
-                quantity = round(raw_quantity, 3)  # BTC: 0.001
-            elif 'ETH' in symbol:
-                quantity = round(raw_quantity, 3)  # ETH: 0.001
-            elif 'BNB' in symbol:
-                quantity = round(raw_quantity, 1)  # BNB: 0.1
-            elif 'SOL' in symbol:
-                quantity = round(raw_quantity, 1)  # SOL: 0.1
-            elif 'DOGE' in symbol:
-                quantity = round(raw_quantity, 0)  # DOGE: 整数
-            else:
-                quantity = round(raw_quantity, 1)  # 默认: 0.1 (大多数山寨币)
+            # 计算数量并按交易对调整精度（币安合约规则）
+            quantity = round((amount * leverage) / current_price, precision)
 
             # 确保不为0（小账户可能出现）
             if quantity == 0:
-                self.logger.warning(f"{symbol} 计算数量为0，账户太小无法交易")
+                self.logger.warning("%s 计算数量为0，账户太小无法交易", symbol)
                 return {'success': False, 'error': '账户余额太小，无法满足最低交易量'}
 
-            # 计算止损止盈价格（四舍五入到2位小数，USDT精度要求）
-            stop_loss = round(current_price * (1 + stop_loss_pct), 2)
-            take_profit = round(current_price * (1 - take_profit_pct), 2)
-
-            # 开空单
-            order = self.binance.create_futures_order(
-                symbol=symbol,
-                side='SELL',
-                order_type='MARKET',
-                quantity=quantity,
-                position_side='SHORT'
-            )
+            # 计算止损止盈价格（对齐到交易对的tickSize）
+            # 多单止损在下方、止盈在上方；空单相反
+            stop_loss = self._round_to_tick(symbol, current_price * (1 - direction * stop_loss_pct))
+            take_profit = self._round_to_tick(symbol, current_price * (1 + direction * take_profit_pct))
 
-            # 设置止损（positionSide已足够，无需reduce_only）
-            self.binance.create_futures_order(
-                symbol=symbol,
-                side='BUY',
-                order_type='STOP_MARKET',
-                quantity=quantity,
-                position_side='SHORT',
-                stopPrice=stop_loss
+            # 开仓，止损止盈随开仓单一次批量提交（positionSide已足够，无需reduce_only）
+            order, sl_order, tp_order = self._place_entry_with_brackets(
+                symbol, entry_side, position_side, quantity, stop_loss, take_profit
             )
 
-            # 设置止盈（positionSide已足够，无需reduce_only）
-            self.binance.create_futures_order(
-                symbol=symbol,
-                side='BUY',
-                order_type='TAKE_PROFIT_MARKET',
-                quantity=quantity,
-                position_side='SHORT',
-                stopPrice=take_profit
-            )
-
-            self.logger.info(f"[OK] 开空单成功: {symbol}, 数量: {quantity}, 杠杆: {leverage}x, 止损: {stop_loss}, 止盈: {take_profit}")
+            self.logger.info("[OK] 开%s成功: %s, 数量: %s, 杠杆: %sx, 止损: %s, 止盈: %s",
+                             label, symbol, quantity, leverage, stop_loss, take_profit)
+            missing = [name for name, leg in (('止损', sl_order), ('止盈', tp_order)) if leg is None]
+            protected = not missing
+            if missing:
+                self.logger.error("[%s] [WARNING] 持仓缺少%s单，请检查并手动补挂", symbol, '/'.join(missing))
 
             return {
                 'success': True,
-                'action': 'OPEN_SHORT',
+                'action': f'OPEN_{position_side}',
                 'symbol': symbol,
                 'quantity': quantity,
                 'leverage': leverage,
                 'entry_price': current_price,
                 'stop_loss': stop_loss,
                 'take_profit': take_profit,
-                'order': order
+                'order': order,
+                'sl_order': sl_order,
+                'tp_order': tp_order,
+                'protected': protected
             }
 
         except Exception as e:
-            self.logger.error(f"[ERROR] 开空单失败: {e}")
+            self.logger.error("[ERROR] 开%s失败: %s", label, e)
             return {'success': False, 'error': str(e)}
 
+    def _place_entry_with_brackets(self, symbol: str, entry_side: str, position_side: str,
+                                   quantity: float, stop_loss: float, take_profit: float) -> tuple:
+        """
+        市价开仓 + 止损 + 止盈 通过 /fapi/v1/batchOrders 一次请求提交（一个RTT代替三个）
+
+        批量请求整体被拒绝（4xx）时回退为逐笔下单；开仓成功但止损/止盈单被单独拒绝时
+        （批量订单并发处理，不保证先于开仓单成交），对该单逐笔补发。
+
+        Args:
+            symbol: 交易对
+            entry_side: 开仓方向 (BUY/SELL)
+            position_side: 持仓方向 (LONG/SHORT)
+            quantity: 数量
+            stop_loss: 止损触发价
+            take_profit: 止盈触发价
+
+        Returns:
+            (开仓订单, 止损订单, 止盈订单)；开仓成功后止损/止盈补发仍失败的为None（持仓未受保护）
+        """
+        exit_side = 'SELL' if entry_side == 'BUY' else 'BUY'
+        orders = [
+            {'symbol': symbol, 'side': entry_side, 'type': 'MARKET',
+             'quantity': quantity, 'positionSide': position_side},
+            {'symbol': symbol, 'side': exit_side, 'type': 'STOP_MARKET',
+             'quantity': quantity, 'positionSide': position_side, 'stopPrice': stop_loss},
+            {'symbol': symbol, 'side': exit_side, 'type': 'TAKE_PROFIT_MARKET',
+             'quantity': quantity, 'positionSide': position_side, 'stopPrice': take_profit},
+        ]
+
+        def place_single(params: Dict) -> Dict:
+            params = dict(params)
+            return self.binance.create_futures_order(
+                symbol=params.pop('symbol'),
+                side=params.pop('side'),
+                order_type=params.pop('type'),
+                quantity=params.pop('quantity'),
+                position_side=params.pop('positionSide'),
+                **params
+            )
+
+        def rejected(result: Dict) -> bool:
+            return 'code' in result and 'orderId' not in result
+
+        try:
+            results = self.binance.create_futures_batch_orders(orders)
+            batch_usable = True
+        except Exception as e:
+            # 只有明确被拒绝（非限流的4xx）才回退；超时/5xx时下单可能已被受理，重发会重复开仓
+            status = getattr(e, 'status_code', None)
+            if status is None or not 400 <= status < 500 or status in (418, 429):
+                raise
+            self.logger.warning("[%s] 批量下单被拒绝，回退为逐笔下单: %s", symbol, e)
+            # 开仓单失败直接抛出（此时尚未开仓）；止损/止盈在下面逐笔补发
+            results = [place_single(orders[0]), None, None]
+            batch_usable = False
+        else:
+            if rejected(results[0]):
+                raise Exception(f"开仓订单被拒绝: {results[0].get('msg', results[0])}")
+
+        # 以下开仓单已成交：止损/止盈下单失败不能再抛出（否则持仓被当作开仓失败、无保护地留在交易所）
+        placed = [results[0], None, None]
+        pending = []
+        for i in (1, 2):
+            result = results[i]
+            if result is not None and not rejected(result):
+                placed[i] = result
+                continue
+            if result is not None:
+                self.logger.warning("[%s] %s 批量提交被拒绝(%s)，补发", symbol, orders[i]['type'], result.get('msg'))
+            pending.append(i)
+
+        # 止损/止盈同时被拒时合并为一次批量补发；仍未成功的再逐笔下单
+        if batch_usable and len(pending) > 1:
+            try:
+                for i, result in zip(pending, self.binance.create_futures_batch_orders([orders[i] for i in pending])):
+                    if not rejected(result):
+                        placed[i] = result
+            except Exception as e:
+                self.logger.warning("[%s] 止损/止盈批量补发失败，改为逐笔下单: %s", symbol, e)
+
+        for i in pending:
+            if placed[i] is not None:
+                continue
+            try:
+                placed[i] = place_single(orders[i])
+            except Exception as e:
+                self.logger.error("[%s] [WARNING] 已开仓但 %s 下单失败，持仓未受保护: %s",
+                                  symbol, orders[i]['type'], e)
+        return tuple(placed)
+
     def _record_trade(self, symbol: str, decision: Dict, trade_result: Dict):
         """记录交易历史"""
         trade_record = {
-            'time': datetime.now().isoformat(),
+            'time': time.time_ns(),  # 纳秒时间戳（整数），需要展示时再格式化
             'symbol': symbol,
             'action': decision['action'],
             'confidence': decision['confidence'],
@@ -778,11 +1143,10 @@ class AITradingEngine:
             'pnl': trade_result.get('pnl', 0)
         }
 
-        self.trade_history.append(trade_record)
-
-        # 只保留最近 100 笔交易
-        if len(self.trade_history) > 100:
-            self.trade_history = self.trade_history[-100:]
+        with self._state_lock:
+            self.trade_history.append(trade_record)
+            self._pnl_ring[self._trade_count % len(self._pnl_ring)] = float(trade_record['pnl'] or 0)
+            self._trade_count += 1
 
         # [FIX] 同时保存到performance_data.json（如果performance tracker可用）
         if self.performance:
@@ -802,34 +1166,72 @@ class AITradingEngine:
             except Exception as e:
                 self.logger.error(f"[ERROR] 保存交易到performance_data.json失败: {e}")
 
+    # 趋势查找表：按 (价格相对SMA20的符号, SMA20相对SMA50的符号) 索引，符号取 -1/0/+1
+    # 索引 = (价格符号 + 1) * 3 + (均线符号 + 1)；新增趋势分类时只需修改此表
+    _TREND_TABLE = (
+        "强势下跌", "温和下跌", "温和下跌",  # 价格 < SMA20
+        "震荡", "震荡", "震荡",              # 价格 = SMA20（或数据缺失为NaN）
+        "温和上涨", "温和上涨", "强势上涨",  # 价格 > SMA20
+    )
+
     def _determine_trend(self, current_price: float, sma_20: float, sma_50: float) -> str:
-        """判断趋势"""
-        if current_price > sma_20 > sma_50:
-            return "强势上涨"
-        elif current_price > sma_20:
-            return "温和上涨"
-        elif current_price < sma_20 < sma_50:
-            return "强势下跌"
-        elif current_price < sma_20:
-            return "温和下跌"
-        else:
-            return "震荡"
-
-    def _find_support_levels(self, closes: List[float]) -> List[float]:
-        """寻找支撑位"""
-        recent_lows = []
-        for i in range(10, len(closes) - 10):
-            if closes[i] == min(closes[i-10:i+10]):
-                recent_lows.append(closes[i])
-        return sorted(recent_lows)[-3:] if recent_lows else []
-
-    def _find_resistance_levels(self, closes: List[float]) -> List[float]:
-        """寻找阻力位"""
-        recent_highs = []
-        for i in range(10, len(closes) - 10):
-            if closes[i] == max(closes[i-10:i+10]):
-                recent_highs.append(closes[i])
-        return sorted(recent_highs)[-3:] if recent_highs else []
+        """判断趋势（符号编码后查表，无分支链）"""
+        price_sign = (current_price > sma_20) - (current_price < sma_20)
+        sma_sign = (sma_20 > sma_50) - (sma_20 < sma_50)
+        return self._TREND_TABLE[(price_sign + 1) * 3 + sma_sign + 1]
+
+    @staticmethod
+    def _find_pivot_levels(closes, window: int = 20) -> Tuple[List[float], List[float]]:
+        """
+        寻找局部极值价位：收盘价等于其前后窗口 closes[i-10:i+10] 内的最小（最大）值
+
+        支撑位与阻力位在同一次扫描中求出（numba可用时为O(N)单调队列JIT内核，否则为NumPy滑动窗口）
+
+        Args:
+            closes: 收盘价序列
+            window: 窗口长度（默认20，即前10根+后10根）
+
+        Returns:
+            (支撑位, 阻力位)，各为排序后最大的3个极值价位
+        """
+        arr = np.asarray(closes, dtype=np.float64)
+        if len(arr) <= window:
+            return [], []
+
+        support, resistance = _pivot_extremes(arr, window // 2)
+        return np.sort(support)[-3:].tolist(), np.sort(resistance)[-3:].tolist()
+
+    def _recent_trades(self, n: int) -> List[Dict]:
+        """
+        获取最近N笔交易（deque不支持切片，用islice从尾部截取）
+
+        并发分析时其他线程可能正在追加记录，迭代deque期间被修改会抛出RuntimeError，
+        因此在状态锁内拷贝。
+
+        Args:
+            n: 最近N笔交易
+
+        Returns:
+            交易记录列表（按时间顺序）
+        """
+        with self._state_lock:
+            history = self.trade_history
+            return list(islice(history, max(0, len(history) - n), None))
+
+    def _recent_pnls(self, n: int) -> np.ndarray:
+        """
+        获取最近N笔交易的盈亏（从环形缓冲按时间顺序取出）
+
+        Args:
+            n: 最近N笔交易
+
+        Returns:
+            盈亏数组（按时间顺序）
+        """
+        with self._state_lock:
+            count = self._trade_count
+            n = min(n, count, len(self._pnl_ring))
+            return self._pnl_ring[np.arange(count - n, count) % len(self._pnl_ring)]
 
     def _calculate_recent_win_rate(self, n: int = 5) -> float:
         """
@@ -841,33 +1243,123 @@ class AITradingEngine:
         Returns:
             胜率 (0.0-1.0)
         """
-        if not self.trade_history or len(self.trade_history) == 0:
+        recent_pnls = self._recent_pnls(n)
+        if len(recent_pnls) == 0:
             return 0.5  # 无历史数据时返回50%
 
-        recent_trades = self.trade_history[-n:]
-        wins = sum(1 for t in recent_trades if t.get('pnl', 0) > 0)
+        return float((recent_pnls > 0).mean())
 
-        if len(recent_trades) == 0:
-            return 0.5
+    def _trade_stats(self) -> TradeStats:
+        """
+        获取最近交易统计快照（按累计成交笔数缓存）
+
+        统计只依赖盈亏环形缓冲，两次成交之间一轮内所有交易对的分析都复用同一个快照，
+        胜率和连亏判断只需读取字段，不再各自截取环形缓冲。
+
+        Returns:
+            TradeStats 快照
+        """
+        with self._state_lock:
+            stats = self._trade_stats_cache
+            count = self._trade_count
+            if stats is not None and stats.trade_count == count:
+                return stats
+
+            ring_size = len(self._pnl_ring)
+            n = min(5, count, ring_size)
+            pnls = self._pnl_ring[np.arange(count - n, count) % ring_size]
+            stats = TradeStats(
+                trade_count=count,
+                win_rate5=float((pnls > 0).mean()) if n else 0.5,
+                has_real_trades5=bool((pnls != 0).any()),
+                last3_all_loss=count >= 3 and bool((pnls[-3:] < 0).all()),
+            )
+            self._trade_stats_cache = stats
+            return stats
 
-        return wins / len(recent_trades)
+    @staticmethod
+    def _latest_rsi(closes: np.ndarray, period: int = 14) -> float:
+        """
+        计算最新RSI（简单平均涨跌幅，与 MarketAnalyzer.calculate_rsi 最后一个值一致）
 
-    def _calculate_atr(self, df) -> float:
-        """计算 ATR（接受 DataFrame）"""
+        Args:
+            closes: 收盘价数组
+            period: 周期（默认14）
+
+        Returns:
+            RSI（保留2位小数），数据不足或无波动时返回50
+        """
+        if len(closes) < period:
+            return 50
+        delta = np.diff(closes[-(period + 1):])
+        if len(delta) < period:
+            # 恰好period根K线：calculate_rsi 中首个diff(NaN)被where替换为0并计入窗口
+            delta = np.concatenate(([0.0], delta))
+        gain = np.where(delta > 0, delta, 0.0).mean()
+        loss = np.where(delta < 0, -delta, 0.0).mean()
+        if loss == 0:
+            return 100.0 if gain > 0 else 50
+        return round(100 - (100 / (1 + gain / loss)), 2)
+
+    def _calculate_atr(self, high: np.ndarray, low: np.ndarray, closes: np.ndarray) -> float:
+        """
+        计算 ATR（接受价格数组）
+
+        返回最新的Wilder平滑ATR(14)。注意：早期版本取的是最早14根K线真实波幅的简单平均，
+        数值与现在不同（现在反映当前波动），提供给AI的ATR随之改变
+        """
         try:
-            import pandas as pd
-            tr_list = []
-            for i in range(1, min(15, len(df))):
-                high = df['high'].iloc[i]
-                low = df['low'].iloc[i]
-                prev_close = df['close'].iloc[i-1]
-                tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
-                tr_list.append(tr)
-            return round(sum(tr_list) / len(tr_list), 2) if tr_list else 0
+            return round(MarketAnalyzer.wilder_atr(high, low, closes), 2)
         except Exception:
             return 0
 
-    def _should_use_reasoner(self, symbol: str, market_data: Dict, account_info: Dict) -> bool:
+    # 深度分析预筛选阈值
+    _DEEP_RSI_DEVIATION = 25        # RSI偏离50超过25（<25 或 >75）
+    _DEEP_MACD_HIST_PCT = 0.002     # MACD柱绝对值超过价格的0.2%
+    _DEEP_LEVEL_DISTANCE_PCT = 0.015  # 价格距支撑/阻力位1.5%以内
+
+    def _needs_deep_analysis(self, market_data: Dict) -> bool:
+        """
+        深度分析预筛选：只看已算好的指标，判断当前是否存在值得深度分析的技术信号
+
+        任一条件成立即返回True：RSI极值、MACD柱显著、价格突破布林带、价格接近支撑/阻力位。
+        兼容标准行情格式（macd/bollinger_bands为字典）和增强行情格式（扁平字段）。
+
+        Args:
+            market_data: 市场数据
+
+        Returns:
+            True表示存在显著信号
+        """
+        price = market_data.get('current_price') or 0
+        if price <= 0:
+            # 数据不完整时不做过滤，交给后续条件判断
+            return True
+
+        rsi = market_data.get('rsi')
+        if rsi is not None and abs(rsi - 50) > self._DEEP_RSI_DEVIATION:
+            return True
+
+        macd = market_data.get('macd')
+        histogram = macd.get('histogram') if isinstance(macd, dict) else market_data.get('macd_histogram')
+        if histogram is not None and abs(histogram) > price * self._DEEP_MACD_HIST_PCT:
+            return True
+
+        bands = market_data.get('bollinger_bands')
+        if isinstance(bands, dict):
+            upper, lower = bands.get('upper'), bands.get('lower')
+        else:
+            upper, lower = market_data.get('bollinger_upper'), market_data.get('bollinger_lower')
+        if (upper is not None and price > upper) or (lower is not None and price < lower):
+            return True
+
+        levels = list(market_data.get('support_levels') or []) + list(market_data.get('resistance_levels') or [])
+        max_distance = price * self._DEEP_LEVEL_DISTANCE_PCT
+        return any(abs(price - level) <= max_distance for level in levels)
+
+    def _should_use_reasoner(self, symbol: str, market_data: Dict, account_info: Dict,
+                             now: Optional[float] = None,
+                             stats: Optional[TradeStats] = None) -> bool:
         """
         判断是否应该使用推理模型（Reasoner）
 
@@ -885,33 +1377,46 @@ class AITradingEngine:
             symbol: 交易对
             market_data: 市场数据
             account_info: 账户信息
+            now: 可选，本次分析开始时的时间戳（不传则取当前时间）
+            stats: 可选，最近交易统计快照（不传则读取缓存快照）
 
         Returns:
             True表示使用推理模型，False使用日常模型
         """
-        current_time = time.time()
+        current_time = time.time() if now is None else now
+        if stats is None:
+            stats = self._trade_stats()
+
+        # 预筛选：技术面没有任何显著信号时，定时触发和开仓触发都不值得深度分析
+        # 未命中时不占用定时触发的时间戳，留给下一个有信号的交易对
+        has_signal = self._needs_deep_analysis(market_data)
 
         # 条件0：时间触发 - 每300秒执行一次Reasoner深度分析
-        if current_time - self.last_reasoner_time >= self.reasoner_interval:
-            self.last_reasoner_time = current_time
+        # 检查与更新放在同一把锁内，并发分析时只有一个交易对会命中定时触发
+        with self._state_lock:
+            due = current_time - self.last_reasoner_time >= self.reasoner_interval
+            timed = due and has_signal
+            if timed:
+                self.last_reasoner_time = current_time
+        if timed:
             self.logger.info(f"[{symbol}] [定时] 10分钟深度分析 - 使用 DeepSeek Chat V3.1")
             return True
 
         # 条件1：开仓决策使用推理模型（最重要）
-        # 检查是否已有持仓
-        has_position = False
-        try:
-            positions = self.binance.get_positions()
-            for pos in positions:
-                if pos['symbol'] == symbol and float(pos.get('positionAmt', 0)) != 0:
-                    has_position = True
-                    break
-        except:
-            pass
-
-        if not has_position:
-            # 开仓决策也更新Reasoner时间戳，避免重复深度分析
-            self.last_reasoner_time = current_time
+        # 检查是否已有持仓（复用_get_account_info刚获取的持仓，不再单独请求）
+        positions_index = account_info.get('positions_index')
+        if positions_index is None:
+            positions_index = self._index_positions(account_info.get('positions', []))
+        has_position = symbol in positions_index
+
+        if (due or not has_position) and not has_signal:
+            self.logger.info(f"[{symbol}] [预筛选] 无显著技术信号，跳过深度分析")
+            if self.enhanced_features_enabled and self.runtime_manager:
+                self.runtime_manager.increment_reasoner_skips()
+        elif not has_position:
+            # 开仓决策也更新Reasoner时间戳，避免重复深度分析（与定时触发共用同一把锁）
+            with self._state_lock:
+                self.last_reasoner_time = current_time
             self.logger.info(f"[{symbol}] [开仓决策] 深度分析 - 使用 DeepSeek Chat V3.1")
             return True
         
@@ -922,12 +1427,9 @@ class AITradingEngine:
             return True
         
         # 条件3：连续亏损（近3笔全亏）
-        if len(self.trade_history) >= 3:
-            recent_3 = self.trade_history[-3:]
-            all_loss = all(t.get('pnl', 0) < 0 for t in recent_3)
-            if all_loss:
-                self.logger.info(f"[{symbol}] [连续亏损] 深度分析 - 使用 DeepSeek Chat V3.1")
-                return True
+        if stats.last3_all_loss:
+            self.logger.info(f"[{symbol}] [连续亏损] 深度分析 - 使用 DeepSeek Chat V3.1")
+            return True
         
         # 条件4：账户回撤较大（>10%）
         initial_balance = account_info.get('initial_balance', 100)
@@ -938,7 +1440,7 @@ class AITradingEngine:
             return True
         
         # 条件5：高胜率时可使用推理模型优化策略
-        recent_win_rate = self._calculate_recent_win_rate(n=5)
+        recent_win_rate = stats.win_rate5
         if recent_win_rate > 0.7:
             self.logger.info(f"[{symbol}] [高胜率 {recent_win_rate*100:.0f}%] 深度分析优化 - 使用 DeepSeek Chat V3.1")
             return True
@@ -7,10 +7,25 @@ DeepSeek Ai Trade Bot
 import os
 import sys
 import time
+import atexit
+import queue
 import logging
+import logging.handlers
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 import signal
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+# 可选：orjson（C实现的JSON序列化），未安装时回退到标准库 json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # 导入模块
 from binance_client import BinanceClient
@@ -24,6 +39,49 @@ from advanced_position_manager import AdvancedPositionManager  # [NEW V2.0] 高
 from rolling_position_manager import RollingPositionManager  # [NEW V3.0] 浮盈滚仓管理器
 
 
+@dataclass(frozen=True)
+class BotConfig:
+    """机器人环境变量配置（只读）"""
+    binance_api_key: Optional[str]
+    binance_api_secret: Optional[str]
+    testnet: bool
+    deepseek_api_key: Optional[str]
+    initial_capital: float
+    max_position_pct: float
+    default_leverage: int
+    trading_interval: int
+    trading_symbols: Tuple[str, ...]
+
+
+@lru_cache(maxsize=1)
+def load_bot_config() -> BotConfig:
+    """
+    读取并解析环境变量配置（进程内只解析一次）
+
+    Returns:
+        BotConfig 配置对象
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    symbols_str = os.getenv('TRADING_SYMBOLS', 'BTCUSDT,ETHUSDT')
+    return BotConfig(
+        # Binance 配置
+        binance_api_key=os.getenv('BINANCE_API_KEY'),
+        binance_api_secret=os.getenv('BINANCE_API_SECRET'),
+        testnet=os.getenv('BINANCE_TESTNET', 'false').lower() == 'true',
+        # DeepSeek 配置
+        deepseek_api_key=os.getenv('DEEPSEEK_API_KEY'),
+        # 交易配置
+        initial_capital=float(os.getenv('INITIAL_CAPITAL', 10000)),
+        max_position_pct=float(os.getenv('MAX_POSITION_PCT', 10)),
+        default_leverage=int(os.getenv('DEFAULT_LEVERAGE', 3)),
+        trading_interval=int(os.getenv('TRADING_INTERVAL_SECONDS', 300)),
+        # 交易对
+        trading_symbols=tuple(s.strip() for s in symbols_str.split(',')),
+    )
+
+
 class AlphaArenaBot:
     """DeepSeek Ai Trade Bot"""
 
@@ -49,6 +107,17 @@ class AlphaArenaBot:
         self.start_time = datetime.now()
         self.total_invocations = 0  # AI调用总次数
 
+        # AI决策日志（JSONL，每行一条，追加写入）：当前文件行数，首次写入时统计
+        self._decision_lines: Optional[int] = None
+
+        # 无持仓交易对的行情指纹 {symbol: (上次AI分析时的价格, 分析时间)}
+        # 价格相对上次分析变化不足阈值时跳过本轮AI分析；超过最长间隔后无论如何重新分析
+        self._last_seen: Dict[str, Tuple[float, float]] = {}
+        self._unchanged_price_pct = 0.001
+        self._unchanged_max_age = 900  # 秒
+        # 本轮预分析阶段已获取的24h行情 {symbol: ticker}，_process_symbol 直接复用
+        self._cycle_tickers: Dict[str, Dict] = {}
+
         # 设置信号处理
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
@@ -77,32 +146,36 @@ class AlphaArenaBot:
         console_formatter = ProTradingFormatter(compact=True)
         console_handler.setFormatter(console_formatter)
 
-        # 添加handlers
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # 交易线程只把日志记录放入队列，文件/控制台写入由后台监听线程完成，不阻塞主循环
+        log_queue = queue.Queue(-1)
+        self.logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        self._log_listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        self._log_listener.start()
+        # 进程退出时写完队列中剩余的日志
+        atexit.register(self._log_listener.stop)
 
     def _load_config(self):
-        """加载配置"""
-        from dotenv import load_dotenv
-        load_dotenv()
+        """加载配置（环境变量解析结果在进程内缓存，重复创建机器人时直接复用）"""
+        self.cfg = load_bot_config()
 
         # Binance 配置
-        self.binance_api_key = os.getenv('BINANCE_API_KEY')
-        self.binance_api_secret = os.getenv('BINANCE_API_SECRET')
-        self.testnet = os.getenv('BINANCE_TESTNET', 'false').lower() == 'true'
+        self.binance_api_key = self.cfg.binance_api_key
+        self.binance_api_secret = self.cfg.binance_api_secret
+        self.testnet = self.cfg.testnet
 
         # DeepSeek 配置
-        self.deepseek_api_key = os.getenv('DEEPSEEK_API_KEY')
+        self.deepseek_api_key = self.cfg.deepseek_api_key
 
-        # 交易配置
-        self.initial_capital = float(os.getenv('INITIAL_CAPITAL', 10000))
-        self.max_position_pct = float(os.getenv('MAX_POSITION_PCT', 10))
-        self.default_leverage = int(os.getenv('DEFAULT_LEVERAGE', 3))
-        self.trading_interval = int(os.getenv('TRADING_INTERVAL_SECONDS', 300))
+        # 交易配置（initial_capital 会被实际余额覆盖，因此复制到实例属性）
+        self.initial_capital = self.cfg.initial_capital
+        self.max_position_pct = self.cfg.max_position_pct
+        self.default_leverage = self.cfg.default_leverage
+        self.trading_interval = self.cfg.trading_interval
 
         # 交易对
-        symbols_str = os.getenv('TRADING_SYMBOLS', 'BTCUSDT,ETHUSDT')
-        self.trading_symbols = [s.strip() for s in symbols_str.split(',')]
+        self.trading_symbols = list(self.cfg.trading_symbols)
 
         self.logger.info(f"配置加载完成: {len(self.trading_symbols)} 个交易对")
 
@@ -171,6 +244,9 @@ class AlphaArenaBot:
             roll_tracker=self.roll_tracker  # [V3.3] 传入ROLL追踪器
         )
 
+        # 持仓评估后台线程：所有持仓一次批量AI评估，与无持仓交易对的开仓分析并行
+        self._eval_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bot-eval')
+
         # [NEW V2.0] 高级仓位管理器
         self.position_manager = AdvancedPositionManager(
             binance_client=self.binance,
@@ -182,6 +258,9 @@ class AlphaArenaBot:
         self.logger.info(f"\n收到信号 {signum}, 正在优雅关闭...")
         self.running = False
 
+    # 持仓实时快照刷新间隔（秒）：每次刷新为positionRisk + 全市场premiumIndex两次请求
+    LIVE_UPDATE_INTERVAL = 2.0
+
     def run_forever(self):
         """永久运行主循环"""
         self.logger.info("=" * 60)
@@ -192,9 +271,17 @@ class AlphaArenaBot:
         self.logger.info(f"[AI] AI 模型: DeepSeek Chat V3.1")
         self.logger.info("=" * 60)
 
+        # 后台刷新持仓与标记价格快照，移动止损等仓位管理检查直接读取内存
+        try:
+            self.position_manager.start_live_updates(interval=self.LIVE_UPDATE_INTERVAL)
+        except Exception as e:
+            self.logger.warning(f"[WARNING] 启动持仓实时快照失败，改为按需查询: {e}")
+
         cycle_count = 0
 
         while self.running:
+            # 本轮开始时刻（单调时钟）：下一轮按固定节奏开始，本轮耗时从等待时间中扣除
+            cycle_start = time.monotonic()
             try:
                 cycle_count += 1
                 self.logger.info(f"\n{'='*60}")
@@ -202,22 +289,31 @@ class AlphaArenaBot:
                 self.logger.info(f"[TIME] 时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 self.logger.info(f"{'='*60}")
 
-                # 1. 更新账户状态
-                self._update_account_status()
+                # 1. 更新账户状态（本轮持仓只在这里获取一次，之后按交易对查索引，不再逐个请求）
+                positions = self._update_account_status()
+                positions_index = None
+                if positions is not None:
+                    positions_index = {}
+                    for pos in positions:
+                        positions_index.setdefault(pos['symbol'], pos)  # 双向持仓时保留第一条，与get_position一致
 
-                # 2. 对每个交易对进行分析和交易
-                for symbol in self.trading_symbols:
-                    self._process_symbol(symbol)
+                # 2. 无持仓交易对的开仓分析与持仓的批量评估先全部并发发起，推理延迟相互重叠；
+                #    随后逐个处理并执行交易（交易执行保持串行）
+                prefetched, evaluations = self._prefetch_analyses(positions_index)
 
-                    # 短暂延迟避免 API 限流
-                    time.sleep(2)
+                # 对每个交易对进行分析和交易
+                # 不再固定间隔2秒：请求已并发发出，429限流由session按Retry-After自动退避重试
+                for symbol in self.trading_symbols:
+                    self._process_symbol(symbol, prefetched.get(symbol), evaluations, positions_index)
 
                 # 3. 显示性能摘要 (已禁用 - 用户要求去掉)
                 # self._display_performance()
 
-                # 4. 等待下一轮
-                self.logger.info(f"\n[WAIT] 等待 {self.trading_interval} 秒后开始下一轮...")
-                time.sleep(self.trading_interval)
+                # 4. 等待下一轮（按本轮开始时刻计算截止时间，不因本轮耗时累积漂移）
+                elapsed = time.monotonic() - cycle_start
+                sleep_for = max(0.0, self.trading_interval - elapsed)
+                self.logger.info("\n[WAIT] 本轮耗时 %.1f 秒，等待 %.1f 秒后开始下一轮...", elapsed, sleep_for)
+                time.sleep(sleep_for)
 
             except KeyboardInterrupt:
                 self.logger.info("\n[WARNING]  检测到键盘中断，正在关闭...")
@@ -230,8 +326,13 @@ class AlphaArenaBot:
 
         self._shutdown()
 
-    def _update_account_status(self):
-        """更新账户状态"""
+    def _update_account_status(self) -> Optional[List[Dict]]:
+        """
+        更新账户状态
+
+        Returns:
+            本轮获取的活跃持仓列表（供本轮各交易对复用），失败时返回None
+        """
         try:
             # 测量API延迟
             import time as time_module
@@ -246,8 +347,15 @@ class AlphaArenaBot:
             # 计算API延迟
             api_latency_ms = int((time_module.time() - start_time) * 1000)
 
+            # 持仓数值字段一次性转为float64数组：列为 未实现盈亏、持仓数量、开仓价、杠杆
+            fields = np.fromiter(
+                ((float(pos.get('unRealizedProfit', 0)), float(pos.get('positionAmt', 0)),
+                  float(pos.get('entryPrice', 0)), float(pos.get('leverage', 1))) for pos in positions),
+                dtype=np.dtype((np.float64, 4)), count=len(positions))
+            pnls, amts, entry_prices, leverages = fields.T
+
             # 计算总价值
-            unrealized_pnl = sum(float(pos.get('unRealizedProfit', 0)) for pos in positions)
+            unrealized_pnl = float(pnls.sum())
             total_value = balance + unrealized_pnl
 
             # 更新性能追踪
@@ -257,23 +365,15 @@ class AlphaArenaBot:
             metrics = self.performance.calculate_metrics(balance, positions)
 
             # 计算保证金使用率
-            total_margin_used = 0
-            for pos in positions:
-                pos_amt = abs(float(pos.get('positionAmt', 0)))
-                entry_price = float(pos.get('entryPrice', 0))
-                leverage = float(pos.get('leverage', 1))
-                if pos_amt > 0 and entry_price > 0:
-                    notional = pos_amt * entry_price
-                    margin = notional / leverage
-                    total_margin_used += margin
+            notionals = np.abs(amts) * entry_prices
+            active = (amts != 0) & (entry_prices > 0)
+            total_margin_used = float((notionals[active] / leverages[active]).sum())
 
             margin_usage_pct = (total_margin_used / balance * 100) if balance > 0 else 0
 
             # 计算平均杠杆倍数
-            avg_leverage = 0
-            if positions:
-                leverages = [float(pos.get('leverage', 1)) for pos in positions if float(pos.get('positionAmt', 0)) != 0]
-                avg_leverage = sum(leverages) / len(leverages) if leverages else 0
+            open_leverages = leverages[amts != 0]
+            avg_leverage = float(open_leverages.mean()) if len(open_leverages) else 0
 
             # 计算盈亏比（如果有交易历史）
             if hasattr(self.performance, 'trades') and len(self.performance.trades) > 0:
@@ -292,17 +392,18 @@ class AlphaArenaBot:
             should_display = (current_time - self.last_account_display_time) >= self.account_display_interval
 
             if should_display:
-                # 显示增强的账户信息
-                self.logger.info(f"\n[ACCOUNT] 账户状态:")
-                if avg_leverage > 0:
-                    self.logger.info(f"  余额: ${balance:,.2f}  |  持仓数: {len(positions)}  |  杠杆: {avg_leverage:.0f}x  |  保证金使用: {margin_usage_pct:.1f}%")
-                else:
-                    self.logger.info(f"  余额: ${balance:,.2f}  |  持仓数: {len(positions)}  |  保证金使用: {margin_usage_pct:.1f}%")
-                self.logger.info(f"  未实现盈亏: ${unrealized_pnl:,.2f}  |  总价值: ${total_value:,.2f}  |  总收益率: {metrics['total_return_pct']:+.2f}%")
+                # 显示增强的账户信息（多行内容合并为一条日志记录）
+                leverage_part = f"杠杆: {avg_leverage:.0f}x  |  " if avg_leverage > 0 else ""
+                lines = [
+                    "\n[ACCOUNT] 账户状态:",
+                    f"  余额: ${balance:,.2f}  |  持仓数: {len(positions)}  |  {leverage_part}保证金使用: {margin_usage_pct:.1f}%",
+                    f"  未实现盈亏: ${unrealized_pnl:,.2f}  |  总价值: ${total_value:,.2f}  |  总收益率: {metrics['total_return_pct']:+.2f}%",
+                ]
 
                 # 显示性能指标
                 if profit_factor > 0:
-                    self.logger.info(f"  [PERF] 盈亏比: {profit_factor:.2f}  |  最大回撤: {metrics.get('max_drawdown_pct', 0):.2f}%  |  胜率: {metrics.get('win_rate', 0):.1f}%")
+                    lines.append(f"  [PERF] 盈亏比: {profit_factor:.2f}  |  最大回撤: {metrics.get('max_drawdown_pct', 0):.2f}%  |  胜率: {metrics.get('win_rate', 0):.1f}%")
+                self.logger.info("\n".join(lines))
 
                 # [NEW] 清算价预警检查
                 if positions:
@@ -312,36 +413,134 @@ class AlphaArenaBot:
                     )
 
                     if liquidation_warnings:
-                        self.logger.warning(f"\n[WARNING]  检测到 {len(liquidation_warnings)} 个清算风险预警:")
+                        lines = [f"\n[WARNING]  检测到 {len(liquidation_warnings)} 个清算风险预警:"]
                         for warning in liquidation_warnings:
-                            self.logger.warning(f"  {warning['message']}")
-                            self.logger.warning(
+                            lines.append(f"  {warning['message']}")
+                            lines.append(
                                 f"    当前价: ${warning['current_price']:,.2f} | "
                                 f"清算价: ${warning['liquidation_price']:,.2f} | "
                                 f"距离: {warning['distance_pct']:.2f}%"
                             )
+                        self.logger.warning("\n".join(lines))
 
                 # 更新显示时间
                 self.last_account_display_time = current_time
 
+            return positions
+
         except Exception as e:
             self.logger.error(f"更新账户状态失败: {e}")
+            return None
+
+    def _prefetch_analyses(self, positions_index: Optional[Dict[str, Dict]] = None) -> Tuple[Dict, Optional[Future]]:
+        """
+        为当前无持仓的交易对并发发起AI开仓分析，同时在后台批量评估已有持仓
+
+        Args:
+            positions_index: 可选，本轮 {symbol: 持仓} 索引（不传则重新获取）
+
+        Returns:
+            ({symbol: 预先发起的开仓分析}, 持仓批量评估的Future或None)；
+            失败时开仓分析回退为逐个分析，已发起的持仓批量评估照常返回（避免重复评估）
+        """
+        self._cycle_tickers = {}
+        evaluations = None
+        try:
+            if positions_index is None:
+                positions_index = self.binance.get_positions_index()
+            runtime_stats = self.get_runtime_stats()
+
+            held = [positions_index[s] for s in self.trading_symbols if s in positions_index]
+            evaluations = (self._eval_pool.submit(self.ai_engine.analyze_positions_batch, held, runtime_stats)
+                           if held else None)
+
+            # 持仓中的交易对指纹作废：平仓后的第一轮总是重新分析
+            for symbol in positions_index:
+                self._last_seen.pop(symbol, None)
+
+            # 本轮所有交易对的行情一次并发取回；无持仓且价格几乎未变的不再发起AI分析
+            self._cycle_tickers = self._fetch_cycle_tickers(self.trading_symbols)
+            symbols = []
+            for symbol in self.trading_symbols:
+                if symbol in positions_index:
+                    continue
+                ticker = self._cycle_tickers.get(symbol)
+                # 行情获取失败时照常分析
+                if ticker is None or not self._market_unchanged(symbol, float(ticker.get('lastPrice', 0))):
+                    symbols.append(symbol)
+            return self.ai_engine.prefetch_analyses(symbols, runtime_stats=runtime_stats), evaluations
+        except Exception as e:
+            self.logger.warning(f"[WARNING] 并发预分析失败，改为逐个分析: {e}")
+            return {}, evaluations
+
+    def _fetch_cycle_tickers(self, symbols: List[str], max_workers: int = 10) -> Dict[str, Dict]:
+        """
+        并发获取多个交易对的24h行情（总耗时取决于最慢的一个请求，而不是逐个请求耗时之和）
+
+        Args:
+            symbols: 交易对列表
+            max_workers: 最大并发数
+
+        Returns:
+            {symbol: ticker}，获取失败的交易对不在结果中（由 _process_symbol 单独重试）
+        """
+        tickers = {}
+        if not symbols:
+            return tickers
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols)),
+                                thread_name_prefix='bot-ticker') as executor:
+            futures = {executor.submit(self.binance.get_futures_24h_ticker, symbol=symbol): symbol
+                       for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    tickers[symbol] = future.result()
+                except Exception as e:
+                    self.logger.warning(f"[WARNING] {symbol} 行情预取失败: {e}")
+        return tickers
+
+    def _market_unchanged(self, symbol: str, price: float) -> bool:
+        """
+        判断无持仓交易对的价格相对上次AI分析是否几乎未变
+
+        Args:
+            symbol: 交易对
+            price: 当前价格
 
-    def _process_symbol(self, symbol: str):
+        Returns:
+            True表示变化不足阈值且未超过最长间隔，可跳过本轮分析
+        """
+        last = self._last_seen.get(symbol)
+        if last is None or price <= 0:
+            return False
+        last_price, analyzed_at = last
+        if time.time() - analyzed_at >= self._unchanged_max_age:
+            return False
+        return abs(price - last_price) / last_price < self._unchanged_price_pct
+
+    def _process_symbol(self, symbol: str, pending=None, evaluations: Optional[Future] = None,
+                        positions_index: Optional[Dict[str, Dict]] = None):
         """
         处理单个交易对
 
         Args:
             symbol: 交易对
+            pending: 可选，_prefetch_analyses 预先发起的该交易对开仓分析
+            evaluations: 可选，_prefetch_analyses 发起的持仓批量评估（{symbol: 评估结果}）
+            positions_index: 可选，本轮开始时获取的 {symbol: 持仓} 索引（不传则单独查询该交易对持仓）
         """
         try:
             # 获取实时市场数据
             import time as time_module
             start_time = time_module.time()
 
-            # 获取当前价格和24h数据
+            # 获取当前价格和24h数据（预分析阶段已获取的直接复用）
+            current_price = 0.0
             try:
-                ticker = self.binance.get_futures_24h_ticker(symbol=symbol)
+                ticker = self._cycle_tickers.pop(symbol, None)
+                if ticker is None:
+                    ticker = self.binance.get_futures_24h_ticker(symbol=symbol)
                 current_price = float(ticker.get('lastPrice', 0))
                 price_change_24h = float(ticker.get('priceChangePercent', 0))
                 volume_24h = float(ticker.get('volume', 0))
@@ -351,22 +550,19 @@ class AlphaArenaBot:
                 market_data_latency_ms = int((time_module.time() - start_time) * 1000)
 
                 # 显示市场数据
-                self.logger.info(f"\n[ANALYZE] {symbol} 市场数据:")
                 self.logger.info(
-                    f"  价格: ${current_price:,.4f}  {price_change_24h:+.2f}%  |  "
-                    f"24h成交: ${quote_volume_24h:.1f}M"
+                    "\n[ANALYZE] %s 市场数据:\n  价格: $%s  %+.2f%%  |  24h成交: $%.1fM",
+                    symbol, f"{current_price:,.4f}", price_change_24h, quote_volume_24h
                 )
             except Exception as e:
                 self.logger.warning(f"  [WARNING] 获取市场数据失败: {e}")
                 # 继续执行，使用基本分析
 
-            # 检查是否已有持仓
-            positions = self.binance.get_active_positions()
-            existing_position = None
-            for pos in positions:
-                if pos['symbol'] == symbol and float(pos.get('positionAmt', 0)) != 0:
-                    existing_position = pos
-                    break
+            # 检查是否已有持仓（优先查本轮持仓索引，省去每个交易对一次持仓请求）
+            if positions_index is not None:
+                existing_position = positions_index.get(symbol)
+            else:
+                existing_position = self.binance.get_position(symbol)
 
             if existing_position:
                 # [NEW V3.0] 首先检查是否应该滚仓 (浮盈加仓)
@@ -375,14 +571,29 @@ class AlphaArenaBot:
                 # [OK] 新功能: 让AI评估是否应该平仓
                 self.logger.info(f"  [SEARCH] {symbol} 已有持仓，让AI评估是否平仓...")
 
-                # [NEW] 获取运行统计并传递给AI引擎
-                runtime_stats = self.get_runtime_stats()
+                # 优先使用本轮已在后台完成的批量评估；本轮新开的持仓等不在批量中的再单独评估
+                result = None
+                if evaluations is not None:
+                    try:
+                        result = evaluations.result().get(symbol)
+                    except Exception as e:
+                        self.logger.warning(f"  [WARNING] 持仓批量评估失败，改为单独评估: {e}")
+                    else:
+                        # 批量评估内部出错时对每个持仓都返回 success=False，同样改为单独评估
+                        if result is not None and not result.get('success'):
+                            self.logger.warning("  [WARNING] %s 批量评估未成功(%s)，改为单独评估",
+                                                symbol, result.get('error'))
+                            result = None
 
-                result = self.ai_engine.analyze_position_for_closing(
-                    symbol=symbol,
-                    position=existing_position,
-                    runtime_stats=runtime_stats
-                )
+                if result is None:
+                    # [NEW] 获取运行统计并传递给AI引擎
+                    runtime_stats = self.get_runtime_stats()
+
+                    result = self.ai_engine.analyze_position_for_closing(
+                        symbol=symbol,
+                        position=existing_position,
+                        runtime_stats=runtime_stats
+                    )
 
                 # [NEW] 递增AI调用计数
                 self.total_invocations += 1
@@ -396,9 +607,10 @@ class AlphaArenaBot:
 
                     # [OK] 完全信任AI决策，不设置信心阈值
                     if action in ['CLOSE', 'CLOSE_LONG', 'CLOSE_SHORT']:
-                        self.logger.info(f"  ✂️  AI决定平仓 {symbol}")
-                        self.logger.info(f"  [IDEA] 理由: {ai_decision.get('reasoning', '')}")
-                        self.logger.info(f"  [TARGET] 信心度: {ai_decision.get('confidence', 0)}%")
+                        self.logger.info(
+                            "  ✂️  AI决定平仓 %s\n  [IDEA] 理由: %s\n  [TARGET] 信心度: %s%%",
+                            symbol, ai_decision.get('reasoning', ''), ai_decision.get('confidence', 0)
+                        )
 
                         # 获取当前市场价格（平仓价）
                         try:
@@ -408,6 +620,8 @@ class AlphaArenaBot:
 
                         # 执行平仓
                         close_result = self.binance.close_position(symbol)
+                        self.ai_engine.invalidate_account_snapshot()
+                        self.ai_engine.invalidate_market_data(symbol)
 
                         # 记录平仓并计算盈亏
                         pnl = self.performance.record_trade_close(
@@ -429,22 +643,22 @@ class AlphaArenaBot:
                             'pnl': pnl
                         })
 
-                        if pnl > 0:
-                            self.logger.info(f"  [OK] 平仓成功 - 盈利 ${pnl:.2f}")
-                        else:
-                            self.logger.info(f"  [OK] 平仓成功 - 亏损 ${pnl:.2f}")
+                        self.logger.info("  [OK] 平仓成功 - %s $%.2f", '盈利' if pnl > 0 else '亏损', pnl)
 
                     elif action == 'ROLL':
                         # [NEW] 执行浮盈滚仓策略
-                        self.logger.info(f"  🔄 AI决定执行滚仓策略 {symbol}")
-                        self.logger.info(f"  [IDEA] 理由: {ai_decision.get('reasoning', '')}")
-                        self.logger.info(f"  [TARGET] 信心度: {ai_decision.get('confidence', 0)}%")
+                        self.logger.info(
+                            "  🔄 AI决定执行滚仓策略 %s\n  [IDEA] 理由: %s\n  [TARGET] 信心度: %s%%",
+                            symbol, ai_decision.get('reasoning', ''), ai_decision.get('confidence', 0)
+                        )
 
                         roll_result = self.execute_roll_strategy(
                             symbol=symbol,
                             position=existing_position,
                             decision=ai_decision
                         )
+                        self.ai_engine.invalidate_account_snapshot()
+                        self.ai_engine.invalidate_market_data(symbol)
 
                         if roll_result['success']:
                             self.logger.info(f"  [SUCCESS] 滚仓策略执行成功")
@@ -452,13 +666,21 @@ class AlphaArenaBot:
                             self.logger.warning(f"  [WARNING] 滚仓策略执行失败: {roll_result.get('reason', '未知原因')}")
 
                     else:
-                        self.logger.info(f"  [OK] AI建议继续持有 {symbol} (信心度: {ai_decision.get('confidence', 0)}%)")
-                        self.logger.info(f"  [IDEA] 理由: {ai_decision.get('reasoning', '')}")
+                        self.logger.info(
+                            "  [OK] AI建议继续持有 %s (信心度: %s%%)\n  [IDEA] 理由: %s",
+                            symbol, ai_decision.get('confidence', 0), ai_decision.get('reasoning', '')
+                        )
                 else:
                     self.logger.error(f"  [ERROR] 持仓评估失败: {result.get('error')}")
 
                 return  # 处理完持仓后返回
 
+            # 价格相对上次分析几乎未变（预分析阶段已因此跳过）：不再调用AI
+            if pending is None and self._market_unchanged(symbol, current_price):
+                self.logger.info("  [SKIP] %s 价格较上次分析变化不足%.1f%%，跳过本轮AI分析",
+                                 symbol, self._unchanged_price_pct * 100)
+                return
+
             # AI 分析和交易（仅在无持仓时）
             # [NEW] 获取运行统计并传递给AI引擎
             runtime_stats = self.get_runtime_stats()
@@ -466,13 +688,18 @@ class AlphaArenaBot:
             result = self.ai_engine.analyze_and_trade(
                 symbol=symbol,
                 max_position_pct=self.max_position_pct,
-                runtime_stats=runtime_stats
+                runtime_stats=runtime_stats,
+                pending=pending
             )
 
             # [NEW] 递增AI调用计数
             self.total_invocations += 1
 
             if result['success']:
+                # 记录本次分析时的价格（冷却期未调用AI，不记录）
+                if current_price > 0 and result.get('action') != 'COOLDOWN':
+                    self._last_seen[symbol] = (current_price, time.time())
+
                 action = result.get('trade_result', {}).get('action', 'HOLD')
                 ai_decision = result.get('ai_decision', {})
 
@@ -490,12 +717,10 @@ class AlphaArenaBot:
 
                     self.performance.record_trade(trade_info)
 
-                    self.logger.info(f"\n[AI] DEEPSEEK CHAT V3.1 决策:")
-                    self.logger.info(f"  {narrative}")
+                    self.logger.info("\n[AI] DEEPSEEK CHAT V3.1 决策:\n  %s", narrative)
                 else:
                     # HOLD决策 - 显示叙述性说明
-                    self.logger.info(f"\n[AI] DEEPSEEK CHAT V3.1 决策:")
-                    self.logger.info(f"  {narrative}")
+                    self.logger.info("\n[AI] DEEPSEEK CHAT V3.1 决策:\n  %s", narrative)
 
             else:
                 self.logger.error(f"  [ERROR] 交易失败: {result.get('error')}")
@@ -503,22 +728,54 @@ class AlphaArenaBot:
         except Exception as e:
             self.logger.error(f"处理 {symbol} 失败: {e}")
 
+    # AI决策日志文件（JSONL）与保留条数：文件达到两倍保留条数时截断为最近的保留条数
+    DECISIONS_FILE = 'ai_decisions.jsonl'
+    LEGACY_DECISIONS_FILE = 'ai_decisions.json'
+    DECISIONS_KEEP = 200
+
+    def _count_decision_lines(self) -> int:
+        """统计决策日志行数（旧版JSON数组文件存在时先转换为JSONL）"""
+        import json
+        if not os.path.exists(self.DECISIONS_FILE) and os.path.exists(self.LEGACY_DECISIONS_FILE):
+            try:
+                with open(self.LEGACY_DECISIONS_FILE, 'r', encoding='utf-8') as f:
+                    legacy = json.load(f)[-self.DECISIONS_KEEP:]
+                with open(self.DECISIONS_FILE, 'w', encoding='utf-8') as f:
+                    f.writelines(json.dumps(d, ensure_ascii=False) + '\n' for d in legacy)
+                self.logger.info(f"[OK] 已将 {len(legacy)} 条历史决策转换为 {self.DECISIONS_FILE}")
+            except Exception as e:
+                self.logger.warning(f"[WARNING] 转换旧版决策文件失败: {e}")
+
+        try:
+            with open(self.DECISIONS_FILE, 'rb') as f:
+                return sum(1 for _ in f)
+        except FileNotFoundError:
+            return 0
+
+    def _rotate_decisions(self):
+        """只保留最近 DECISIONS_KEEP 条决策（写临时文件后原子替换）"""
+        from collections import deque
+        with open(self.DECISIONS_FILE, 'r', encoding='utf-8') as f:
+            tail = deque(f, maxlen=self.DECISIONS_KEEP)
+        tmp_file = self.DECISIONS_FILE + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.writelines(tail)
+        os.replace(tmp_file, self.DECISIONS_FILE)
+        self._decision_lines = len(tail)
+
     def _save_ai_decision(self, symbol: str, decision: dict, trade_result: dict):
-        """保存增强的AI决策卡片到文件"""
+        """保存增强的AI决策卡片到文件（追加一行JSON，不再读取和重写整个历史）"""
         import json
         try:
-            # 读取现有决策
-            try:
-                with open('ai_decisions.json', 'r') as f:
-                    decisions = json.load(f)
-            except FileNotFoundError:
-                decisions = []
+            if self._decision_lines is None:
+                self._decision_lines = self._count_decision_lines()
 
             # 获取当前账户状态
             try:
                 balance = self.binance.get_futures_usdt_balance()
                 positions = self.binance.get_active_positions()
-                unrealized_pnl = sum(float(pos.get('unRealizedProfit', 0)) for pos in positions)
+                unrealized_pnl = float(np.fromiter((float(pos.get('unRealizedProfit', 0)) for pos in positions),
+                                                   dtype=np.float64, count=len(positions)).sum())
                 total_value = balance + unrealized_pnl
                 metrics = self.performance.calculate_metrics(balance, positions)
             except Exception:
@@ -527,15 +784,13 @@ class AlphaArenaBot:
                 metrics = {'total_return_pct': 0}
                 positions = []
 
-            # 获取交易时段信息
-            from deepseek_client import DeepSeekClient
-            temp_client = DeepSeekClient(self.deepseek_api_key)
-            session_info = temp_client.get_trading_session()
+            # 获取交易时段信息（复用引擎的DeepSeek客户端）
+            session_info = self.ai_engine.deepseek.get_trading_session()
 
             # 构建增强的决策记录
             decision_record = {
                 'timestamp': datetime.now().isoformat(),
-                'cycle': len(decisions) + 1,
+                'cycle': self._decision_lines + 1,
 
                 # [ANALYZE] 账户快照
                 'account_snapshot': {
@@ -592,14 +847,20 @@ class AlphaArenaBot:
                         }
                         break
 
-            decisions.append(decision_record)
-
-            # 只保留最近200条决策
-            decisions = decisions[-200:]
+            # 追加一行
+            if ORJSON_AVAILABLE:
+                # orjson 直接输出UTF-8字节（等价于ensure_ascii=False），自带换行
+                line = orjson.dumps(decision_record,
+                                    option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+            else:
+                line = (json.dumps(decision_record, ensure_ascii=False) + '\n').encode('utf-8')
+            with open(self.DECISIONS_FILE, 'ab') as f:
+                f.write(line)
+            self._decision_lines += 1
 
-            # 保存
-            with open('ai_decisions.json', 'w') as f:
-                json.dump(decisions, f, indent=2, ensure_ascii=False)
+            # 定期截断，只保留最近的决策
+            if self._decision_lines >= 2 * self.DECISIONS_KEEP:
+                self._rotate_decisions()
 
         except Exception as e:
             self.logger.error(f"保存AI决策失败: {e}")
@@ -817,6 +1078,13 @@ class AlphaArenaBot:
             # 保存数据
             self.logger.info("💾 保存数据...")
 
+            # 停止持仓实时快照刷新线程
+            self.position_manager.stop_live_updates()
+
+            # 等待进行中的持仓评估结束后再关闭AI接口连接池，避免评估请求中途失败
+            self._eval_pool.shutdown(wait=True)
+            self.ai_engine.deepseek.close()
+
             self.logger.info("[OK] 关闭完成")
 
         except Exception as e:
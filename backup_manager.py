@@ -32,7 +32,7 @@ class BackupManager:
         # 需要备份的文件列表
         self.backup_files = [
             'performance_data.json',
-            'ai_decisions.json',
+            'ai_decisions.jsonl',
             'roll_state.json',
             'runtime_state.json'
         ]
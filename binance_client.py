@@ -5,6 +5,7 @@ Binance API客户端 - 用于AI代理操控交易账户
 
 import hmac
 import hashlib
+import json
 import time
 import requests
 import logging
@@ -13,6 +14,31 @@ from urllib.parse import urlencode
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+# 可选：orjson（C实现的JSON解析，比标准库快数倍），未安装时回退到 response.json()
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class BinanceAPIError(Exception):
+    """
+    Binance 返回HTTP错误状态时抛出的异常
+
+    消息文本与原先的通用异常一致；调用方按 status_code / code 判断错误类型，
+    不要匹配消息文本（消息中包含带查询参数的完整URL，数量、价格等数字可能误匹配）
+
+    Attributes:
+        status_code: HTTP状态码
+        code: Binance错误码（响应体中的code字段，解析失败时为None）
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
 
 class BinanceClient:
     """Binance API客户端，供AI代理使用"""
@@ -65,7 +91,7 @@ class BinanceClient:
         adapter = HTTPAdapter(
             max_retries=retry_strategy,
             pool_connections=10,  # 连接池大小
-            pool_maxsize=10  # 最大连接数
+            pool_maxsize=50  # 每个主机的最大连接数（多线程并发请求时复用连接）
         )
 
         # 挂载到session
@@ -130,6 +156,8 @@ class BinanceClient:
                     raise ValueError(f"不支持的HTTP方法: {method}")
 
                 response.raise_for_status()
+                if ORJSON_AVAILABLE:
+                    return orjson.loads(response.content)
                 return response.json()
 
             except requests.exceptions.SSLError as e:
@@ -163,12 +191,15 @@ class BinanceClient:
             except requests.exceptions.HTTPError as e:
                 # HTTP错误不重试（4xx, 5xx已经由session处理）
                 error_msg = f"API请求失败: {str(e)}"
+                code = None
                 try:
                     error_detail = response.json()
                     error_msg += f" | 详细信息: {error_detail}"
+                    if isinstance(error_detail, dict):
+                        code = error_detail.get('code')
                 except:
                     pass
-                raise Exception(error_msg)
+                raise BinanceAPIError(error_msg, status_code=response.status_code, code=code)
 
             except Exception as e:
                 # 其他未知错误
@@ -218,6 +249,17 @@ class BinanceClient:
         positions = self.get_futures_positions()
         return [p for p in positions if float(p.get('positionAmt', 0)) != 0]
 
+    def get_positions_index(self) -> Dict[str, Dict]:
+        """获取 {symbol: 活跃持仓} 索引（双向持仓时保留第一条）"""
+        index = {}
+        for pos in self.get_active_positions():
+            index.setdefault(pos['symbol'], pos)
+        return index
+
+    def get_position(self, symbol: str) -> Optional[Dict]:
+        """获取指定交易对的活跃持仓（无持仓返回None）"""
+        return self.get_positions_index().get(symbol)
+
     # ========== 市场数据接口 ==========
 
     def get_ticker_price(self, symbol: str = None) -> Dict:
@@ -444,6 +486,31 @@ class BinanceClient:
         return self._request('POST', '/fapi/v1/order', params=params,
                            signed=True, futures=True)
 
+    def create_futures_batch_orders(self, orders: List[Dict]) -> List[Dict]:
+        """
+        批量创建合约订单 (/fapi/v1/batchOrders，每次请求最多5个订单)
+
+        Args:
+            orders: 订单参数列表，键名与Binance API一致
+                    (如 {'symbol', 'side', 'type', 'quantity', 'stopPrice', 'reduceOnly'})
+
+        Returns:
+            与orders一一对应的结果列表；单个订单被拒绝时对应位置为 {'code': ..., 'msg': ...}
+        """
+        results = []
+        for i in range(0, len(orders), 5):
+            batch = []
+            for order in orders[i:i + 5]:
+                # batchOrders要求所有值为字符串，布尔值为小写 'true'/'false'
+                batch.append({
+                    key: ('true' if value else 'false') if isinstance(value, bool) else str(value)
+                    for key, value in order.items()
+                })
+            params = {'batchOrders': json.dumps(batch)}
+            results.extend(self._request('POST', '/fapi/v1/batchOrders', params=params,
+                                         signed=True, futures=True))
+        return results
+
     def cancel_futures_order(self, symbol: str, order_id: int = None,
                             orig_client_order_id: str = None) -> Dict:
         """取消合约订单"""
@@ -662,6 +729,15 @@ class BinanceClient:
             'cancel': cancel_result
         }
 
+    # 平仓数量小数位（基础币种 → 小数位，默认0.1），与开仓精度规则一致
+    _CLOSE_QTY_DECIMALS = {
+        'BTC': 3,   # 0.001
+        'ETH': 3,   # 0.001
+        'BNB': 1,   # 0.1
+        'SOL': 1,   # 0.1
+        'DOGE': 0,  # 整数
+    }
+
     def close_position_partial(self, symbol: str, percentage: float,
                                position_side: str = 'BOTH') -> Dict:
         """
@@ -697,19 +773,9 @@ class BinanceClient:
             # 计算平仓数量
             close_quantity = abs(position_amt) * (percentage / 100)
 
-            # 根据交易对设置精度（与开仓逻辑保持一致）
-            if 'BTC' in symbol:
-                close_quantity = round(close_quantity, 3)  # BTC: 0.001
-            elif 'ETH' in symbol:
-                close_quantity = round(close_quantity, 3)  # ETH: 0.001
-            elif 'BNB' in symbol:
-                close_quantity = round(close_quantity, 1)  # BNB: 0.1
-            elif 'SOL' in symbol:
-                close_quantity = round(close_quantity, 1)  # SOL: 0.1
-            elif 'DOGE' in symbol:
-                close_quantity = round(close_quantity, 0)  # DOGE: 整数
-            else:
-                close_quantity = round(close_quantity, 1)  # 默认: 0.1
+            # 根据交易对设置精度（与开仓逻辑保持一致，按基础币种精确匹配）
+            base = symbol[:-4] if symbol.endswith('USDT') else symbol
+            close_quantity = round(close_quantity, self._CLOSE_QTY_DECIMALS.get(base, 1))
 
             # 确保不为0
             if close_quantity == 0:
@@ -728,6 +794,10 @@ class BinanceClient:
 
         return {'msg': 'No position to close'}
 
+    # 止损止盈相关的订单类型
+    _STOP_ORDER_TYPES = frozenset({'STOP_MARKET', 'TAKE_PROFIT_MARKET',
+                                   'STOP', 'TAKE_PROFIT', 'TRAILING_STOP_MARKET'})
+
     def cancel_stop_orders(self, symbol: str) -> Dict:
         """
         取消指定交易对的所有止损止盈订单
@@ -748,8 +818,7 @@ class BinanceClient:
             for order in open_orders:
                 order_type = order.get('type', '')
                 # 只取消止损止盈相关订单
-                if order_type in ['STOP_MARKET', 'TAKE_PROFIT_MARKET',
-                                 'STOP', 'TAKE_PROFIT', 'TRAILING_STOP_MARKET']:
+                if order_type in self._STOP_ORDER_TYPES:
                     try:
                         self.cancel_futures_order(symbol, order_id=order['orderId'])
                         cancelled_count += 1
@@ -791,11 +860,7 @@ class BinanceClient:
 
     def get_position_info(self, symbol: str) -> Dict:
         """获取特定交易对的持仓信息"""
-        positions = self.get_futures_positions()
-        for pos in positions:
-            if pos['symbol'] == symbol and float(pos.get('positionAmt', 0)) != 0:
-                return pos
-        return None
+        return self.get_position(symbol)
 
     # ========== 高级订单类型 ==========
 
@@ -988,6 +1053,30 @@ class BinanceClient:
         result = self.get_funding_rate(symbol=symbol, limit=1)
         return result[0] if result else {}
 
+    def get_mark_price(self, symbol: str = None):
+        """
+        获取标记价格与资金费率（premiumIndex）
+
+        Args:
+            symbol: 交易对 (可选，不填则一次返回所有交易对的列表)
+        """
+        params = {}
+        if symbol:
+            params['symbol'] = symbol
+        return self._request('GET', '/fapi/v1/premiumIndex', params=params, futures=True)
+
+    def get_all_funding_rates(self) -> Dict[str, float]:
+        """
+        一次请求获取所有交易对的当前资金费率
+
+        Returns:
+            {symbol: lastFundingRate}
+        """
+        return {
+            item['symbol']: float(item.get('lastFundingRate') or 0)
+            for item in self.get_mark_price()
+        }
+
     def get_open_interest(self, symbol: str) -> Dict:
         """
         获取合约持仓量（Open Interest）
@@ -60,7 +60,7 @@ MAX_POSITIONS = 10  # 最大持仓数量
 # ==================== 性能追踪配置 ====================
 
 PERFORMANCE_DATA_FILE = 'performance_data.json'
-AI_DECISIONS_FILE = 'ai_decisions.json'
+AI_DECISIONS_FILE = 'ai_decisions.jsonl'
 LOG_CONFIG_FILE = 'log_config.json'
 
 # ==================== 高级功能配置 ====================
@@ -4,13 +4,129 @@ DeepSeek API 客户端
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 from datetime import datetime
 import pytz
 
 
+# 持仓评估的通用平仓/持有判断标准（单持仓与批量评估提示词共用）
+_POSITION_CLOSE_CRITERIA = """**应该平仓的情况 (CLOSE)** - 触发以下任一条件:
+1. 🔥 **ROLL达到上限 + 部分止盈**:
+   - ROLL次数 = 6次 且 当前盈利 ≥ 调整后的6%阈值 → 考虑部分止盈（减仓30-40%）
+   - ROLL次数 = 6次 且 当前盈利 ≥ 调整后的8%阈值 → 部分止盈（减仓50%）
+   - ⚠️ 只有ROLL已达上限才考虑平仓，否则优先ROLL
+
+2. [WARNING] **重大止损**: 亏损>1.5%且技术面完全崩溃（RSI背离+MACD剧烈反转+趋势彻底逆转）
+
+3. [LOOP] **极端趋势反转**:
+   - 多单: RSI>75且MACD急剧转负，且价格暴跌
+   - 空单: RSI<25且MACD急剧转正，且价格暴涨
+
+4. [TIMER] **长期无效**: 持仓>24小时且完全没有盈利迹象
+
+⚠️ **关键提醒**：盈利达到6%且ROLL<6次时，应该ROLL而非平仓！
+
+**应该继续持有的情况 (HOLD)**:
+1. ⚡ **刚开仓**: 持仓时间<1小时，无论盈亏，给予充分发展时间
+2. [ANALYZE] **小幅波动**: 盈亏在±2%以内且技术面未剧烈变化
+3. [TREND-UP] **趋势健康**: 技术指标整体支持持仓方向
+4. 💪 **等待ROLL机会**: 当前盈利 3-6%，已启动移动止损，等待达到ROLL阈值
+5. 🔥 **未达ROLL上限**: ROLL次数 < 6次，继续等待ROLL机会而非急于平仓
+
+⚠️ **重要提醒**：
+- 盈利3-6%时：启动移动止损保护，但继续持有等待ROLL
+- ROLL<6次时：优先ROLL而非简单平仓
+- 手续费成本不是过早平仓的理由
+- 最大化利润才是目标，不要急于锁定小额利润
+
+### ⚡ 核心决策原则（按优先级排序）
+1. 🔥 **ROLL滚仓策略 > 简单止盈**
+   - 盈利达到ROLL阈值(6%或4.8%)且ROLL<6次 → 优先ROLL而非平仓
+   - ROLL能最大化利润，不要急于锁定小额利润
+   - 不能用"手续费"、"已有利润"等理由逃避ROLL
+
+2. 🛡️ **移动止损保护 > 固定止损**
+   - 盈利≥3%(或2.4%高杠杆)时启动移动止损
+   - 移动止损是保护机制，不是平仓信号
+   - 继续持有等待ROLL机会
+
+3. 💰 **利润最大化 > 过早止盈**
+   - 目标是锁定"最大化利润"而非"早期小额利润"
+   - ROLL能让2%利润变成15-20%+
+   - 耐心等待ROLL机会比急于平仓更重要
+
+4. [WARNING] **高杠杆阈值调整**
+   - >10x杠杆时所有阈值自动降低20%
+   - 这是强制调整，不能忽略
+
+5. [OK] **避免过早平仓**
+   - 给持仓至少1小时发展时间
+   - 不要被小波动吓到"""
+
+# 持仓评估的系统提示词（单持仓与批量评估共用）
+_POSITION_EVAL_SYSTEM_PROMPT = """你是 DeepSeek Ai Trade Bot 的持仓管理AI。
+
+你的任务是评估现有持仓是否应该平仓。这是风险管理的核心环节。
+
+## 核心原则
+1. **主动锁定利润**: 达到盈利阈值(3%/5%/8%)时必须执行阶梯止盈，不要等待"更高目标"
+2. **真实利润 = 已锁定**: 浮盈不是利润，只有落袋为安的才是真金白银
+3. **及时止损**: 技术面恶化时立即平仓，不要等到触及止损线
+4. **趋势转弱 = 立即平仓**: 宁可错过后续利润，不可把已有盈利变成亏损
+5. **高杠杆更谨慎**: >10x杠杆时止盈阈值降低20% (如5%盈利时就执行原6%的规则)
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+⚠️ [MANDATORY] 强制决策检查清单 - 必须在每次决策前执行
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+在做出HOLD决策前，你必须明确回答以下问题：
+
+[CHECK 1] 高杠杆阈值调整 (Leverage Adjustment)
+- 当前杠杆 >10x？→ 所有阈值必须降低20%（包括ROLL阈值）
+- 计算公式：调整后阈值 = 原始阈值 × 0.8
+- 示例：15x杠杆时，ROLL阈值 6%→4.8%，启动止损 3%→2.4%
+
+[CHECK 2] ROLL滚仓优先检查 (ROLL Priority)
+- 当前盈利 ≥ ROLL阈值(标准6%, 高杠杆4.8%)且趋势强劲？
+  → 优先执行ROLL而非平仓
+- ROLL次数 < 6？→ 继续ROLL加仓，最大化利润
+- ROLL次数 = 6？→ 才考虑部分止盈
+
+[CHECK 3] 移动止损保护 (Trailing Stop Protection)
+- 当前盈利 ≥ 启动阈值(标准3%, 高杠杆2.4%)？
+  → 启动移动止损（回撤2%触发）
+  → 但继续持有，等待ROLL机会
+- 每次ROLL后：自动移动止损到盈亏平衡点
+
+[CHECK 4] 高杠杆阈值计算表 (Quick Reference)
+当前杠杆 | 启动止损 | ROLL阈值 | ROLL上限后止盈
+---------|---------|---------|-------------
+1-10x    | 3.0%    | 6.0%    | 8.0%
+11-15x   | 2.4%    | 4.8%    | 6.4%
+16-20x   | 2.4%    | 4.8%    | 6.4%
+21-30x   | 2.4%    | 4.8%    | 6.4%
+
+⚠️ **违规后果警告**：
+- 如果当前盈利已达到强制阈值但仍选择HOLD而不执行止盈：
+  → 你的决策将被视为违反风险管理原则
+  → 可能导致浮盈回吐，把盈利变成亏损
+  → 违背"真实利润=已锁定利润"的核心原则
+
+💬 **重要**: 用第一人称叙述你的持仓评估，像真实交易员一样表达思考过程！
+
+回复必须是严格的 JSON 格式，必须包含以下强制字段：
+- narrative: 你的持仓评估reasoning
+- leverage_adjustment_applied: (true/false) 是否应用了高杠杆阈值调整
+- adjusted_thresholds: {trailing_stop: X%, partial_tp_30: Y%, partial_tp_50: Z%}
+- mandatory_action_triggered: (true/false) 是否触发了强制止盈规则
+- compliance_status: "COMPLIANT" 或 "VIOLATION: 具体违规原因"
+"""
+
+
 class DeepSeekClient:
     """DeepSeek API 客户端"""
 
@@ -30,6 +146,45 @@ class DeepSeekClient:
         }
         self.logger = logging.getLogger(__name__)
 
+        # 持久化session：跨调用复用TCP/TLS连接，省去每次请求的握手开销
+        self.session = self._create_session()
+
+    def _create_session(self) -> requests.Session:
+        """
+        创建带连接池和重试机制的requests session
+
+        自动重试策略:
+        - 429/5xx: 重试2次，遵循服务端 Retry-After 头，否则指数退避 1s, 2s
+        - 连接错误: 重试2次
+        - 读超时: 不在此重试（由 chat_completion 的重试循环处理，避免重复计时）
+        """
+        session = requests.Session()
+
+        retry_strategy = Retry(
+            total=2,
+            connect=2,
+            read=0,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["POST"],
+            respect_retry_after_header=True,
+            raise_on_status=False  # 重试耗尽后返回最后的响应，由 raise_for_status 抛出
+        )
+
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=1,  # 只访问一个API主机
+            pool_maxsize=16  # 多个交易对并发调用AI时复用连接
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        return session
+
+    def close(self):
+        """关闭底层HTTP连接池（程序退出时调用）"""
+        self.session.close()
+
     def get_trading_session(self) -> Dict:
         """
         获取当前交易时段信息
@@ -137,7 +292,7 @@ class DeepSeekClient:
                 if attempt > 0:
                     self.logger.warning(f"正在重试... (第{attempt}/{max_retries}次)")
 
-                response = requests.post(
+                response = self.session.post(
                     f"{self.base_url}/chat/completions",
                     headers=self.headers,
                     json=payload,
@@ -1302,58 +1457,7 @@ class DeepSeekClient:
 - ROLL已6次才考虑部分止盈 → 确保利润最大化
 - **最大化利润才是终极目标！**
 
-**应该平仓的情况 (CLOSE)** - 触发以下任一条件:
-1. 🔥 **ROLL达到上限 + 部分止盈**:
-   - ROLL次数 = 6次 且 当前盈利 ≥ 调整后的6%阈值 → 考虑部分止盈（减仓30-40%）
-   - ROLL次数 = 6次 且 当前盈利 ≥ 调整后的8%阈值 → 部分止盈（减仓50%）
-   - ⚠️ 只有ROLL已达上限才考虑平仓，否则优先ROLL
-
-2. [WARNING] **重大止损**: 亏损>1.5%且技术面完全崩溃（RSI背离+MACD剧烈反转+趋势彻底逆转）
-
-3. [LOOP] **极端趋势反转**:
-   - 多单: RSI>75且MACD急剧转负，且价格暴跌
-   - 空单: RSI<25且MACD急剧转正，且价格暴涨
-
-4. [TIMER] **长期无效**: 持仓>24小时且完全没有盈利迹象
-
-⚠️ **关键提醒**：盈利达到6%且ROLL<6次时，应该ROLL而非平仓！
-
-**应该继续持有的情况 (HOLD)**:
-1. ⚡ **刚开仓**: 持仓时间<1小时，无论盈亏，给予充分发展时间
-2. [ANALYZE] **小幅波动**: 盈亏在±2%以内且技术面未剧烈变化
-3. [TREND-UP] **趋势健康**: 技术指标整体支持持仓方向
-4. 💪 **等待ROLL机会**: 当前盈利 3-6%，已启动移动止损，等待达到ROLL阈值
-5. 🔥 **未达ROLL上限**: ROLL次数 < 6次，继续等待ROLL机会而非急于平仓
-
-⚠️ **重要提醒**：
-- 盈利3-6%时：启动移动止损保护，但继续持有等待ROLL
-- ROLL<6次时：优先ROLL而非简单平仓
-- 手续费成本不是过早平仓的理由
-- 最大化利润才是目标，不要急于锁定小额利润
-
-### ⚡ 核心决策原则（按优先级排序）
-1. 🔥 **ROLL滚仓策略 > 简单止盈**
-   - 盈利达到ROLL阈值(6%或4.8%)且ROLL<6次 → 优先ROLL而非平仓
-   - ROLL能最大化利润，不要急于锁定小额利润
-   - 不能用"手续费"、"已有利润"等理由逃避ROLL
-
-2. 🛡️ **移动止损保护 > 固定止损**
-   - 盈利≥3%(或2.4%高杠杆)时启动移动止损
-   - 移动止损是保护机制，不是平仓信号
-   - 继续持有等待ROLL机会
-
-3. 💰 **利润最大化 > 过早止盈**
-   - 目标是锁定"最大化利润"而非"早期小额利润"
-   - ROLL能让2%利润变成15-20%+
-   - 耐心等待ROLL机会比急于平仓更重要
-
-4. [WARNING] **高杠杆阈值调整**
-   - >10x杠杆时所有阈值自动降低20%
-   - 这是强制调整，不能忽略
-
-5. [OK] **避免过早平仓**
-   - 给持仓至少1小时发展时间
-   - 不要被小波动吓到
+{_POSITION_CLOSE_CRITERIA}
 
 请返回严格的JSON格式，包含叙述性决策说明：
 {{
@@ -1379,63 +1483,7 @@ class DeepSeekClient:
         messages = [
             {
                 "role": "system",
-                "content": """你是 DeepSeek Ai Trade Bot 的持仓管理AI。
-
-你的任务是评估现有持仓是否应该平仓。这是风险管理的核心环节。
-
-## 核心原则
-1. **主动锁定利润**: 达到盈利阈值(3%/5%/8%)时必须执行阶梯止盈，不要等待"更高目标"
-2. **真实利润 = 已锁定**: 浮盈不是利润，只有落袋为安的才是真金白银
-3. **及时止损**: 技术面恶化时立即平仓，不要等到触及止损线
-4. **趋势转弱 = 立即平仓**: 宁可错过后续利润，不可把已有盈利变成亏损
-5. **高杠杆更谨慎**: >10x杠杆时止盈阈值降低20% (如5%盈利时就执行原6%的规则)
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-⚠️ [MANDATORY] 强制决策检查清单 - 必须在每次决策前执行
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-在做出HOLD决策前，你必须明确回答以下问题：
-
-[CHECK 1] 高杠杆阈值调整 (Leverage Adjustment)
-- 当前杠杆 >10x？→ 所有阈值必须降低20%（包括ROLL阈值）
-- 计算公式：调整后阈值 = 原始阈值 × 0.8
-- 示例：15x杠杆时，ROLL阈值 6%→4.8%，启动止损 3%→2.4%
-
-[CHECK 2] ROLL滚仓优先检查 (ROLL Priority)
-- 当前盈利 ≥ ROLL阈值(标准6%, 高杠杆4.8%)且趋势强劲？
-  → 优先执行ROLL而非平仓
-- ROLL次数 < 6？→ 继续ROLL加仓，最大化利润
-- ROLL次数 = 6？→ 才考虑部分止盈
-
-[CHECK 3] 移动止损保护 (Trailing Stop Protection)
-- 当前盈利 ≥ 启动阈值(标准3%, 高杠杆2.4%)？
-  → 启动移动止损（回撤2%触发）
-  → 但继续持有，等待ROLL机会
-- 每次ROLL后：自动移动止损到盈亏平衡点
-
-[CHECK 4] 高杠杆阈值计算表 (Quick Reference)
-当前杠杆 | 启动止损 | ROLL阈值 | ROLL上限后止盈
----------|---------|---------|-------------
-1-10x    | 3.0%    | 6.0%    | 8.0%
-11-15x   | 2.4%    | 4.8%    | 6.4%
-16-20x   | 2.4%    | 4.8%    | 6.4%
-21-30x   | 2.4%    | 4.8%    | 6.4%
-
-⚠️ **违规后果警告**：
-- 如果当前盈利已达到强制阈值但仍选择HOLD而不执行止盈：
-  → 你的决策将被视为违反风险管理原则
-  → 可能导致浮盈回吐，把盈利变成亏损
-  → 违背"真实利润=已锁定利润"的核心原则
-
-💬 **重要**: 用第一人称叙述你的持仓评估，像真实交易员一样表达思考过程！
-
-回复必须是严格的 JSON 格式，必须包含以下强制字段：
-- narrative: 你的持仓评估reasoning
-- leverage_adjustment_applied: (true/false) 是否应用了高杠杆阈值调整
-- adjusted_thresholds: {trailing_stop: X%, partial_tp_30: Y%, partial_tp_50: Z%}
-- mandatory_action_triggered: (true/false) 是否触发了强制止盈规则
-- compliance_status: "COMPLIANT" 或 "VIOLATION: 具体违规原因"
-"""
+                "content": _POSITION_EVAL_SYSTEM_PROMPT
             },
             {
                 "role": "user",
@@ -1465,6 +1513,120 @@ class DeepSeekClient:
                 'reasoning': f'AI评估失败，保守选择继续持有: {str(e)}'
             }
 
+    def evaluate_positions_for_closing(self, positions: List[Tuple[Dict, Dict]], account_info: Dict,
+                                       roll_tracker=None) -> Dict[str, Dict]:
+        """
+        在一次AI调用中批量评估多个持仓是否应该平仓
+
+        Args:
+            positions: [(position_info, market_data), ...]，格式同 evaluate_position_for_closing
+            account_info: 账户信息
+            roll_tracker: ROLL状态追踪器
+
+        Returns:
+            {symbol: AI决策}，AI未返回或解析失败的持仓不在结果中（由调用方单独评估）
+        """
+        session_info = self.get_trading_session()
+
+        position_sections = []
+        for position_info, market_data in positions:
+            symbol = position_info['symbol']
+            roll_count = 0
+            original_entry_price = position_info.get('entry_price', 0)
+            if roll_tracker:
+                roll_count = roll_tracker.get_roll_count(symbol)
+                orig_price = roll_tracker.get_original_entry_price(symbol)
+                if orig_price is not None:
+                    original_entry_price = orig_price
+
+            high_leverage = position_info['leverage'] > 10
+            trailing_pct = 2.4 if high_leverage else 3.0
+            roll_pct = 4.8 if high_leverage else 6.0
+            partial_tp_pct = 6.4 if high_leverage else 8.0
+            pnl_pct = position_info['unrealized_pnl_pct']
+            rsi = market_data.get('rsi', 'N/A')
+            histogram = market_data.get('macd', {}).get('histogram', 'N/A')
+            # 与单持仓评估相同的RSI/MACD解读标签
+            if isinstance(rsi, (int, float)):
+                rsi_label = '[超卖]' if rsi < 30 else '[超买]' if rsi > 70 else '[中性]'
+            else:
+                rsi_label = ''
+            macd_label = ('看涨' if histogram > 0 else '看跌') if isinstance(histogram, (int, float)) else 'N/A'
+
+            position_sections.append(f"""
+### [ANALYZE] {symbol}
+- **方向**: {position_info['side']} ({"多单" if position_info['side'] == 'LONG' else "空单"})
+- **开仓价**: ${position_info['entry_price']:.2f} / **当前价**: ${position_info['current_price']:.2f}
+- **未实现盈亏**: ${position_info['unrealized_pnl']:+.2f} ({pnl_pct:+.2f}%)
+- **杠杆**: {position_info['leverage']}x / **持仓时长**: {position_info['holding_time']} / **名义价值**: ${position_info['notional_value']:.2f}
+- **RSI(14)**: {rsi} {rsi_label} / **MACD柱**: {histogram} ({macd_label}) / **趋势**: {market_data.get('trend', 'N/A')} / **24h变化**: {market_data.get('price_change_24h', 'N/A')}%
+- **ROLL次数**: {roll_count}/6 ({'✅ 可以继续ROLL' if roll_count < 6 else '⛔ 已达上限，优先止盈'}) / **原始入场价**: ${original_entry_price:.2f}
+- **调整后阈值**: 启动止损 {trailing_pct}%{' ← 已达到' if pnl_pct >= trailing_pct else ''} / ROLL {roll_pct}%{' ← 已达到' if pnl_pct >= roll_pct else ''} / ROLL上限后止盈 {partial_tp_pct}%{' ← 已达到' if pnl_pct >= partial_tp_pct else ''}""")
+
+        prompt = f"""
+## [SEARCH] 批量持仓评估任务
+
+你需要逐个评估以下 {len(position_sections)} 个持仓是否应该平仓，每个持仓独立决策。
+
+### [TIMER] 当前交易时段
+- **时段**: {session_info['session']} (北京时间{session_info['beijing_hour']}:00)
+- **波动性**: {session_info['volatility'].upper()}
+- **时段建议**: {session_info['recommendation']}
+
+### [ACCOUNT] 账户状态
+- **账户余额**: ${account_info.get('balance', 0):.2f}
+- **总价值**: ${account_info.get('total_value', 0):.2f}
+- **持仓数量**: {account_info.get('positions_count', len(position_sections))}
+{''.join(position_sections)}
+
+### [TARGET] 评估标准（>10x杠杆的持仓已按降低20%后的阈值列出）
+
+{_POSITION_CLOSE_CRITERIA}
+
+请返回严格的JSON格式，每个持仓一条决策：
+{{
+    "decisions": [
+        {{
+            "symbol": "交易对",
+            "action": "CLOSE" | "CLOSE_LONG" | "CLOSE_SHORT" | "HOLD",
+            "confidence": 0-100,
+            "narrative": "用第一人称叙述对该持仓的评估，100-200字",
+            "close_percentage": 50-100  (可选，默认100%全平)
+        }}
+    ]
+}}"""
+
+        messages = [
+            {"role": "system", "content": _POSITION_EVAL_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+        symbols = [position_info['symbol'] for position_info, _ in positions]
+        decisions = {}
+        try:
+            response = self.chat_completion(messages, temperature=0.3, max_tokens=4000)
+            ai_response = response['choices'][0]['message']['content']
+
+            json_start = ai_response.find('{')
+            json_end = ai_response.rfind('}') + 1
+            parsed = json.loads(ai_response[json_start:json_end])
+            for item in parsed.get('decisions', []):
+                symbol = item.get('symbol')
+                if symbol in symbols:
+                    try:
+                        decisions[symbol] = self._validate_and_normalize_decision(item)
+                    except ValueError as e:
+                        self.logger.error(f"[{symbol}] 批量持仓评估结果无效: {e}")
+
+        except Exception as e:
+            self.logger.error("批量持仓评估失败: %s", e)
+
+        # AI遗漏或解析失败的持仓不再默认HOLD，交由调用方单独评估
+        for symbol in symbols:
+            if symbol not in decisions:
+                self.logger.warning("[%s] AI批量评估未返回该持仓的有效决策", symbol)
+        return decisions
+
     def _build_trading_prompt(self, market_data: Dict,
                              account_info: Dict,
                              trade_history: List[Dict] = None) -> str:
@@ -30,7 +30,7 @@ class LogManager:
         """
         self.data_dir = data_dir
         self.performance_file = os.path.join(data_dir, 'performance_data.json')
-        self.decisions_file = os.path.join(data_dir, 'ai_decisions.json')
+        self.decisions_file = os.path.join(data_dir, 'ai_decisions.jsonl')
         self.archive_dir = os.path.join(data_dir, 'archives')
         self.config_file = os.path.join(data_dir, 'log_config.json')
 
@@ -95,8 +95,8 @@ class LogManager:
 
                 if os.path.exists(self.decisions_file):
                     shutil.copy2(self.decisions_file,
-                               os.path.join(backup_dir, 'ai_decisions.json'))
-                    logger.info(f"  ✅ ai_decisions.json → {backup_dir}")
+                               os.path.join(backup_dir, 'ai_decisions.jsonl'))
+                    logger.info(f"  ✅ ai_decisions.jsonl → {backup_dir}")
 
             # 重置 performance_data.json
             initial_performance = {
@@ -119,10 +119,9 @@ class LogManager:
                 json.dump(initial_performance, f, indent=2)
             logger.info("✅ performance_data.json 已重置")
 
-            # 重置 ai_decisions.json
-            with open(self.decisions_file, 'w') as f:
-                json.dump([], f, indent=2)
-            logger.info("✅ ai_decisions.json 已重置")
+            # 重置 ai_decisions.jsonl（清空即可，每行一条决策）
+            open(self.decisions_file, 'w').close()
+            logger.info("✅ ai_decisions.jsonl 已重置")
 
             # 更新配置
             self.config['last_reset_date'] = timestamp
@@ -8,6 +8,88 @@ import numpy as np
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 
+# 可选：numba（JIT编译指标递推/极值扫描内核），未安装时回退到pandas/NumPy实现
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+# 内核使用显式签名：导入时即完成编译（cache=True 时直接读取磁盘缓存），调用时不再做类型推断；
+# 所有调用方传入 float64 数组（布局不限）和 Python 标量。
+# 不启用 fastmath：ewm_mean 需与 pandas 逐位一致，不能允许浮点重排
+if NUMBA_AVAILABLE:
+    @njit('float64[:](float64[:], float64)', cache=True)
+    def ewm_mean(values, alpha):
+        """
+        adjust=False 的指数加权均值序列（输入不含NaN）
+
+        逐步复现 pandas ewm 的运算顺序，结果与 pd.Series.ewm(alpha, adjust=False).mean() 逐位一致
+        """
+        n = values.shape[0]
+        out = np.empty(n)
+        if n == 0:
+            return out
+        weighted = values[0]
+        out[0] = weighted
+        old_wt = 1.0 - alpha
+        for j in range(1, n):
+            cur = values[j]
+            if weighted != cur:
+                weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+            out[j] = weighted
+        return out
+else:
+    def ewm_mean(values, alpha):
+        """adjust=False 的指数加权均值序列（pandas C实现）"""
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+if NUMBA_AVAILABLE:
+    @njit('UniTuple(float64[:], 2)(float64[:], int64)', cache=True)
+    def sliding_minmax(arr, window):
+        """
+        单调队列滑动窗口最小/最大值：每个元素最多入队、出队各一次，总复杂度O(N)
+
+        返回长度为 N-window+1 的两个数组，第k项为 arr[k:k+window] 的最小/最大值
+        """
+        n = arr.shape[0]
+        mins = np.empty(n - window + 1)
+        maxs = np.empty(n - window + 1)
+        # 用预分配的下标数组模拟双端队列：[head, tail) 为队列内容
+        qmin = np.empty(n, np.int64)
+        qmax = np.empty(n, np.int64)
+        hmin = tmin = 0
+        hmax = tmax = 0
+        for j in range(n):
+            v = arr[j]
+            # 弹出被新元素支配的队尾（不可能再成为窗口极值）
+            while tmin > hmin and arr[qmin[tmin - 1]] >= v:
+                tmin -= 1
+            qmin[tmin] = j
+            tmin += 1
+            while tmax > hmax and arr[qmax[tmax - 1]] <= v:
+                tmax -= 1
+            qmax[tmax] = j
+            tmax += 1
+
+            k = j - window + 1
+            if k >= 0:
+                # 窗口每次右移一格，队首最多一个过期下标
+                if qmin[hmin] < k:
+                    hmin += 1
+                if qmax[hmax] < k:
+                    hmax += 1
+                mins[k] = arr[qmin[hmin]]
+                maxs[k] = arr[qmax[hmax]]
+        return mins, maxs
+else:
+    def sliding_minmax(arr, window):
+        """同一个滑动窗口视图上分别求最小/最大值（C层向量化，无需逐元素Python循环）"""
+        windows = np.lib.stride_tricks.sliding_window_view(arr, window)
+        return windows.min(axis=1), windows.max(axis=1)
+
 
 class MarketAnalyzer:
     """市场数据分析器"""
@@ -136,15 +218,62 @@ class MarketAnalyzer:
 
     def calculate_atr(self, df: pd.DataFrame, period: int = 14) -> pd.Series:
         """计算平均真实波幅（ATR）"""
-        high_low = df['high'] - df['low']
-        high_close = np.abs(df['high'] - df['close'].shift())
-        low_close = np.abs(df['low'] - df['close'].shift())
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        close = df['close'].to_numpy(dtype=float)
 
-        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        atr = true_range.rolling(window=period).mean()
+        # 第一根K线没有前收盘价，真实波幅取 高-低
+        true_range = np.concatenate((high[:1] - low[:1], self.true_range(high, low, close)))
+        atr = pd.Series(true_range, index=df.index).rolling(window=period).mean()
 
         return atr
 
+    @staticmethod
+    def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+        """
+        真实波幅 = max(高-低, |高-前收|, |低-前收|)（向量化，长度比输入少1）
+        """
+        return np.maximum.reduce([
+            high[1:] - low[1:],
+            np.abs(high[1:] - close[:-1]),
+            np.abs(low[1:] - close[:-1])
+        ])
+
+    @staticmethod
+    def wilder_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                   period: int = 14) -> float:
+        """
+        Wilder平滑ATR（等价于 alpha=1/period 的EMA），返回最新值
+
+        Args:
+            high/low/close: 价格序列
+            period: ATR周期（默认14）
+
+        Returns:
+            最新ATR值（数据不足时返回0.0）
+        """
+        if len(close) < period + 1:
+            return 0.0
+        true_range = MarketAnalyzer.true_range(high, low, close)
+        return float(ewm_mean(true_range, 1 / period)[-1])
+
+    @staticmethod
+    def atr_fast(klines, period: int = 14) -> float:
+        """
+        直接基于原始K线快速计算最新ATR（Wilder平滑，NumPy/pandas向量化，无需构建DataFrame）
+
+        Args:
+            klines: get_klines返回的原始K线列表，或已转换的二维float数组
+            period: ATR周期（默认14）
+
+        Returns:
+            最新ATR值（数据不足时返回0.0）
+        """
+        arr = np.asarray(klines, dtype=np.float64)
+        if arr.ndim != 2 or arr.shape[0] < period + 1:
+            return 0.0
+        return MarketAnalyzer.wilder_atr(arr[:, 2], arr[:, 3], arr[:, 4], period)
+
     # ========== 交易信号 ==========
 
     def get_trend_signal(self, symbol: str, interval: str = '1h') -> Dict:
@@ -323,17 +452,24 @@ class MarketAnalyzer:
             包含支撑阻力位的字典
         """
         df = self.get_kline_data(symbol, interval, lookback)
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+
+        # 找局部高点和低点：K线高（低）点等于前后各2根共5根窗口内的最大（最小）值
+        # 滑动窗口极值一次求出，与 rolling(window=5, center=True) 结果一致
+        if len(df) >= 5:
+            high_center = high[2:-2]
+            low_center = low[2:-2]
+            _, high_max = sliding_minmax(high, 5)
+            low_min, _ = sliding_minmax(low, 5)
+            resistance_levels = np.unique(high_center[high_center == high_max])
+            support_levels = np.unique(low_center[low_center == low_min])
+        else:
+            resistance_levels = support_levels = np.empty(0)
 
-        # 找局部高点和低点
-        df['local_max'] = df['high'].rolling(window=5, center=True).max()
-        df['local_min'] = df['low'].rolling(window=5, center=True).min()
-
-        resistance_levels = df[df['high'] == df['local_max']]['high'].unique()
-        support_levels = df[df['low'] == df['local_min']]['low'].unique()
-
-        # 排序并取最近的几个
-        resistance_levels = sorted(resistance_levels, reverse=True)[:3]
-        support_levels = sorted(support_levels, reverse=True)[:3]
+        # 排序并取最近的几个（np.unique 结果已升序，倒序取前3个）
+        resistance_levels = resistance_levels[::-1][:3]
+        support_levels = support_levels[::-1][:3]
 
         current_price = df['close'].iloc[-1]
 
@@ -7,6 +7,7 @@
 
 import json
 import logging
+import threading
 from datetime import datetime
 from typing import Dict, Any
 import os
@@ -24,6 +25,8 @@ class RuntimeStateManager:
             state_file: 状态文件路径
         """
         self.state_file = state_file
+        # 多个分析线程并发更新计数并保存：修改与写文件都在锁内进行
+        self._lock = threading.RLock()
         self.state = self._load_or_initialize()
 
     def _load_or_initialize(self) -> Dict[str, Any]:
@@ -44,6 +47,7 @@ class RuntimeStateManager:
             "total_runtime_minutes": 0,
             "total_ai_calls": 0,
             "total_trading_loops": 0,
+            "total_reasoner_skips": 0,
             "session_start_time": datetime.now().isoformat(),
             "metadata": {
                 "version": "2.0",
@@ -56,29 +60,44 @@ class RuntimeStateManager:
         return initial_state
 
     def _save(self, state: Dict[str, Any] = None):
-        """保存状态到文件"""
+        """保存状态到文件（写临时文件后原子替换，避免读到写了一半的文件）"""
         if state is None:
             state = self.state
 
         try:
-            # 更新最后保存时间
-            state['last_update_timestamp'] = datetime.now().isoformat()
+            with self._lock:
+                # 更新最后保存时间
+                state['last_update_timestamp'] = datetime.now().isoformat()
 
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(state, f, indent=2, ensure_ascii=False)
+                tmp_file = self.state_file + '.tmp'
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_file, self.state_file)
 
         except Exception as e:
             logger.error(f"[ERROR] 保存状态文件失败: {e}")
 
     def increment_ai_calls(self):
         """增加AI调用计数"""
-        self.state['total_ai_calls'] += 1
-        self._save()
+        with self._lock:
+            self.state['total_ai_calls'] += 1
+            self._save()
+
+    def increment_reasoner_skips(self):
+        """
+        增加深度分析被预筛选跳过的计数（用于调整预筛选阈值）
+
+        仅更新内存中的计数，不单独写文件：随下一次 update_runtime /
+        increment_trading_loops 的状态保存一并持久化
+        """
+        with self._lock:
+            self.state['total_reasoner_skips'] = self.state.get('total_reasoner_skips', 0) + 1
 
     def increment_trading_loops(self):
         """增加交易循环计数"""
-        self.state['total_trading_loops'] += 1
-        self._save()
+        with self._lock:
+            self.state['total_trading_loops'] += 1
+            self._save()
 
     def update_runtime(self):
         """更新运行时长（分钟）"""
@@ -86,12 +105,14 @@ class RuntimeStateManager:
         current_time = datetime.now()
         runtime_minutes = int((current_time - start_time).total_seconds() / 60)
 
-        self.state['total_runtime_minutes'] = runtime_minutes
-        self._save()
+        with self._lock:
+            self.state['total_runtime_minutes'] = runtime_minutes
+            self._save()
 
     def get_state(self) -> Dict[str, Any]:
         """获取当前状态"""
-        return self.state.copy()
+        with self._lock:
+            return self.state.copy()
 
     def get_runtime_summary(self) -> str:
         """获取运行时长摘要（格式化字符串）"""
@@ -107,9 +128,10 @@ class RuntimeStateManager:
     def reset_session(self):
         """重置会话（保留历史总计，但重新开始计时）"""
         logger.info("[LOOP] 重置会话状态")
-        self.state['session_start_time'] = datetime.now().isoformat()
-        self.state['total_runtime_minutes'] = 0
-        self._save()
+        with self._lock:
+            self.state['session_start_time'] = datetime.now().isoformat()
+            self.state['total_runtime_minutes'] = 0
+            self._save()
 
 
 if __name__ == "__main__":
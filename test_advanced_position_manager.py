@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+高级仓位管理器单元测试（模拟 BinanceClient，不访问网络）
+验证: 请求重试/熔断的错误分类、移动止损到盈亏平衡时的旧止损替换、滚仓时杠杆与下单的顺序、
+撤销全部挂单的数量统计、实时快照过期回退
+"""
+
+import unittest
+from unittest import mock
+
+from binance_client import BinanceAPIError
+from advanced_position_manager import AdvancedPositionManager, _classify_error
+
+
+def make_manager(client=None):
+    """创建使用模拟客户端的仓位管理器（重试不实际等待）"""
+    manager = AdvancedPositionManager(client or mock.Mock(), mock.Mock())
+    manager._retry_backoff = 0
+    return manager
+
+
+class ClassifyErrorTest(unittest.TestCase):
+    """按状态码/错误码分类，不受URL中数字影响"""
+
+    def test_client_error_with_rate_limit_like_numbers_in_url(self):
+        e = BinanceAPIError(
+            "API请求失败: 400 Client Error: Bad Request for url: "
+            "https://fapi.binance.com/fapi/v1/order?quantity=429&stopPrice=0.418",
+            status_code=400, code=-1111)
+        self.assertEqual(_classify_error(e), 'client')
+
+    def test_rate_limit_by_status(self):
+        self.assertEqual(_classify_error(BinanceAPIError('x', status_code=429)), 'rate_limit')
+        self.assertEqual(_classify_error(BinanceAPIError('x', status_code=418)), 'rate_limit')
+
+    def test_rate_limit_by_code(self):
+        self.assertEqual(_classify_error(BinanceAPIError('x', status_code=None, code=-1003)), 'rate_limit')
+
+    def test_server_and_network_errors(self):
+        self.assertEqual(_classify_error(BinanceAPIError('x', status_code=503)), 'other')
+        self.assertEqual(_classify_error(Exception('400 Client Error quantity=429')), 'other')
+
+
+class CallWithRetryTest(unittest.TestCase):
+    """限流重试、4xx直接抛出、熔断计数"""
+
+    def test_client_error_not_retried_nor_counted(self):
+        manager = make_manager()
+        fn = mock.Mock(side_effect=BinanceAPIError('quantity=429', status_code=400, code=-1111))
+        with self.assertRaises(BinanceAPIError):
+            manager._call_with_retry('BTCUSDT', fn)
+        self.assertEqual(fn.call_count, 1)
+        self.assertEqual(manager._cb['BTCUSDT'].failures, 0)
+
+    def test_rate_limit_retried_then_succeeds(self):
+        manager = make_manager()
+        fn = mock.Mock(side_effect=[BinanceAPIError('x', status_code=429), {'orderId': 1}])
+        self.assertEqual(manager._call_with_retry('BTCUSDT', fn), {'orderId': 1})
+        self.assertEqual(fn.call_count, 2)
+
+    def test_rate_limit_exhausted_counts_failure(self):
+        manager = make_manager()
+        fn = mock.Mock(side_effect=BinanceAPIError('x', status_code=429))
+        with self.assertRaises(BinanceAPIError):
+            manager._call_with_retry('BTCUSDT', fn)
+        self.assertEqual(fn.call_count, manager._retry_attempts)
+        self.assertEqual(manager._cb['BTCUSDT'].failures, 1)
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        manager = make_manager()
+        fn = mock.Mock(side_effect=BinanceAPIError('x', status_code=500))
+        for _ in range(5):
+            with self.assertRaises(BinanceAPIError):
+                manager._call_with_retry('BTCUSDT', fn)
+        with self.assertRaises(RuntimeError):
+            manager._call_with_retry('BTCUSDT', fn)
+        self.assertEqual(fn.call_count, 5)
+
+
+LONG_POSITION = {
+    'symbol': 'BTCUSDT', 'positionAmt': '0.010', 'entryPrice': '100000',
+    'markPrice': '110000', 'unRealizedProfit': '100', 'leverage': '5'
+}
+
+
+class MoveStopToBreakevenTest(unittest.TestCase):
+    """新止损先挂出，再按交易所当前挂单撤销该方向的全部旧止损"""
+
+    def make_client(self, open_orders):
+        client = mock.Mock()
+        client.get_active_positions.return_value = [LONG_POSITION]
+        client.get_futures_exchange_info.return_value = {'symbols': []}
+        client.get_futures_open_orders.return_value = open_orders
+        client.create_stop_loss_order.return_value = {'orderId': 100}
+        return client
+
+    def run_breakeven(self, manager):
+        result = manager.move_stop_to_breakeven('BTCUSDT', entry_price=100000, profit_trigger_pct=5.0)
+        manager._executor.shutdown(wait=True)  # 等待后台撤单完成
+        return result
+
+    def cancelled_ids(self, client):
+        return sorted(c.kwargs['order_id'] for c in client.cancel_futures_order.call_args_list)
+
+    def test_stale_tracked_id_does_not_skip_live_stop(self):
+        # 上一笔持仓登记的止损单已失效，新持仓开仓时挂的止损单(orderId=7)必须被替换
+        client = self.make_client([
+            {'orderId': 7, 'type': 'STOP_MARKET', 'side': 'SELL'},
+            {'orderId': 8, 'type': 'TAKE_PROFIT_MARKET', 'side': 'SELL'},
+        ])
+        manager = make_manager(client)
+        manager._stop_order_ids['BTCUSDT'] = 3
+
+        result = self.run_breakeven(manager)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(self.cancelled_ids(client), [7])
+        self.assertEqual(manager._stop_order_ids['BTCUSDT'], 100)
+
+    def test_tracked_stop_replaced_after_new_stop(self):
+        client = self.make_client([{'orderId': 3, 'type': 'STOP_MARKET', 'side': 'SELL'}])
+        manager = make_manager(client)
+        manager._stop_order_ids['BTCUSDT'] = 3
+
+        self.assertTrue(self.run_breakeven(manager)['success'])
+        self.assertEqual(self.cancelled_ids(client), [3])
+        client.cancel_stop_orders.assert_not_called()
+
+    def test_confirmed_none_still_checks_exchange(self):
+        # 撤销全部挂单后(None)又开了新仓：新仓的止损单同样要被替换
+        client = self.make_client([{'orderId': 9, 'type': 'STOP_MARKET', 'side': 'SELL'}])
+        manager = make_manager(client)
+        manager._stop_order_ids['BTCUSDT'] = None
+
+        self.assertTrue(self.run_breakeven(manager)['success'])
+        self.assertEqual(self.cancelled_ids(client), [9])
+
+    def test_below_trigger_places_nothing(self):
+        client = self.make_client([])
+        manager = make_manager(client)
+        result = manager.move_stop_to_breakeven('BTCUSDT', entry_price=100000, profit_trigger_pct=20.0)
+        self.assertFalse(result['success'])
+        client.create_stop_loss_order.assert_not_called()
+
+
+class ExecuteRollPositionTest(unittest.TestCase):
+    """杠杆变化时先设置杠杆再下滚仓单"""
+
+    def make_client(self):
+        client = mock.Mock()
+        client.get_active_positions.return_value = [LONG_POSITION]
+        client.get_futures_exchange_info.return_value = {'symbols': []}
+        client.create_futures_order.return_value = {'orderId': 1}
+        return client
+
+    def test_leverage_set_before_order(self):
+        client = self.make_client()
+        manager = make_manager(client)
+
+        result = manager.execute_roll_position('BTCUSDT', usable_pnl=100, leverage=3)
+
+        self.assertTrue(result['success'])
+        calls = [c[0] for c in client.method_calls if c[0] in ('set_leverage', 'create_futures_order')]
+        self.assertEqual(calls, ['set_leverage', 'create_futures_order'])
+        self.assertEqual(manager._last_leverage['BTCUSDT'], 3)
+
+    def test_cached_leverage_skips_request(self):
+        client = self.make_client()
+        manager = make_manager(client)
+        manager._last_leverage['BTCUSDT'] = 3
+
+        self.assertTrue(manager.execute_roll_position('BTCUSDT', usable_pnl=100, leverage=3)['success'])
+        client.set_leverage.assert_not_called()
+        client.create_futures_order.assert_called_once()
+
+    def test_leverage_failure_places_no_order(self):
+        client = self.make_client()
+        client.set_leverage.side_effect = BinanceAPIError('x', status_code=400, code=-4028)
+        manager = make_manager(client)
+
+        result = manager.execute_roll_position('BTCUSDT', usable_pnl=100, leverage=3)
+
+        self.assertFalse(result['success'])
+        client.create_futures_order.assert_not_called()
+        self.assertNotIn('BTCUSDT', manager._last_leverage)
+
+
+class CancelAllPendingOrdersTest(unittest.TestCase):
+    """allOpenOrders只返回确认信息时，撤单数量记为未知"""
+
+    def test_all_open_orders_ack_reports_unknown_count(self):
+        client = mock.Mock()
+        client.cancel_all_futures_orders.return_value = {'code': 200, 'msg': 'The operation of cancel all open order is done.'}
+        manager = make_manager(client)
+
+        result = manager.cancel_all_pending_orders_for_symbol('BTCUSDT')
+
+        self.assertTrue(result['success'])
+        self.assertIsNone(result['cancelled_count'])
+        self.assertIsNone(manager._stop_order_ids['BTCUSDT'])
+
+    def test_fallback_counts_individual_cancels(self):
+        client = mock.Mock()
+        client.cancel_all_futures_orders.side_effect = BinanceAPIError('x', status_code=500)
+        client.cancel_futures_order.return_value = {'orderId': 5}
+        manager = make_manager(client)
+        manager._open_order_ids['BTCUSDT'] = {5, 6}
+
+        result = manager.cancel_all_pending_orders_for_symbol('BTCUSDT')
+
+        self.assertEqual(result['cancelled_count'], 2)
+
+
+class LiveSnapshotTest(unittest.TestCase):
+    """实时快照过期或持仓失效时回退到TTL缓存"""
+
+    def make_manager(self):
+        client = mock.Mock()
+        client.get_active_positions.return_value = [LONG_POSITION]
+        client.get_mark_price.return_value = [{'symbol': 'BTCUSDT', 'markPrice': '111000',
+                                               'lastFundingRate': '0.0001'}]
+        manager = make_manager(client)
+        manager.start_live_updates(interval=60)
+        self.addCleanup(manager.stop_live_updates)
+        return manager, client
+
+    def test_fresh_snapshot_read_from_memory(self):
+        manager, client = self.make_manager()
+        client.get_active_positions.reset_mock()
+        self.assertTrue(manager._is_live())
+        self.assertEqual(manager._get_mark('BTCUSDT'), 111000)
+        self.assertIsNotNone(manager._get_position('BTCUSDT'))
+        client.get_active_positions.assert_not_called()
+
+    def test_invalidate_forces_rest_fallback(self):
+        manager, client = self.make_manager()
+        client.get_active_positions.reset_mock()
+        client.get_active_positions.return_value = []  # 下单后持仓已平
+
+        manager.invalidate_positions_cache()
+
+        self.assertFalse(manager._is_live())
+        self.assertIsNone(manager._get_position('BTCUSDT'))
+        client.get_active_positions.assert_called_once()
+
+    def test_stale_snapshot_not_used(self):
+        manager, client = self.make_manager()
+        manager._live_time -= 2 * manager._live_interval  # 模拟刷新持续失败
+        client.get_active_positions.reset_mock()
+
+        self.assertFalse(manager._is_live())
+        manager._get_position('BTCUSDT')
+        client.get_active_positions.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+AI交易引擎单元测试（模拟 BinanceClient，不访问网络）
+验证: 开仓+止损止盈批量下单、被拒单补发、批量整体被拒回退
+"""
+
+import logging
+import unittest
+from unittest import mock
+
+from binance_client import BinanceAPIError
+from ai_trading_engine import AITradingEngine
+
+
+def make_engine(binance):
+    """只初始化下单所需属性的引擎（跳过DeepSeek/行情等组件）"""
+    engine = AITradingEngine.__new__(AITradingEngine)
+    engine.binance = binance
+    engine.logger = logging.getLogger('test_ai_trading_engine')
+    return engine
+
+
+def place(engine):
+    return engine._place_entry_with_brackets('BTCUSDT', 'BUY', 'LONG', 0.01, 95000.0, 105000.0)
+
+
+REJECTED = {'code': -2021, 'msg': 'Order would immediately trigger.'}
+
+
+class PlaceEntryWithBracketsTest(unittest.TestCase):
+
+    def test_all_accepted_in_one_batch(self):
+        binance = mock.Mock()
+        binance.create_futures_batch_orders.return_value = [{'orderId': 1}, {'orderId': 2}, {'orderId': 3}]
+        self.assertEqual(place(make_engine(binance)), ({'orderId': 1}, {'orderId': 2}, {'orderId': 3}))
+        binance.create_futures_batch_orders.assert_called_once()
+        binance.create_futures_order.assert_not_called()
+
+    def test_entry_rejected_raises(self):
+        binance = mock.Mock()
+        binance.create_futures_batch_orders.return_value = [REJECTED, {'orderId': 2}, {'orderId': 3}]
+        with self.assertRaises(Exception):
+            place(make_engine(binance))
+
+    def test_both_legs_rejected_retried_as_one_batch(self):
+        binance = mock.Mock()
+        binance.create_futures_batch_orders.side_effect = [
+            [{'orderId': 1}, REJECTED, REJECTED],
+            [{'orderId': 4}, {'orderId': 5}],
+        ]
+        self.assertEqual(place(make_engine(binance)), ({'orderId': 1}, {'orderId': 4}, {'orderId': 5}))
+        retry_orders = binance.create_futures_batch_orders.call_args_list[1][0][0]
+        self.assertEqual([o['type'] for o in retry_orders], ['STOP_MARKET', 'TAKE_PROFIT_MARKET'])
+        binance.create_futures_order.assert_not_called()
+
+    def test_single_rejected_leg_placed_individually(self):
+        binance = mock.Mock()
+        binance.create_futures_batch_orders.return_value = [{'orderId': 1}, {'orderId': 2}, REJECTED]
+        binance.create_futures_order.return_value = {'orderId': 6}
+        self.assertEqual(place(make_engine(binance)), ({'orderId': 1}, {'orderId': 2}, {'orderId': 6}))
+        binance.create_futures_batch_orders.assert_called_once()
+        self.assertEqual(binance.create_futures_order.call_args.kwargs['order_type'], 'TAKE_PROFIT_MARKET')
+
+    def test_leg_failures_after_fill_do_not_raise(self):
+        binance = mock.Mock()
+        binance.create_futures_batch_orders.side_effect = [
+            [{'orderId': 1}, REJECTED, REJECTED],
+            BinanceAPIError('timeout', status_code=503),
+        ]
+        binance.create_futures_order.side_effect = [{'orderId': 7}, BinanceAPIError('x', status_code=502)]
+        self.assertEqual(place(make_engine(binance)), ({'orderId': 1}, {'orderId': 7}, None))
+
+    def test_batch_client_error_falls_back_to_single_orders(self):
+        binance = mock.Mock()
+        binance.create_futures_batch_orders.side_effect = BinanceAPIError('bad', status_code=400, code=-1102)
+        binance.create_futures_order.side_effect = [{'orderId': 1}, {'orderId': 2}, {'orderId': 3}]
+        self.assertEqual(place(make_engine(binance)), ({'orderId': 1}, {'orderId': 2}, {'orderId': 3}))
+        binance.create_futures_batch_orders.assert_called_once()
+
+    def test_batch_server_error_is_not_resent(self):
+        binance = mock.Mock()
+        binance.create_futures_batch_orders.side_effect = BinanceAPIError('gateway', status_code=504)
+        with self.assertRaises(BinanceAPIError):
+            place(make_engine(binance))
+        binance.create_futures_order.assert_not_called()
+
+    def test_batch_rate_limit_is_not_resent(self):
+        binance = mock.Mock()
+        binance.create_futures_batch_orders.side_effect = BinanceAPIError('slow down', status_code=429)
+        with self.assertRaises(BinanceAPIError):
+            place(make_engine(binance))
+        binance.create_futures_order.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+交易机器人单元测试（模拟客户端，决策日志在临时目录中读写）
+验证: AI决策日志(JSONL)的旧版文件转换、追加写入、达到两倍保留条数时截断；
+预分析失败时保留持仓批量评估
+"""
+
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from alpha_arena_bot import AlphaArenaBot
+
+
+def make_bot():
+    """创建只包含保存决策所需属性的机器人（不连接交易所/AI）"""
+    bot = AlphaArenaBot.__new__(AlphaArenaBot)
+    bot.logger = logging.getLogger('test_alpha_arena_bot')
+    bot._decision_lines = None
+    bot.binance = mock.Mock()
+    bot.binance.get_futures_usdt_balance.return_value = 100.0
+    bot.binance.get_active_positions.return_value = []
+    bot.performance = mock.Mock()
+    bot.performance.calculate_metrics.return_value = {'total_return_pct': 0}
+    bot.ai_engine = mock.Mock()
+    bot.ai_engine.deepseek.get_trading_session.return_value = {
+        'session': 'test', 'volatility': 'low', 'recommendation': '', 'aggressive_mode': False
+    }
+    return bot
+
+
+class DecisionLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        self.bot = make_bot()
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def read_lines(self):
+        with open(AlphaArenaBot.DECISIONS_FILE, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def save(self, n):
+        for i in range(n):
+            self.bot._save_ai_decision('BTCUSDT', {'action': 'HOLD', 'reasoning': str(i)}, {'success': True})
+
+    def test_legacy_json_converted_to_latest_entries(self):
+        legacy = [{'n': i} for i in range(AlphaArenaBot.DECISIONS_KEEP + 50)]
+        with open(AlphaArenaBot.LEGACY_DECISIONS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(legacy, f)
+
+        self.assertEqual(self.bot._count_decision_lines(), AlphaArenaBot.DECISIONS_KEEP)
+        self.assertEqual(self.read_lines(), legacy[-AlphaArenaBot.DECISIONS_KEEP:])
+
+    def test_missing_file_counts_zero(self):
+        self.assertEqual(self.bot._count_decision_lines(), 0)
+
+    def test_save_appends_one_line_per_decision(self):
+        self.save(3)
+        records = self.read_lines()
+        self.assertEqual([r['decision']['reasoning'] for r in records], ['0', '1', '2'])
+        self.assertEqual([r['cycle'] for r in records], [1, 2, 3])
+        self.assertEqual(self.bot._decision_lines, 3)
+
+    def test_rotates_to_keep_at_twice_keep(self):
+        keep = AlphaArenaBot.DECISIONS_KEEP
+        self.save(2 * keep - 1)
+        self.assertEqual(len(self.read_lines()), 2 * keep - 1)
+
+        self.save(1)
+        records = self.read_lines()
+        self.assertEqual(len(records), keep)
+        self.assertEqual(self.bot._decision_lines, keep)
+        # 保留的是最近的决策
+        self.assertEqual(records[-1]['decision']['reasoning'], '0')
+        self.assertEqual(records[0]['cycle'], keep + 1)
+        self.assertFalse(os.path.exists(AlphaArenaBot.DECISIONS_FILE + '.tmp'))
+
+
+class PrefetchAnalysesTest(unittest.TestCase):
+    """开仓预分析失败时仍返回已发起的持仓批量评估"""
+
+    def test_failure_keeps_submitted_evaluations(self):
+        bot = make_bot()
+        bot.trading_symbols = ['BTCUSDT', 'ETHUSDT']
+        bot._last_seen = {}
+        bot._eval_pool = mock.Mock()
+        bot.get_runtime_stats = mock.Mock(return_value={})
+        bot._fetch_cycle_tickers = mock.Mock(side_effect=Exception('network'))
+
+        prefetched, evaluations = bot._prefetch_analyses({'BTCUSDT': {'symbol': 'BTCUSDT'}})
+
+        self.assertEqual(prefetched, {})
+        self.assertIs(evaluations, bot._eval_pool.submit.return_value)
+        bot._eval_pool.submit.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
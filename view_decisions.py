@@ -68,8 +68,16 @@ def display_decision_card(decision: dict, index: int):
 def main():
     """主函数"""
     try:
-        with open('ai_decisions.json', 'r') as f:
-            decisions = json.load(f)
+        # 跳过无法解析的行（如机器人正在追加的半行），其余记录照常显示
+        decisions = []
+        with open('ai_decisions.jsonl', 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    decisions.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    print(f"⚠️  跳过第{line_no}行无法解析的决策记录: {e}")
         
         if not decisions:
             print("暂无AI决策记录")
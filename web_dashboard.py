@@ -8,11 +8,19 @@ from flask import Flask, render_template, jsonify
 from flask_socketio import SocketIO, emit
 import json
 import os
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
 import threading
 import time
 
+# 可选：orjson（C实现的JSON解析），未安装时回退到标准库 json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # 导入 Binance 客户端
 from binance_client import BinanceClient
 from performance_tracker import PerformanceTracker
@@ -313,19 +321,27 @@ def get_positions():
 
 @app.route('/api/decisions')
 def get_ai_decisions():
-    """获取AI决策 API - 从ai_decisions.json读取结构化数据 (V3.5修复)"""
+    """获取AI决策 API - 从ai_decisions.jsonl读取结构化数据（每行一条决策）"""
     try:
-        decisions_file = 'ai_decisions.json'
+        decisions_file = 'ai_decisions.jsonl'
 
         if not os.path.exists(decisions_file):
             return jsonify({'success': True, 'data': []})
 
-        # 直接从结构化JSON读取
-        with open(decisions_file, 'r', encoding='utf-8') as f:
-            all_decisions = json.load(f)
-
-        # 只返回最近20条,格式化为前端需要的结构
-        recent = all_decisions[-20:] if len(all_decisions) > 20 else all_decisions
+        # 只读取最近20行，格式化为前端需要的结构（无需解析整个历史）
+        loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+        with open(decisions_file, 'rb') as f:
+            lines = deque(f, maxlen=20)
+
+        # 跳过无法解析的行（如与机器人追加写入竞争读到的半行），不让单行损坏导致整个请求失败
+        recent = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                recent.append(loads(line))
+            except ValueError as e:
+                print(f"[WARNING] 跳过无法解析的AI决策记录: {e}")
 
         formatted = []
         for d in recent: